@@ -182,6 +182,7 @@ setup(
     entry_points={  # Optional
         'console_scripts': [
             'xdart=xdart.xdart_main:main',
+            'xdart-repack=xdart.utils._repack:main',
         ],
     },
 
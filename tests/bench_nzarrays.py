@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the box and sparse layouts of 2d integrations. Makes
+cakes of a scanning detector, where each frame covers a thin curved
+band of chi against q, and prints per layout the memory held, the time
+to sum the frames with + and +=, and the time to add them to a full
+size array as BaiAccumulator does.
+
+    python bench_nzarrays.py [n_frames]
+"""
+
+# Standard Library imports
+import sys
+import time
+
+# Other imports
+import numpy as np
+
+# add xdart to path
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.utils.containers import nzarray2d, nzcsr2d
+
+
+def band_frames(n, width, rng, shape=(360, 1000)):
+    """Cakes with data in a band of chi, width bins wide, curving
+    across q and moving with each frame.
+    """
+    chi = np.arange(shape[0])[:, None]
+    q = np.arange(shape[1])[None, :]
+    frames = []
+    for i in range(n):
+        centre = 60 + 2 * i + 120 * np.sin(q / shape[1] * np.pi)
+        band = np.abs(chi - centre) < width / 2
+        frames.append(np.where(band, rng.random(shape) + 0.5, 0.))
+    return frames
+
+
+def nbytes(nz):
+    if isinstance(nz, nzcsr2d) and nz.csr is not None:
+        csr = nz.csr
+        return csr.data.nbytes + csr.indices.nbytes + csr.indptr.nbytes
+    return nz.data.nbytes
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        t = time.perf_counter() - start
+        best = t if best is None else min(best, t)
+    return best
+
+
+def run(frames, cls):
+    """Memory in MB and seconds to sum frames stored as cls.
+    """
+    nzs = [cls(frame) for frame in frames]
+    mb = sum(nbytes(nz) for nz in nzs) / 1e6
+
+    def binary():
+        total = nzs[0]
+        for nz in nzs[1:]:
+            total = total + nz
+
+    def inplace():
+        total = cls(nzs[0])
+        for nz in nzs[1:]:
+            total += nz
+
+    def add_to():
+        total = np.zeros(frames[0].shape)
+        for nz in nzs:
+            nz.add_to(total)
+
+    return mb, timed(binary), timed(inplace), timed(add_to)
+
+
+def main(n=20):
+    rng = np.random.default_rng(0)
+    print(f'{"width":>5} {"fill":>5} {"layout":8} {"MB":>7} '
+          f'{"+ s":>7} {"+= s":>7} {"add_to s":>8}')
+    for width in (4, 16, 64):
+        frames = band_frames(n, width, rng)
+        fill = nzarray2d(frames[0])._fill()
+        for name, cls in (('box', nzarray2d), ('csr', nzcsr2d)):
+            mb, binary, inplace, add_to = run(frames, cls)
+            print(f'{width:5d} {fill:5.2f} {name:8} {mb:7.2f} '
+                  f'{binary:7.3f} {inplace:7.3f} {add_to:8.3f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
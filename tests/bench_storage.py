@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the storage policies on synthetic detector frames.
+Writes each stack of frames one frame at a time, the way scans are
+saved, then reads it back frame by frame, and prints write MB/s, read
+MB/s and file size per policy.
+
+    python bench_storage.py [n_frames]
+"""
+
+# Standard Library imports
+import os
+import sys
+import tempfile
+import time
+
+# Other imports
+import h5py
+import numpy as np
+
+# add xdart to path
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.utils import POLICY_PRESETS
+
+
+def pilatus_frames(n, rng):
+    """Pilatus 1M like frames, Poisson counts around 20 with module gaps
+    set to -1.
+    """
+    frames = rng.poisson(20, (n, 1043, 981)).astype(np.int32)
+    for row in range(195, 1043, 212):
+        frames[:, row:row + 17] = -1
+    for col in range(487, 981, 494):
+        frames[:, :, col:col + 7] = -1
+    return frames
+
+
+def eiger_frames(n, rng):
+    """Eiger 1M like frames, sparse counts with module gaps set to -1.
+    """
+    frames = rng.poisson(0.05, (n, 1065, 1030)).astype(np.int32)
+    frames[:, 514:551] = -1
+    frames[:, :, 513:523] = -1
+    return frames
+
+
+def int_2d_frames(n, rng):
+    """Float64 2d integrations, smooth rings with noise.
+    """
+    q = np.linspace(0, 10, 1000)
+    rings = np.exp(-((q[None, :] - 3) ** 2) * 20) * 100 + 10
+    base = np.repeat(rings, 360, axis=0)
+    return base[None] + rng.normal(0, 1, (n, 360, 1000))
+
+
+def run(frames, policy, fname):
+    """Writes and reads frames with policy.
+
+    returns:
+        write: float, write MB/s
+        read: float, read MB/s
+        size: float, file size in MB
+    """
+    mb = frames.nbytes / 1e6
+    start = time.perf_counter()
+    with h5py.File(fname, 'w') as f:
+        shape = frames.shape[1:]
+        dset = f.create_dataset(
+            'frames', (0,) + shape, maxshape=(None,) + shape,
+            dtype=policy.cast(frames[:1]).dtype,
+            **policy.stacked_kwargs(shape, 1)
+        )
+        for i, frame in enumerate(frames):
+            dset.resize(i + 1, axis=0)
+            dset[i] = policy.cast(frame)
+    write = mb / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with h5py.File(fname, 'r') as f:
+        dset = f['frames']
+        for i in range(dset.shape[0]):
+            dset[i]
+    read = mb / (time.perf_counter() - start)
+    return write, read, os.path.getsize(fname) / 1e6
+
+
+def main(n=10):
+    rng = np.random.default_rng(0)
+    cases = [('pilatus', pilatus_frames(n, rng)),
+             ('eiger', eiger_frames(n, rng)),
+             ('int_2d', int_2d_frames(n, rng))]
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = os.path.join(tmp, 'bench.hdf5')
+        print(f'{"data":8} {"policy":16} {"write MB/s":>11} '
+              f'{"read MB/s":>10} {"size MB":>8}')
+        for name, frames in cases:
+            for key, policy in POLICY_PRESETS.items():
+                if not policy.available():
+                    print(f'{name:8} {key:16} hdf5plugin not installed')
+                    continue
+                write, read, size = run(frames, policy, fname)
+                print(f'{name:8} {key:16} {write:11.1f} {read:10.1f} '
+                      f'{size:8.1f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
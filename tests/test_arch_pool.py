@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import unittest
+
+# Other imports
+import numpy as np
+from pyFAI import detector_factory
+
+# add xdart to path
+import sys
+if __name__ in ("__main__", "__mp_main__"):
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald import EwaldArch
+from xdart.modules.ewald.arch_pool import ArchPool, make_task, integrate_task
+
+
+def make_arch(idx):
+    poni_dict = {'_dist': 0.2, '_rot1': 0.01, '_rot2': 0.0, '_rot3': 0.0,
+                 '_poni1': 0.01, '_poni2': 0.04, '_wavelength': 1e-10,
+                 'detector': detector_factory('Pilatus100k')}
+    rng = np.random.default_rng(idx)
+    return EwaldArch(idx, rng.poisson(100, (195, 487)).astype(float),
+                     poni_dict=poni_dict, scan_info={'i0': float(idx)},
+                     static=True)
+
+
+class TestArchPool(unittest.TestCase):
+    def setUp(self):
+        self.args = {'numpoints': 300, 'unit': 'q_A^-1', 'method': 'csr',
+                     'monitor': 'i0'}
+
+    def test_integrate_task(self):
+        arch = make_arch(2)
+        idx, map_norm, int_1d = integrate_task(make_task(arch, 1, self.args))
+        arch.integrate_1d(**self.args)
+        self.assertEqual(idx, 2)
+        self.assertEqual(map_norm, 2.0)
+        self.assertTrue(np.allclose(int_1d.norm, arch.int_1d.norm))
+
+    def test_close(self):
+        pool = ArchPool(1)
+        results = list(pool.imap([make_arch(1)], 1, self.args))
+        self.assertEqual(results[0][0], 1)
+        processes = list(pool._executor._processes.values())
+        pool.close()
+        self.assertIsNone(pool._executor)
+        for process in processes:
+            process.join(30)
+            self.assertFalse(process.is_alive())
+        # workers are started again when needed
+        results = list(pool.imap([make_arch(2)], 1, self.args))
+        self.assertEqual(results[0][0], 2)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
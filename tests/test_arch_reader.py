@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import os
+import shutil
+import tempfile
+import unittest
+from threading import Condition
+
+# Other imports
+import numpy as np
+from pyFAI import detector_factory
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart import utils
+from xdart.modules.ewald import EwaldArch
+from xdart.modules.ewald.arch_series import ArchSeries
+
+
+def make_poni_dict():
+    return {'_dist': 0.2, '_rot1': 0.01, '_rot2': 0.0, '_rot3': 0.0,
+            '_poni1': 0.01, '_poni2': 0.04, '_wavelength': 1e-10,
+            'detector': detector_factory('Pilatus100k')}
+
+
+class TestArchReader(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.fname = os.path.join(self.dirname, 'scan.hdf5')
+        self.saved = dict(utils.storage_policies)
+
+    def tearDown(self):
+        utils.storage_policies.update(self.saved)
+        shutil.rmtree(self.dirname)
+
+    def make_series(self, n=4):
+        rng = np.random.default_rng(0)
+        series = ArchSeries(self.fname, Condition(), static=True)
+        with utils.catch_h5py_file(self.fname, 'a') as f:
+            for idx in range(n):
+                arch = EwaldArch(
+                    idx, rng.poisson(100, (195, 487)).astype(float),
+                    poni_dict=make_poni_dict(), static=True,
+                    scan_info={'i0': float(idx)}
+                )
+                arch.integrate_1d(numpoints=200, unit='2th_deg')
+                arch.integrate_2d(npt_rad=50, npt_azim=20, unit='2th_deg')
+                arch.save_to_h5(f['arches'])
+        series.index = list(range(n))
+        return series
+
+    def check(self, series):
+        fields = ['int_1d', 'meta', 'raw', 'mask', 'int_2d']
+        ref = list(series.iter_fields(fields, idxs=[2, 0, 7, 1]))
+        out = series.read([2, 0, 7, 1], fields)
+        self.assertEqual([a.idx for a in out], [2, 0, 1])
+        for a, b in zip(ref, out):
+            self.assertEqual(a.scan_info, b.scan_info)
+            self.assertTrue(np.array_equal(a.int_1d.norm, b.int_1d.norm))
+            self.assertTrue(np.array_equal(a.int_1d.ttheta, b.int_1d.ttheta))
+            self.assertTrue(np.array_equal(a.int_1d.q, b.int_1d.q))
+            self.assertTrue(np.array_equal(a.int_2d.chi, b.int_2d.chi))
+            self.assertTrue(np.array_equal(a.int_2d.i_tthChi, b.int_2d.i_tthChi))
+            self.assertTrue(np.array_equal(a.map_raw, b.map_raw))
+            self.assertTrue(np.array_equal(a.mask, b.mask))
+            self.assertNotIn('integrator', b.__dict__)
+        # frames share one block per dataset
+        self.assertTrue(np.shares_memory(out[0].int_1d.norm, out[1].int_1d.norm)
+                        or out[0].int_1d.norm.base is out[1].int_1d.norm.base)
+        self.assertAlmostEqual(out[0].integrator.wavelength, 1e-10)
+
+    def test_read(self):
+        self.check(self.make_series())
+
+    def test_read_gzip(self):
+        for name in ('raw', 'int_1d', 'int_2d'):
+            utils.set_storage_policy(name, 'gzip-1')
+        series = self.make_series()
+        with utils.catch_h5py_file(self.fname, 'r') as f:
+            self.assertEqual(f['arches/0/map_raw'].compression, 'gzip')
+        self.check(series)
+
+
+if __name__ == '__main__':
+    unittest.main()
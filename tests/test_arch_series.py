@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import os
+import shutil
+import tempfile
+from threading import Condition
+import time
+import unittest
+
+# Other imports
+import h5py
+import numpy as np
+from pyFAI import detector_factory
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald import EwaldArch
+from xdart.modules.ewald.arch import LazyArch
+from xdart.utils.containers import int_1d_data_static
+from xdart.modules.ewald.arch_series import ArchSeries, arch_nbytes
+
+
+def make_arch(idx):
+    poni_dict = {'_dist': 0.2, '_rot1': 0.01, '_rot2': 0.0, '_rot3': 0.0,
+                 '_poni1': 0.01, '_poni2': 0.04, '_wavelength': 1e-10,
+                 'detector': detector_factory('Pilatus100k')}
+    return EwaldArch(idx, np.full((195, 487), float(idx)),
+                     poni_dict=poni_dict, scan_info={'i0': float(idx)},
+                     static=True)
+
+
+class TestArchSeriesLazy(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.fname = os.path.join(self.dirname, 'test.hdf5')
+        self.lock = Condition()
+        self.arches = ArchSeries(self.fname, self.lock, static=True)
+        for i in range(1, 4):
+            arch = make_arch(i)
+            arch.integrate_1d(numpoints=100, unit='q_A^-1')
+            self.arches[i] = arch
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_lazy_fields(self):
+        arch = self.arches[2]
+        self.assertIsInstance(arch, LazyArch)
+        self.assertNotIn('map_raw', vars(arch))
+        self.assertEqual(arch.scan_info, {'i0': 2.0})
+        self.assertNotIn('map_raw', vars(arch))
+        self.assertNotIn('integrator', vars(arch))
+        self.assertEqual(arch.map_raw[0, 0], 2.)
+        self.assertEqual(arch.bg_raw, 0)
+        self.assertAlmostEqual(arch.integrator.dist, 0.2)
+
+    def test_flags_from_file(self):
+        # flags given by the caller are replaced by the saved ones
+        arch = LazyArch(2, self.fname, static=False, gi=True)
+        self.assertIsInstance(arch.int_1d, int_1d_data_static)
+        self.assertTrue(arch.gi)
+        arch.load('meta')
+        self.assertTrue(arch.static)
+        self.assertFalse(arch.gi)
+        self.assertIsNot(LazyArch(1, self.fname).file_lock,
+                         LazyArch(1, self.fname).file_lock)
+
+    def test_set_before_load(self):
+        arch = self.arches[1]
+        arch.map_raw = np.zeros((195, 487))
+        self.arches[1] = arch
+        self.assertEqual(self.arches[1].map_raw.sum(), 0)
+        self.assertEqual(self.arches[1].scan_info, {'i0': 1.0})
+
+    def test_iter_fields(self):
+        arches = list(self.arches.iter_fields(['int_1d'], idxs=[3, 1, 7]))
+        self.assertEqual([a.idx for a in arches], [3, 1])
+        for arch in arches:
+            self.assertIn('int_1d', vars(arch))
+            self.assertNotIn('map_raw', vars(arch))
+            self.assertNotIn('scan_info', vars(arch))
+        ref = make_arch(3)
+        ref.integrate_1d(numpoints=100, unit='q_A^-1')
+        self.assertTrue(np.allclose(arches[0].int_1d.norm, ref.int_1d.norm))
+
+    def test_sorted_insert(self):
+        index = self.arches.index
+        for i in (7, 0, 5, 2):
+            self.arches[i] = make_arch(i)
+        self.assertIs(self.arches.index, index)
+        self.assertEqual(self.arches.index, [0, 1, 2, 3, 5, 7])
+        self.assertEqual(self.arches[5].scan_info, {'i0': 5.0})
+        with self.assertRaises(KeyError):
+            self.arches[4]
+        with self.assertRaises(KeyError):
+            self.arches['5']
+
+
+class TestArchSeriesCache(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.fname = os.path.join(self.dirname, 'test.hdf5')
+        self.lock = Condition()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def read_back(self, idxs):
+        arches = ArchSeries(self.fname, self.lock, static=True)
+        arches.index = list(idxs)
+        return arches
+
+    def test_write_behind(self):
+        arches = ArchSeries(self.fname, self.lock, static=True,
+                            cache_size=1e9)
+        for i in range(1, 4):
+            arches = arches.append(make_arch(i))
+        self.assertIs(arches[2], arches[2])
+        self.assertEqual(arches.cache.dirty, {1, 2, 3})
+        with h5py.File(self.fname, 'r') as f:
+            self.assertEqual(len(f['arches']), 0)
+
+        arches.flush()
+        self.assertEqual(arches.cache.dirty, set())
+        self.assertEqual(self.read_back([1, 2, 3])[3].map_raw[0, 0], 3.)
+
+    def test_eviction_writes_dirty(self):
+        size = arch_nbytes(make_arch(1))
+        arches = ArchSeries(self.fname, self.lock, static=True,
+                            cache_size=2.5 * size)
+        for i in range(1, 5):
+            arches[i] = make_arch(i)
+        self.assertEqual(list(arches.cache.arches), [3, 4])
+        self.assertEqual(self.read_back([1, 2])[1].map_raw[0, 0], 1.)
+
+        arches.flush()
+        arch = arches[1]
+        self.assertEqual(arch.map_raw[0, 0], 1.)
+        self.assertEqual(arches.cache.misses, 1)
+
+    def test_background_flush(self):
+        arches = ArchSeries(self.fname, self.lock, static=True,
+                            cache_size=1e9, flush_interval=0.05)
+        arches[1] = make_arch(1)
+        for _ in range(100):
+            if not arches.cache.dirty:
+                break
+            time.sleep(0.05)
+        self.assertEqual(arches.cache.dirty, set())
+        arches.close()
+        self.assertEqual(self.read_back([1])[1].map_raw[0, 0], 1.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import copy
+import os
+import tempfile
+import unittest
+
+# Other imports
+import h5py
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart import utils
+from xdart.utils import axis_registry, axes_to_h5
+from xdart.utils.containers import (
+    int_1d_data, int_2d_data, int_1d_data_static, int_2d_data_static
+)
+
+
+class TestAxes(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmp.name, 'scan.hdf5')
+        self.tth = np.linspace(1, 40, 100)
+        self.chi = np.linspace(-180, 180, 36)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def frame(self, i):
+        data = int_1d_data_static(norm=np.full(100, float(i)),
+                                  ttheta=np.array(self.tth), q=self.tth / 10)
+        return data
+
+    def test_intern(self):
+        a, b = self.frame(0), self.frame(1)
+        self.assertIs(a.ttheta, b.ttheta)
+        self.assertIs(a.q, b.q)
+        self.assertFalse(a.ttheta.flags.writeable)
+        with self.assertRaises(ValueError):
+            a.ttheta[0] = 0
+        c = int_1d_data_static(norm=np.zeros(100), ttheta=self.tth + 1)
+        self.assertIsNot(a.ttheta, c.ttheta)
+        # scalars are kept as they are
+        self.assertEqual(c.qz, 0)
+
+        d = int_1d_data(raw=np.ones(100), pcount=np.ones(100),
+                        norm=np.ones(100), ttheta=self.tth, q=self.tth / 10)
+        self.assertIs(d.ttheta, a.ttheta)
+
+    def test_deepcopy(self):
+        a = self.frame(2)
+        b = copy.deepcopy(a)
+        self.assertIs(a.ttheta, b.ttheta)
+        self.assertIsNot(a.norm, b.norm)
+        b.norm[0] = -1
+        self.assertEqual(a.norm[0], 2)
+
+        d = int_2d_data(raw=np.ones((36, 100)), pcount=np.ones((36, 100)),
+                        norm=np.ones((36, 100)), ttheta=self.tth,
+                        q=self.tth / 10, chi=self.chi,
+                        sigma=np.ones((36, 100)),
+                        sigma_raw=np.ones((36, 100)))
+        e = copy.deepcopy(d)
+        self.assertIs(d.chi, e.chi)
+        self.assertIsNot(d.raw, e.raw)
+        self.assertIs((d + e).chi, d.chi)
+
+    def test_file(self):
+        with h5py.File(self.fname, 'w') as f:
+            for i in range(5):
+                self.frame(i).to_hdf5(f.create_group(f'{i}/int_1d'))
+                static = int_2d_data_static(
+                    i_tthChi=np.ones((36, 100)), i_qChi=np.ones((36, 100)),
+                    ttheta=self.tth, q=self.tth / 10, chi=self.chi
+                )
+                static.to_hdf5(f.create_group(f'{i}/int_2d'))
+            # ttheta, q and chi
+            self.assertEqual(len(f['shared_axes']), 3)
+            target = f['0/int_1d/ttheta'].id
+            self.assertEqual(f['4/int_2d/ttheta'].id, target)
+            self.assertEqual(f['2/int_2d/chi'].id, f['0/int_2d/chi'].id)
+
+            # rewriting keeps the link, new axes get a new array
+            self.frame(0).to_hdf5(f['0/int_1d'])
+            self.assertEqual(f['0/int_1d/ttheta'].id, target)
+            frame = self.frame(0)
+            frame.ttheta = self.tth * 2
+            frame.to_hdf5(f['0/int_1d'])
+            self.assertNotEqual(f['0/int_1d/ttheta'].id, target)
+            self.assertTrue(np.array_equal(f['1/int_1d/ttheta'], self.tth))
+
+            # writing a plain array over a link does not change the others
+            utils.data_to_h5(np.zeros(100), f['1/int_1d'], 'ttheta')
+            self.assertTrue(np.array_equal(f['2/int_1d/ttheta'], self.tth))
+            self.assertTrue(np.all(f['1/int_1d/ttheta'][()] == 0))
+
+        with h5py.File(self.fname, 'r') as f:
+            out = int_1d_data_static()
+            out.from_hdf5(f['3/int_1d'])
+            self.assertTrue(np.array_equal(out.ttheta, self.tth))
+            self.assertTrue(np.all(out.norm == 3))
+            out2 = int_2d_data_static()
+            out2.from_hdf5(f['3/int_2d'])
+            self.assertTrue(np.array_equal(out2.chi, self.chi))
+            self.assertIs(out2.ttheta, out.ttheta)
+
+    def test_repack(self):
+        with h5py.File(self.fname, 'w') as f:
+            for i in range(3):
+                self.frame(i).to_hdf5(f.create_group(f'{i}/int_1d'))
+        utils.repack(self.fname)
+        with h5py.File(self.fname, 'r') as f:
+            self.assertEqual(f['0/int_1d/q'].id, f['2/int_1d/q'].id)
+            self.assertEqual(len(f['shared_axes']), 2)
+
+    def test_other_values(self):
+        data = self.frame(0)
+        with h5py.File(self.fname, 'w') as f:
+            axes_to_h5(data, f, ['ttheta', 'qz'])
+            self.assertTrue(f['ttheta'].attrs['shared'])
+            self.assertNotIn('shared', f['qz'].attrs)
+            self.assertEqual(f['qz'][()], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
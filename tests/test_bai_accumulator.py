@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import time
+import unittest
+
+# Other imports
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald.bai_accumulator import BaiAccumulator
+from xdart.utils.containers import int_1d_data, int_2d_data
+
+
+def make_data(cls, arr, **kwargs):
+    return cls(raw=arr, pcount=(arr > 0) * 2., norm=arr, sigma=arr,
+               sigma_raw=arr * 0.5, **kwargs)
+
+
+class TestBaiAccumulator(unittest.TestCase):
+    def test_matches_add_1d(self):
+        arrs = [np.zeros(50) for _ in range(3)]
+        arrs[0][5:20] = 1.
+        arrs[1][10:40] = 2.
+        arrs[2][45:] = 3.
+        ref = int_1d_data(raw=np.zeros(50), pcount=np.zeros(50),
+                          norm=np.zeros(50), sigma=np.zeros(50),
+                          sigma_raw=np.zeros(50))
+        acc = BaiAccumulator()
+        for i, arr in enumerate(arrs):
+            data = make_data(int_1d_data, arr, ttheta=np.arange(50) + i)
+            ref = ref + data
+            acc.add(data)
+        out = acc.result(int_1d_data())
+        for key in ['raw', 'pcount', 'norm', 'sigma', 'sigma_raw']:
+            self.assertTrue(np.allclose(getattr(out, key).full(),
+                                        getattr(ref, key).full()))
+        self.assertTrue(np.all(out.ttheta == np.arange(50) + 2))
+        self.assertFalse(acc.stale)
+
+    def test_2d_base_and_shape_change(self):
+        arr = np.zeros((4, 6))
+        arr[1:3, 2:5] = 1.
+        base = make_data(int_2d_data, arr * 3, chi=np.arange(4))
+        acc = BaiAccumulator()
+        acc.add(make_data(int_2d_data, arr, chi=np.arange(4) + 1), base)
+        out = acc.result(int_2d_data())
+        self.assertTrue(np.allclose(out.raw.full(), arr * 4))
+        self.assertTrue(np.all(out.chi == np.arange(4) + 1))
+
+        acc.add(make_data(int_2d_data, np.ones((2, 2))), base)
+        out = acc.result(int_2d_data())
+        self.assertTrue(np.allclose(out.raw.full(), np.ones((2, 2))))
+
+    def test_save_cadence(self):
+        acc = BaiAccumulator(save_frames=3, save_interval=None)
+        self.assertFalse(acc.save_due())
+        acc.tick()
+        acc.tick()
+        self.assertFalse(acc.save_due())
+        acc.tick()
+        self.assertTrue(acc.save_due())
+        acc.saved()
+        self.assertEqual(acc.unsaved, 0)
+
+        acc = BaiAccumulator(save_frames=None, save_interval=0.05)
+        acc.tick()
+        self.assertFalse(acc.save_due())
+        time.sleep(0.06)
+        self.assertTrue(acc.save_due())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import unittest
+
+# Other imports
+import numpy as np
+from pyFAI import detector_factory
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald.batch_integrator import BatchIntegrator
+from xdart.modules.ewald.integrator_cache import IntegratorCache
+
+
+def make_poni_dict():
+    return {'_dist': 0.2, '_rot1': 0.01, '_rot2': 0.0, '_rot3': 0.0,
+            '_poni1': 0.01, '_poni2': 0.04, '_wavelength': 1e-10,
+            'detector': detector_factory('Pilatus100k')}
+
+
+class TestBatchIntegrator(unittest.TestCase):
+    def setUp(self):
+        self.ai = IntegratorCache().get(make_poni_dict())
+        rng = np.random.default_rng(0)
+        self.stack = rng.random((3, 195, 487)) * 100
+        self.masks = np.zeros((3, 195, 487), dtype=int)
+        for i in range(3):
+            self.masks[i, 3, 10 + i:30 + i] = 1
+        self.norms = [1.0, 2.0, 3.0]
+        self.radial_range = (1, 20)
+
+    def test_integrate_1d(self):
+        batch = BatchIntegrator(self.ai)
+        results = batch.integrate_1d(
+            self.stack, 500, radial_range=self.radial_range,
+            masks=self.masks, norms=self.norms, method='csr'
+        )
+        for i, result in enumerate(results):
+            ref = self.ai.integrate1d(
+                self.stack[i] / self.norms[i], 500,
+                radial_range=self.radial_range, unit='2th_deg',
+                mask=self.masks[i], method='csr'
+            )
+            self.assertTrue(np.allclose(result.radial, ref.radial))
+            self.assertTrue(np.allclose(result.intensity, ref.intensity))
+
+    def test_integrate_2d(self):
+        batch = BatchIntegrator(self.ai)
+        results = batch.integrate_2d(
+            self.stack, 200, 90, radial_range=self.radial_range,
+            masks=self.masks[0], norms=self.norms, method='csr'
+        )
+        for i, result in enumerate(results):
+            ref = self.ai.integrate2d(
+                self.stack[i] / self.norms[i], 200, 90,
+                radial_range=self.radial_range, unit='2th_deg',
+                mask=self.masks[0], method='csr'
+            )
+            self.assertEqual(result.intensity.shape, ref.intensity.shape)
+            self.assertTrue(np.allclose(result.intensity, ref.intensity,
+                                        atol=1e-3))
+
+    def test_per_frame(self):
+        batch = BatchIntegrator(self.ai)
+        dark = np.full((195, 487), 5.0)
+        flat = np.linspace(0.5, 1.5, 195 * 487).reshape(195, 487)
+        self.assertTrue(batch.batchable(error_model='no'))
+        self.assertFalse(batch.batchable(dark=dark))
+        results = batch.integrate_1d(
+            self.stack, 500, radial_range=self.radial_range,
+            masks=self.masks, norms=self.norms, method='csr', dark=dark,
+            flat=flat
+        )
+        for i, result in enumerate(results):
+            ref = self.ai.integrate1d(
+                self.stack[i] / self.norms[i], 500,
+                radial_range=self.radial_range, unit='2th_deg',
+                mask=self.masks[i], method='csr', dark=dark, flat=flat
+            )
+            self.assertTrue(np.allclose(result.intensity, ref.intensity))
+
+    def test_no_matrix(self):
+        batch = BatchIntegrator(self.ai)
+        batch._get_matrix = lambda method, dim: (None, None)
+        results = batch.integrate_2d(
+            self.stack, 200, 90, radial_range=self.radial_range,
+            masks=self.masks[0], norms=self.norms, method='csr'
+        )
+        ref = self.ai.integrate2d(
+            self.stack[2] / self.norms[2], 200, 90,
+            radial_range=self.radial_range, unit='2th_deg',
+            mask=self.masks[0], method='csr'
+        )
+        self.assertTrue(np.allclose(results[2].intensity, ref.intensity))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import os
+import tempfile
+import unittest
+
+# Other imports
+import h5py
+import numpy as np
+import pandas as pd
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart import utils
+from xdart.utils import write_digests, data_digest
+from xdart.utils._digests import DIGEST_ATTR
+
+
+class Holder():
+    def __init__(self):
+        self.args = {'numpoints': 500, 'unit': 'q_A^-1'}
+        self.mask = np.arange(10)
+        self.data = pd.DataFrame({'i0': [1., 2.]})
+
+
+class TestWriteDigests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = h5py.File(os.path.join(self.tmp.name, 'test.hdf5'), 'w')
+        write_digests.clear()
+
+    def tearDown(self):
+        self.file.close()
+        self.tmp.cleanup()
+        write_digests.clear()
+
+    def test_digest(self):
+        self.assertEqual(data_digest({'a': 1})[0], data_digest({'a': 1})[0])
+        self.assertNotEqual(data_digest({'a': 1})[0], data_digest({'a': 1.0})[0])
+        self.assertNotEqual(data_digest(np.zeros(3))[0],
+                            data_digest(np.zeros(3, dtype='f4'))[0])
+        self.assertIsNone(data_digest(np.zeros(100), max_bytes=100)[0])
+
+    def test_skip(self):
+        obj = Holder()
+        keys = ['args', 'mask', 'data']
+        for i in range(3):
+            utils.attributes_to_h5(obj, self.file, keys)
+        # first write is new, second records digests, third is skipped
+        self.assertEqual(write_digests.skipped_ops, 3)
+        self.assertEqual(write_digests.written_ops, 6)
+        self.assertGreater(write_digests.skipped_bytes, 80)
+
+        obj.mask = np.arange(12)
+        utils.attributes_to_h5(obj, self.file, keys)
+        self.assertTrue(np.all(self.file['mask'][()] == np.arange(12)))
+        self.assertEqual(write_digests.skipped_ops, 5)
+
+        # written without attributes_to_h5, or deleted
+        utils.data_to_h5(np.arange(3), self.file, 'mask')
+        del self.file['args']
+        utils.attributes_to_h5(obj, self.file, keys)
+        self.assertTrue(np.all(self.file['mask'][()] == np.arange(12)))
+        self.assertEqual(utils.h5_to_data(self.file['args']), obj.args)
+        self.assertEqual(write_digests.skipped_ops, 6)
+
+    def test_direct_writers(self):
+        obj = Holder()
+        for i in range(2):
+            utils.attributes_to_h5(obj, self.file, ['args'])
+        self.assertIn(DIGEST_ATTR, self.file['args'].attrs)
+        # written by a writer other than data_to_h5
+        utils.dict_to_h5({'numpoints': 10, 'unit': 'q_A^-1'}, self.file, 'args')
+        self.assertNotIn(DIGEST_ATTR, self.file['args'].attrs)
+        utils.attributes_to_h5(obj, self.file, ['args'])
+        self.assertEqual(utils.h5_to_data(self.file['args']), obj.args)
+        self.assertEqual(write_digests.skipped_ops, 0)
+
+        for i in range(2):
+            utils.attributes_to_h5(obj, self.file, ['mask'])
+        utils.arr_to_h5(np.arange(5), self.file, 'mask', None)
+        utils.attributes_to_h5(obj, self.file, ['mask'])
+        self.assertTrue(np.all(self.file['mask'][()] == obj.mask))
+        self.assertEqual(write_digests.skipped_ops, 0)
+
+    def test_in_file(self):
+        obj = Holder()
+        fname = self.file.filename
+        for i in range(2):
+            utils.attributes_to_h5(obj, self.file, ['args'])
+        self.file.close()
+
+        # digest is read back from the file, as by another process
+        write_digests.clear()
+        with h5py.File(fname, 'a') as f:
+            utils.attributes_to_h5(obj, f, ['args'])
+        self.assertEqual(write_digests.skipped_ops, 1)
+
+        # file replaced by another one
+        with h5py.File(fname, 'w') as f:
+            utils.dict_to_h5({'numpoints': 10}, f, 'args')
+        with h5py.File(fname, 'a') as f:
+            utils.attributes_to_h5(obj, f, ['args'])
+            self.assertEqual(utils.h5_to_data(f['args']), obj.args)
+        self.assertEqual(write_digests.skipped_ops, 1)
+        self.file = h5py.File(fname, 'a')
+
+
+if __name__ == '__main__':
+    unittest.main()
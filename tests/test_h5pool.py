@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+# Other imports
+import h5py
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.utils import catch_h5py_file as catch
+from xdart.utils._h5pool import H5Pool, h5pool
+
+
+class TestH5Pool(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.fname = os.path.join(self.dirname, 'test.hdf5')
+        h5pool.close_all()
+
+    def tearDown(self):
+        h5pool.close_all()
+        shutil.rmtree(self.dirname)
+
+    def test_hold(self):
+        with h5pool.hold(self.fname):
+            with catch(self.fname, 'a') as f:
+                f['x'] = np.arange(3)
+                first = f
+            with catch(self.fname, 'r') as f:
+                self.assertIs(f, first)
+                self.assertTrue(np.all(f['x'][()] == np.arange(3)))
+            self.assertTrue(first)
+            self.assertEqual(h5pool.opens, 1)
+        self.assertFalse(first)
+        self.assertNotIn(self.fname, h5pool)
+        with h5py.File(self.fname, 'r') as f:
+            self.assertTrue(np.all(f['x'][()] == np.arange(3)))
+
+    def test_nested_and_truncate(self):
+        with h5pool.hold(self.fname):
+            with catch(self.fname, 'a') as f:
+                f['x'] = 1
+            with h5pool.hold(self.fname):
+                with catch(self.fname, 'w') as f:
+                    self.assertNotIn('x', f)
+                    f['y'] = 2
+            with catch(self.fname, 'a') as f:
+                self.assertIn('y', f)
+        with catch(self.fname, 'r') as f:
+            self.assertEqual(list(f.keys()), ['y'])
+
+    def test_flush_policy(self):
+        pool = H5Pool(flush_writes=2, flush_interval=None)
+        pool.acquire(self.fname)
+        entry = pool._entries[os.path.abspath(self.fname)]
+        with pool.get(self.fname, 'a') as f:
+            f['x'] = 1
+        self.assertEqual(entry['uses'], 1)
+        with pool.get(self.fname, 'a') as f:
+            f['y'] = 2
+        self.assertEqual(entry['uses'], 0)
+        pool.release(self.fname)
+        self.assertIsNone(pool.get(self.fname, 'a'))
+
+    def test_release_while_used(self):
+        pool = H5Pool()
+        pool.acquire(self.fname)
+        with pool.get(self.fname, 'a') as f:
+            # released by another thread while the handle is used
+            thread = threading.Thread(target=pool.release,
+                                      args=(self.fname,))
+            thread.start()
+            thread.join()
+            f['x'] = np.arange(3)
+            self.assertTrue(f)
+        self.assertFalse(f)
+        self.assertNotIn(self.fname, pool)
+
+        # released between get and the with block
+        pool.acquire(self.fname)
+        handle = pool.get(self.fname, 'a')
+        pool.release(self.fname)
+        with handle as f:
+            self.assertTrue(np.all(f['x'][()] == np.arange(3)))
+        self.assertFalse(f)
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            catch(os.path.join(self.dirname, 'missing.hdf5'), 'r')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import unittest
+
+# Other imports
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.utils.containers import int_1d_data_static, int_1d_record
+from xdart.modules.ewald.int_1d_store import Arch1D, Int1DStore
+
+
+class FakeArch():
+    def __init__(self, idx, norm, q, wavelength=1e-10):
+        self.idx = idx
+        self.int_1d = int_1d_data_static(norm=norm, q=q, ttheta=2 * q)
+        self.scan_info = {'i0': float(idx)}
+        self.poni_dict = {'_wavelength': wavelength}
+
+
+class TestInt1DStore(unittest.TestCase):
+    def setUp(self):
+        self.q = np.linspace(0, 5, 50, dtype=np.float32)
+        self.norms = [np.arange(50, dtype=np.float32) * i for i in range(5)]
+
+    def fill(self, store, n=5):
+        for i in range(n):
+            store[i] = FakeArch(i, self.norms[i], self.q)
+
+    def test_record(self):
+        rec = int_1d_record.from_data(int_1d_data_static(norm=self.norms[1]))
+        self.assertFalse(hasattr(rec, '__dict__'))
+        self.assertTrue(np.shares_memory(rec.norm, self.norms[1]))
+        arch = Arch1D.from_arch(FakeArch(3, self.norms[3], self.q))
+        self.assertEqual((arch.idx, arch.wavelength), (3, 1e-10))
+        self.assertIs(Arch1D.from_arch(arch), arch)
+
+    def test_store(self):
+        store = Int1DStore(capacity=2)
+        self.fill(store)
+        self.assertEqual(store.keys(), list(range(5)))
+        self.assertIn(4, store)
+        self.assertNotIn('Overall', store)
+        for i in range(5):
+            arch = store[i]
+            self.assertTrue(np.array_equal(arch.int_1d.norm, self.norms[i]))
+            self.assertTrue(np.array_equal(arch.int_1d.ttheta, 2 * self.q))
+            self.assertEqual(arch.scan_info['i0'], i)
+            self.assertEqual(arch.wavelength, 1e-10)
+        self.assertFalse(store[0].int_1d.norm.flags.writeable)
+
+        # equal axes are shared
+        self.assertIs(store[0].int_1d.q, store[4].int_1d.q)
+        store[5] = FakeArch(5, self.norms[1], self.q + 1)
+        self.assertIsNot(store[5].int_1d.q, store[4].int_1d.q)
+
+        idxs, data = store.column('norm')
+        self.assertEqual(data.shape, (6, 50))
+        self.assertTrue(np.array_equal(data[2], self.norms[2]))
+
+        # replaced in place, other bins kept outside the columns
+        store[2] = FakeArch(2, self.norms[4], self.q)
+        self.assertTrue(np.array_equal(store[2].int_1d.norm, self.norms[4]))
+        store[7] = FakeArch(7, np.ones(10), np.arange(10.))
+        self.assertEqual(store[7].int_1d.norm.size, 10)
+        self.assertEqual(len(store), 7)
+        self.assertEqual(store.column()[1].shape, (6, 50))
+
+        store.pop(7)
+        del store[0]
+        self.assertEqual(store.keys(), [1, 2, 3, 4, 5])
+        self.assertIsNone(store.get(0))
+        store.clear()
+        self.assertEqual(len(store), 0)
+        store[0] = FakeArch(0, np.ones(10), np.arange(10.))
+        self.assertEqual(store.column()[1].shape, (1, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
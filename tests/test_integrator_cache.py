@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import unittest
+
+# Other imports
+import numpy as np
+from pyFAI import detector_factory
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald import EwaldArch
+from xdart.modules.ewald.integrator_cache import IntegratorCache, integrator_cache
+
+
+def make_poni_dict(dist=0.2):
+    return {'_dist': dist, '_rot1': 0.01, '_rot2': 0.0, '_rot3': 0.0,
+            '_poni1': 0.01, '_poni2': 0.04, '_wavelength': 1e-10,
+            'detector': detector_factory('Pilatus100k')}
+
+
+class TestIntegratorCache(unittest.TestCase):
+    def setUp(self):
+        integrator_cache.clear()
+
+    def test_shared_geometry(self):
+        poni_dict = make_poni_dict()
+        arch1 = EwaldArch(1, np.ones((195, 487)), poni_dict=poni_dict, static=True)
+        arch2 = EwaldArch(2, np.ones((195, 487)), poni_dict=make_poni_dict(), static=True)
+        self.assertIs(arch1.integrator, arch2.integrator)
+        self.assertIs(arch1.copy().integrator, arch1.integrator)
+
+    def test_different_geometry(self):
+        arch1 = EwaldArch(1, np.ones((195, 487)), poni_dict=make_poni_dict(0.2), static=True)
+        arch2 = EwaldArch(2, np.ones((195, 487)), poni_dict=make_poni_dict(0.3), static=True)
+        self.assertIsNot(arch1.integrator, arch2.integrator)
+        self.assertAlmostEqual(arch2.integrator.dist, 0.3)
+
+    def test_gi_angles(self):
+        def arch(idx, th):
+            return EwaldArch(idx, np.ones((195, 487)), poni_dict=make_poni_dict(),
+                             static=True, gi=True, scan_info={'th': th},
+                             tilt_angle=0.5)
+        arch1, arch2, arch3 = arch(1, 0.1), arch(2, 0.2), arch(3, 0.1)
+        self.assertIsNot(arch1.integrator, arch2.integrator)
+        self.assertIs(arch1.integrator, arch3.integrator)
+        self.assertAlmostEqual(arch1.integrator.incident_angle, 0.1)
+        self.assertAlmostEqual(arch2.integrator.incident_angle, 0.2)
+        self.assertAlmostEqual(arch2.integrator.tilt_angle, 0.5)
+        self.assertEqual(arch1.gi_angles(), (0.1, 0.5))
+
+    def test_eviction(self):
+        cache = IntegratorCache(maxsize=2)
+        ai1 = cache.get(make_poni_dict(0.1))
+        cache.get(make_poni_dict(0.2))
+        cache.get(make_poni_dict(0.3))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNot(cache.get(make_poni_dict(0.1)), ai1)
+        self.assertEqual(cache.hits, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import os
+import shutil
+import tempfile
+import unittest
+
+# Other imports
+import h5py
+import numpy as np
+from pyFAI import detector_factory
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald import EwaldArch, EwaldSphere
+from xdart.modules.ewald.live_file import LiveReader, live_file_name
+
+
+def make_poni_dict():
+    return {'_dist': 0.2, '_rot1': 0.01, '_rot2': 0.0, '_rot3': 0.0,
+            '_poni1': 0.01, '_poni2': 0.04, '_wavelength': 1e-10,
+            'detector': detector_factory('Pilatus100k')}
+
+
+class TestLiveFile(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.fname = os.path.join(self.dirname, 'scan.hdf5')
+        self.sphere = EwaldSphere(
+            'scan', data_file=self.fname, static=True, live=True,
+            bai_1d_args={'numpoints': 200, 'unit': '2th_deg'},
+            bai_2d_args={'npt_rad': 50, 'npt_azim': 20, 'unit': '2th_deg'})
+        self.sphere.save_to_h5(replace=True)
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.sphere.close_live()
+        shutil.rmtree(self.dirname)
+
+    def add(self, idx):
+        arch = EwaldArch(idx, self.rng.poisson(100, (195, 487)).astype(float),
+                         poni_dict=make_poni_dict(), static=True,
+                         scan_info={'i0': float(idx)})
+        self.sphere.add_arch(arch, calculate=True, set_mg=False)
+        return arch
+
+    def test_poll(self):
+        reader = LiveReader(self.fname)
+        self.assertEqual(len(reader.refresh()), 0)
+        arch1 = self.add(1)
+        self.assertTrue(os.path.exists(live_file_name(self.fname)))
+        self.assertEqual(list(reader.refresh()), [1])
+        arch2 = self.add(2)
+        self.assertEqual(list(reader.refresh()), [1, 2])
+        out = reader.load([2, 'Overall', 5])
+        self.assertEqual([a.idx for a in out], [2])
+        self.assertTrue(np.allclose(out[0].int_1d.norm, arch2.int_1d.norm))
+        self.assertTrue(np.allclose(out[0].int_1d.ttheta, arch2.int_1d.ttheta))
+        self.assertEqual(out[0].scan_info, {'i0': 2.0})
+        reader.close()
+
+    def test_sphere_live_arches(self):
+        arch = self.add(3)
+        viewer = EwaldSphere('scan', data_file=self.fname, static=True)
+        out = viewer.live_arches([3])
+        self.assertTrue(np.allclose(out[0].int_1d.q, arch.int_1d.q))
+        self.assertEqual(viewer.live_arches([4]), [])
+
+    def test_finished(self):
+        self.add(1)
+        viewer = EwaldSphere('scan', data_file=self.fname, static=True)
+        self.assertEqual(len(viewer.live_arches([1])), 1)
+        self.sphere.close_live()
+        self.assertFalse(os.path.exists(live_file_name(self.fname)))
+        self.assertEqual(viewer.live_arches([1]), [])
+
+    def test_marked_complete(self):
+        self.add(1)
+        self.sphere.live._file.close()
+        self.sphere.live._file = None
+        with h5py.File(live_file_name(self.fname), 'r+') as f:
+            f.attrs['complete'] = True
+        reader = LiveReader(self.fname)
+        self.assertEqual(len(reader.refresh()), 0)
+        self.assertEqual(reader.load([1]), [])
+
+    def test_reintegrate(self):
+        self.add(1)
+        self.add(2)
+        viewer = EwaldSphere('scan', data_file=self.fname, static=True)
+        self.assertEqual(len(viewer.live_arches([1, 2])), 2)
+        viewer.load_from_h5(replace=False)
+        viewer.by_arch_integrate_1d(numpoints=100, unit='2th_deg')
+        self.assertFalse(os.path.exists(live_file_name(self.fname)))
+        self.assertEqual(viewer.live_arches([1, 2]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
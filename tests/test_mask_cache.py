@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import unittest
+
+# Other imports
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald import EwaldArch
+from xdart.modules.ewald.mask_cache import MaskCache, mask_cache, pyfai_mask
+
+
+def old_get_mask(mask, global_mask, shape):
+    if global_mask is not None:
+        mask = np.unique(np.append(mask, global_mask))
+    out = np.zeros(int(np.prod(shape)), dtype=int)
+    out[mask] = 1
+    return out.reshape(shape)
+
+
+class TestMaskCache(unittest.TestCase):
+    def setUp(self):
+        mask_cache.clear()
+        rng = np.random.default_rng(0)
+        self.shape = (13, 17)
+        self.mask = rng.choice(13 * 17, 20, replace=False)
+        self.global_mask = rng.choice(13 * 17, 30, replace=False)
+
+    def test_union(self):
+        cache = MaskCache()
+        out = cache.get(self.shape, self.mask, self.global_mask)
+        ref = old_get_mask(self.mask, self.global_mask, self.shape)
+        self.assertTrue(np.all(out == ref))
+        self.assertTrue(np.all(cache.get(self.shape, self.mask) ==
+                               old_get_mask(self.mask, None, self.shape)))
+
+    def test_same_object(self):
+        cache = MaskCache()
+        out = cache.get(self.shape, self.mask, self.global_mask)
+        self.assertIs(cache.get(self.shape, self.mask.copy(),
+                                self.global_mask.copy()), out)
+        self.assertIs(cache.get(self.shape, self.global_mask, self.mask), out)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertFalse(out.flags.writeable)
+        with self.assertRaises(ValueError):
+            out[0, 0] = 1
+        array = cache.writeable(out)
+        self.assertTrue(array.flags.writeable)
+        self.assertTrue(np.shares_memory(array, out))
+        self.assertIsNone(cache.writeable(out.copy()))
+
+    def test_pyfai_mask(self):
+        mask_cache.clear()
+        out = mask_cache.get(self.shape, self.mask, self.global_mask)
+        array = pyfai_mask(out)
+        self.assertTrue(array.flags.writeable)
+        self.assertTrue(np.all(array == out))
+        # same array for every frame, no copy
+        self.assertIs(pyfai_mask(mask_cache.get(self.shape, self.mask,
+                                                self.global_mask)), array)
+        self.assertIs(pyfai_mask(array), array)
+        self.assertIsNone(pyfai_mask(None))
+        # read-only masks not in the registry are copied
+        other = out.copy()
+        other.flags.writeable = False
+        self.assertIsNot(pyfai_mask(other), other)
+        self.assertTrue(pyfai_mask(other).flags.writeable)
+        mask_cache.clear()
+
+    def test_arch(self):
+        frame = np.ones(self.shape)
+        frame[2, 3] = -1
+        arch1 = EwaldArch(1, frame)
+        arch2 = EwaldArch(2, frame.copy())
+        self.assertEqual(list(arch1.mask), [2 * 17 + 3])
+        mask = arch1.get_mask(self.global_mask)
+        self.assertIs(arch2.get_mask(self.global_mask), mask)
+        self.assertTrue(np.all(
+            mask == old_get_mask(arch1.mask, self.global_mask, self.shape)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import os
+import tempfile
+import unittest
+
+# Other imports
+import h5py
+import numpy as np
+import pandas as pd
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart import utils
+
+
+class TestMetaCodec(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = h5py.File(os.path.join(self.tmp.name, 'test.hdf5'), 'w')
+
+    def tearDown(self):
+        self.file.close()
+        self.tmp.cleanup()
+
+    def test_record(self):
+        info = {'i0': 1.5, 'th': np.float32(0.25), 'n': 3, 'name': 'scan',
+                'ok': True, 1: 2.0, 'sum': 4}
+        utils.data_to_h5(info, self.file, 'scan_info')
+        dset = self.file['scan_info']
+        self.assertTrue(utils.check_encoded(dset, 'record'))
+        out = utils.h5_to_data(dset)
+        self.assertEqual(out, info)
+        self.assertEqual(list(out), list(info))
+        self.assertEqual(out['th'].dtype, np.float32)
+
+        # not flat, saved as a group with typed keys
+        nested = {'a': [1, 2], 'b': None, 2: 'x', (1, 2): 3.0}
+        utils.data_to_h5(nested, self.file, 'scan_info')
+        out = utils.h5_to_data(self.file['scan_info'])
+        self.assertEqual(set(out), set(nested))
+        self.assertTrue(np.all(out['a'] == [1, 2]))
+        self.assertIsNone(out['b'])
+
+    def test_index(self):
+        df = pd.DataFrame({'i0': [1., 2.], 'sum': [3., 4.], 5: [0., 1.]})
+        utils.data_to_h5(df, self.file, 'scan_data')
+        out = utils.h5_to_data(self.file['scan_data'])
+        self.assertEqual(list(out.columns), ['i0', 'sum', 5])
+        self.assertTrue(np.all(out.values == df.values))
+
+        df = pd.DataFrame({'i0': [1.], 'much_longer_name': [2.]})
+        utils.data_to_h5(df, self.file, 'scan_data')
+        out = utils.h5_to_data(self.file['scan_data'])
+        self.assertEqual(list(out.columns), ['i0', 'much_longer_name'])
+
+    def test_legacy(self):
+        grp = self.file.create_group('old')
+        grp.create_dataset('1', data=2.0)
+        grp.create_dataset('th', data=0.5)
+        self.assertEqual(utils.h5_to_dict(grp), {1: 2.0, 'th': 0.5})
+
+        df_grp = self.file.create_group('old_df')
+        df_grp.attrs['encoded'] = 'DataFrame'
+        df_grp.create_dataset('index', data=np.arange(2))
+        df_grp.create_dataset('columns', data=[b'th', b'3'],
+                              dtype=h5py.string_dtype())
+        df_grp.create_dataset('data', data=np.ones((2, 2)))
+        out = utils.h5_to_data(df_grp)
+        self.assertEqual(list(out.columns), ['th', 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
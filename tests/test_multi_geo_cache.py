@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import unittest
+
+# Other imports
+import numpy as np
+from pyFAI.azimuthalIntegrator import AzimuthalIntegrator
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald.multi_geo_cache import MultiGeometryCache, combine_results
+
+
+class TestMultiGeometryCache(unittest.TestCase):
+    def setUp(self):
+        self.ais = [
+            AzimuthalIntegrator(dist=0.2, poni1=0.01, poni2=0.04,
+                                rot2=0.05 * i, wavelength=1e-10,
+                                detector='Pilatus100k')
+            for i in range(4)
+        ]
+        rng = np.random.default_rng(0)
+        self.frames = [rng.poisson(100, (195, 487)).astype(float)
+                       for _ in self.ais]
+        self.mg_args = {'unit': '2th_deg', 'radial_range': (0, 40),
+                        'wavelength': 1e-10}
+
+    def test_reuse(self):
+        cache = MultiGeometryCache(maxsize=2)
+        mg = cache.get(self.ais, self.mg_args)
+        self.assertIs(cache.get(list(self.ais), dict(self.mg_args)), mg)
+        self.assertIsNot(cache.get(self.ais[:2], self.mg_args), mg)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        cache.get(self.ais[2:], self.mg_args)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNot(cache.get(self.ais, self.mg_args), mg)
+
+    def test_rebuilt_integrators(self):
+        cache = MultiGeometryCache()
+        mg = cache.get(self.ais, self.mg_args)
+        rebuilt = [
+            AzimuthalIntegrator(dist=0.2, poni1=0.01, poni2=0.04,
+                                rot2=0.05 * i, wavelength=1e-10,
+                                detector='Pilatus100k')
+            for i in range(4)
+        ]
+        self.assertIs(cache.get(rebuilt, self.mg_args), mg)
+        rebuilt[1].rot2 = 0.3
+        self.assertIsNot(cache.get(rebuilt, self.mg_args), mg)
+
+    def test_combine_1d(self):
+        cache = MultiGeometryCache()
+        ref = cache.get(self.ais, self.mg_args).integrate1d(self.frames, 300)
+        results = [
+            cache.get(self.ais[s], self.mg_args).integrate1d(self.frames[s], 300)
+            for s in (slice(0, 1), slice(1, 4))
+        ]
+        out = combine_results(results)
+        self.assertTrue(np.allclose(out.intensity, ref.intensity))
+        self.assertTrue(np.allclose(out.count, ref.count))
+
+    def test_combine_2d(self):
+        cache = MultiGeometryCache()
+        ref = cache.get(self.ais, self.mg_args).integrate2d(
+            self.frames, 100, 36)
+        results = [
+            cache.get(self.ais[s], self.mg_args).integrate2d(
+                self.frames[s], 100, 36)
+            for s in (slice(0, 2), slice(2, 4))
+        ]
+        out = combine_results(results)
+        self.assertTrue(np.allclose(out.intensity, ref.intensity))
+        self.assertTrue(np.all(out.azimuthal == ref.azimuthal))
+
+
+if __name__ == '__main__':
+    unittest.main()
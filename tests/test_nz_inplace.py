@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import unittest
+
+# Other imports
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.utils.containers import nzarray1d, nzarray2d
+from xdart.utils.containers import int_1d_data, int_2d_data
+
+
+def frame(shape, box, val):
+    arr = np.zeros(shape)
+    arr[box] = val
+    return arr
+
+
+class TestInPlace(unittest.TestCase):
+    def setUp(self):
+        self.arr1 = frame((100, 120), np.s_[20:70, 30:80], 2.)
+        self.arr2 = frame((100, 120), np.s_[40:90, 10:60], 3.)
+
+    def check(self, nz, arr):
+        self.assertTrue(np.allclose(nz.full(), arr))
+
+    def test_ops(self):
+        arr1, arr2 = self.arr1, self.arr2
+        div = np.divide(arr1, arr2, out=np.zeros_like(arr1), where=arr2 != 0)
+        for op, ref in (('__iadd__', arr1 + arr2), ('__isub__', arr1 - arr2),
+                        ('__imul__', arr1 * arr2), ('__itruediv__', div)):
+            nz = nzarray2d(arr1)
+            out = getattr(nz, op)(nzarray2d(arr2))
+            self.assertIs(out, nz)
+            self.check(nz, ref)
+        self.check(nzarray2d(arr1) + nzarray2d(arr2), arr1 + arr2)
+        self.check(nzarray2d(arr1) / nzarray2d(arr2), div)
+
+        nz = nzarray2d(arr1)
+        nz += 1.5
+        self.check(nz, arr1 + 1.5)
+        nz = nzarray2d(arr1)
+        nz *= arr2
+        self.check(nz, arr1 * arr2)
+        with self.assertRaises(TypeError):
+            nz += 'a'
+
+    def test_none(self):
+        nz = nzarray1d()
+        nz += nzarray1d(self.arr1[:, 40])
+        self.check(nz, self.arr1[:, 40])
+
+    def test_out(self):
+        a, b = nzarray2d(self.arr1), nzarray2d(self.arr2)
+        out = nzarray2d()
+        self.assertIs(a.add(b, out=out), out)
+        self.check(out, self.arr1 + self.arr2)
+        buf = out._buf
+        a.subtract(b, out=out)
+        self.check(out, self.arr1 - self.arr2)
+        self.assertIs(out._buf, buf)
+
+        # out aliasing an operand
+        b.subtract(a, out=a)
+        self.check(a, self.arr2 - self.arr1)
+        self.check(b, self.arr2)
+
+    def test_no_regrow(self):
+        total = nzarray2d()
+        frames = [nzarray2d(np.roll(self.arr1, i, axis=1)) for i in range(6)]
+        total += frames[0]
+        total += frames[5]
+        buf = total._buf
+        for nz in frames:
+            total += nz
+        self.assertIs(total._buf, buf)
+        self.check(total, sum(nz.full() for nz in frames) +
+                   frames[0].full() + frames[5].full())
+
+    def test_wrap(self):
+        a, b = nzarray2d(self.arr1), nzarray2d(self.arr2)
+        res = a + b
+        self.assertIs(nzarray2d.wrap(res), res)
+        self.assertIsNot(nzarray2d.wrap(res), res)
+        self.assertIsNot(nzarray2d.wrap(a), a)
+
+        data = int_2d_data()
+        res = a + b
+        data.raw = res
+        self.assertIs(data.raw, res)
+        data.raw += b
+        self.check(data.raw, self.arr1 + 2 * self.arr2)
+
+        data = int_1d_data()
+        data.raw = nzarray1d(self.arr1[:, 40])
+        data.raw += nzarray1d(self.arr2[:, 40])
+        self.check(data.raw, self.arr1[:, 40] + self.arr2[:, 40])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import os
+import tempfile
+import unittest
+
+# Other imports
+import h5py
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.utils.containers import nzarray2d, nzcsr2d, int_2d_data
+
+
+def ring(rad, rng, shape=(200, 240), width=3):
+    y, x = np.mgrid[:shape[0], :shape[1]]
+    r = np.hypot(y - 20, x - 30)
+    return np.where(np.abs(r - rad) < width, rng.random(shape) + 0.5, 0.)
+
+
+class TestCSR(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.arr1 = ring(120, rng)
+        self.arr2 = ring(140, rng)
+        self.nz1 = nzcsr2d(self.arr1)
+        self.nz2 = nzcsr2d(self.arr2)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmp.name, 'nzcsr.hdf5')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, nz, arr, sparse=True):
+        self.assertTrue(np.allclose(nz.full(), arr))
+        if sparse:
+            self.assertIsNotNone(nz.csr)
+
+    def test_api(self):
+        a, b, arr1, arr2 = self.nz1, self.nz2, self.arr1, self.arr2
+        self.check(a, arr1)
+        self.assertEqual(list(a.corners), list(nzarray2d(arr1).corners))
+        self.check(a + b, arr1 + arr2)
+        self.check(a - b, arr1 - arr2)
+        self.check(a * 2, arr1 * 2)
+        self.check(a / 4, arr1 / 4)
+        self.check(a * b, arr1 * arr2, sparse=False)
+        self.assertTrue(np.allclose(a[100:150, 50:200], arr1[100:150, 50:200]))
+        self.assertTrue(np.allclose(a[:, 70], arr1[:, 70]))
+
+        total = nzcsr2d(a)
+        total += b
+        self.check(total, arr1 + arr2)
+        total *= 0.5
+        self.check(total, (arr1 + arr2) / 2)
+
+        # box layout combined with sparse, b is left sparse
+        box = nzarray2d(arr1)
+        box += b
+        self.check(box, arr1 + arr2, sparse=False)
+        self.assertIsNotNone(b.csr)
+        self.check(nzarray2d(arr1) + b, arr1 + arr2, sparse=False)
+
+        full = np.zeros(arr1.shape)
+        a.add_to(full)
+        b.add_to(full)
+        self.assertTrue(np.allclose(full, arr1 + arr2))
+
+    def test_data(self):
+        a = nzcsr2d(self.nz1)
+        a.data[...] *= 2
+        self.assertIsNone(a.csr)
+        self.check(a, 2 * self.arr1, sparse=False)
+        self.check(a.compact(), 2 * self.arr1)
+        self.check(self.nz1, self.arr1)
+
+    def test_wrap(self):
+        self.assertIs(type(nzarray2d.wrap(self.arr1)), nzcsr2d)
+        self.assertIs(type(nzarray2d.wrap(np.ones((100, 100)))), nzarray2d)
+        self.assertIs(type(nzarray2d.wrap(self.arr1[:20, :20])), nzarray2d)
+        res = self.nz1 + self.nz2
+        self.assertIs(nzarray2d.wrap(res), res)
+        out = nzarray2d.wrap(self.nz1)
+        self.assertIsNot(out, self.nz1)
+        self.check(out, self.arr1)
+
+        data = int_2d_data(raw=self.arr1, pcount=(self.arr1 > 0) * 1.,
+                           norm=self.arr1, sigma=self.arr1,
+                           sigma_raw=self.arr1)
+        self.assertIs(type(data.raw), nzcsr2d)
+        self.check((data + data).raw, 2 * self.arr1)
+
+    def test_hdf5(self):
+        with h5py.File(self.fname, 'w') as f:
+            grp = f.create_group('int_2d/raw')
+            self.nz1.to_hdf5(grp)
+            self.assertNotIn('data', grp)
+            self.check(nzcsr2d(grp=grp), self.arr1)
+            self.check(nzarray2d(grp=grp), self.arr1, sparse=False)
+
+            # layouts overwrite each other
+            nzarray2d(self.arr2).to_hdf5(grp)
+            self.assertNotIn('indptr', grp)
+            self.check(nzcsr2d(grp=grp), self.arr2)
+            self.nz2.to_hdf5(grp)
+            self.check(nzarray2d(grp=grp), self.arr2, sparse=False)
+
+            data = int_2d_data(raw=self.arr1, pcount=self.arr1,
+                               norm=self.arr1, sigma=self.arr1,
+                               sigma_raw=self.arr1)
+            data.to_hdf5(f.create_group('bai_2d'))
+            out = int_2d_data()
+            out.from_hdf5(f['bai_2d'])
+            self.assertIs(type(out.norm), nzcsr2d)
+            self.check(out.norm, self.arr1)
+
+
+if __name__ == '__main__':
+    unittest.main()
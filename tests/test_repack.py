@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+# Other imports
+import h5py
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart import utils
+from xdart.utils._repack import main
+
+
+class TestRepack(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmp.name, 'scan.hdf5')
+        rng = np.random.default_rng(0)
+        with h5py.File(self.fname, 'w') as f:
+            f.attrs['type'] = 'Sphere'
+            arches = f.create_group('arches')
+            for idx in range(3):
+                grp = arches.create_group(str(idx))
+                utils.data_to_h5({'i0': float(idx), 'name': 'scan'}, grp,
+                                 'scan_info')
+                utils.arr_to_h5(rng.poisson(10, (50, 60)), grp, 'map_raw',
+                                None)
+                sub = grp.create_group('int_1d')
+                # reintegration recreates datasets of other types
+                for dtype in ('float32', 'float64', 'int64', 'float64'):
+                    utils.arr_to_h5(rng.random(1000).astype(dtype), sub,
+                                    'norm', None)
+            f['latest'] = h5py.SoftLink('/arches/2')
+            f['first'] = arches['0']
+            f.create_dataset('empty', data=h5py.Empty('f8'))
+            stack = f.create_group('stack')
+            stack.attrs['type'] = 'StackedArches'
+            stack.create_dataset('map_raw', data=np.ones((4, 50, 60)),
+                                 chunks=(1, 50, 60), maxshape=(None, 50, 60))
+        with h5py.File(self.fname, 'r') as f:
+            self.norm = f['arches/1/int_1d/norm'][()]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_in_place(self):
+        before = os.path.getsize(self.fname)
+        report = utils.repack(self.fname)
+        self.assertEqual(report['size_before'], before)
+        self.assertLess(report['size_after'], before)
+        self.assertEqual(report['size_after'], os.path.getsize(self.fname))
+        with h5py.File(self.fname, 'r') as f:
+            self.assertEqual(f.attrs['type'], 'Sphere')
+            self.assertTrue(np.array_equal(f['arches/1/int_1d/norm'][()],
+                                           self.norm))
+            self.assertEqual(f['arches/1/int_1d/norm'].maxshape, (None,))
+            self.assertEqual(utils.h5_to_data(f['arches/0/scan_info']),
+                             {'i0': 0.0, 'name': 'scan'})
+            self.assertEqual(f.get('latest', getlink=True).path, '/arches/2')
+            self.assertEqual(f['first'].id, f['arches/0'].id)
+            self.assertIsNone(f['empty'].shape)
+            self.assertEqual(f['stack/map_raw'].chunks, (1, 50, 60))
+
+    def test_policies(self):
+        dst = os.path.join(self.tmp.name, 'small.hdf5')
+        report = utils.repack(self.fname, dst, {'raw': 'gzip-6'})
+        self.assertEqual(report['datasets'], 10)
+        with h5py.File(dst, 'r') as f:
+            self.assertEqual(f['arches/0/map_raw'].compression, 'gzip')
+            self.assertEqual(f['stack/map_raw'].compression, 'gzip')
+            self.assertEqual(f['stack/map_raw'].chunks, (1, 50, 60))
+        with self.assertRaises(ValueError):
+            utils.repack(self.fname, self.fname)
+
+    def test_cli(self):
+        dst = os.path.join(self.tmp.name, 'out.hdf5')
+        out = io.StringIO()
+        with redirect_stdout(out):
+            code = main([self.fname, dst, '--policy', 'int_1d=lzf'])
+        self.assertEqual(code, 0)
+        self.assertIn('verified', out.getvalue())
+        with h5py.File(dst, 'r') as f:
+            self.assertEqual(f['arches/2/int_1d/norm'].compression, 'lzf')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import unittest
+from types import SimpleNamespace
+
+# Other imports
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.utils.containers import int_2d_data_static
+from xdart.utils.containers.int_data_static import (
+    RadialResampler, interp_matrix, radial_resampler
+)
+
+
+class TestResample(unittest.TestCase):
+    def setUp(self):
+        self.wl = 1e-10
+        self.tth = np.linspace(2, 60, 500)
+        self.chi = np.linspace(-180, 180, 72)
+        self.img = (np.sin(self.tth / 3)[None] *
+                    np.cos(np.radians(self.chi))[:, None] + 2)
+
+    def test_interp_matrix(self):
+        src = np.array([0., 1., 3., 4.])
+        dst = np.array([-1., 0., 0.5, 2., 4., 5.])
+        data = np.array([[0., 2., 6., 8.], [1., 1., 1., 1.]])
+        out = data @ interp_matrix(src, dst)
+        np.testing.assert_allclose(out[0], np.interp(dst, src, data[0]))
+        np.testing.assert_allclose(out[1], 1)
+        # decreasing samples
+        out = data[:, ::-1] @ interp_matrix(src[::-1], dst)
+        np.testing.assert_allclose(out[0], np.interp(dst, src, data[0]))
+
+    def test_tth_to_q(self):
+        res = SimpleNamespace(radial=self.tth, azimuthal=self.chi,
+                              intensity=self.img, unit='2th_deg')
+        data = int_2d_data_static()
+        data.parse_unit(res, self.wl)
+        qtth = (4 * np.pi / (self.wl * 1e10)) * np.sin(np.radians(self.tth / 2))
+        np.testing.assert_allclose(data.q, np.linspace(qtth[0], qtth[-1], 500))
+        self.assertEqual(data.i_qChi.shape, self.img.shape)
+        for row, irow in zip(data.i_qChi, self.img):
+            np.testing.assert_allclose(row, np.interp(data.q, qtth, irow))
+        self.assertIs(data.i_tthChi, self.img)
+        self.assertFalse(data.tth_from_q)
+
+    def test_q_to_tth(self):
+        q = np.linspace(0.2, 5, 500)
+        res = SimpleNamespace(radial=q, azimuthal=self.chi,
+                              intensity=self.img, unit='q_A^-1')
+        data = int_2d_data_static()
+        data.parse_unit(res, self.wl)
+        tthq = 2 * np.degrees(np.arcsin(q * (self.wl * 1e10) / (4 * np.pi)))
+        np.testing.assert_allclose(data.ttheta,
+                                   np.linspace(tthq[0], tthq[-1], 500))
+        for row, irow in zip(data.i_tthChi, self.img):
+            np.testing.assert_allclose(row, np.interp(data.ttheta, tthq, irow))
+
+    def test_cache(self):
+        cache = RadialResampler(maxsize=2)
+        axis, resample = cache.get(self.tth, self.wl, 'q')
+        self.assertIs(cache.get(self.tth.copy(), self.wl, 'q')[1], resample)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertIsNot(cache.get(self.tth, 2 * self.wl, 'q')[1], resample)
+        cache.get(self.tth, self.wl, 'ttheta')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNot(cache.get(self.tth, self.wl, 'q')[1], resample)
+        self.assertFalse(axis.flags.writeable)
+        with self.assertRaises(ValueError):
+            cache.get(self.tth, self.wl, 'chi')
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+        radial_resampler.clear()
+        res = SimpleNamespace(radial=self.tth, azimuthal=self.chi,
+                              intensity=self.img, unit='2th_deg')
+        for _ in range(3):
+            int_2d_data_static().parse_unit(res, self.wl)
+        self.assertEqual(radial_resampler.misses, 1)
+        self.assertEqual(radial_resampler.hits, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import unittest
+
+# Other imports
+import numpy as np
+import pandas as pd
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald.scan_data import ScanData
+
+
+class TestScanData(unittest.TestCase):
+    def test_append(self):
+        store = ScanData(capacity=2)
+        for idx in range(5):
+            self.assertTrue(store.append(idx, {'i0': idx, 'th': 0.1 * idx}))
+        df = store.frame()
+        self.assertEqual(list(df.columns), ['i0', 'th'])
+        self.assertTrue(np.all(df.index == np.arange(5)))
+        self.assertTrue(np.shares_memory(df.values, store.values))
+        self.assertIs(store.frame(), df)
+
+        # rows matching DataFrame.loc, missing columns are nan
+        store.append(10, {'i0': 10, 'extra': 1})
+        self.assertEqual(list(store.frame().columns), ['i0', 'th'])
+        self.assertTrue(np.isnan(store.frame().loc[10, 'th']))
+
+    def test_insert(self):
+        store = ScanData()
+        for idx in (0, 2, 4):
+            store.append(idx, {'i0': idx})
+        old = store.frame()
+        self.assertFalse(store.append(1, {'i0': 1}))
+        self.assertFalse(store.append(2, {'i0': 20}))
+        self.assertEqual(list(store.frame().index), [0, 1, 2, 4])
+        self.assertEqual(list(store.frame()['i0']), [0, 1, 20, 4])
+        self.assertEqual(list(old['i0']), [0, 2, 4])
+
+    def test_from_frame(self):
+        df = pd.DataFrame({'i0': [2., 1.], 'th': [0.5, 0.25]}, index=[3, 1])
+        store = ScanData(df)
+        self.assertTrue(store.frame().equals(df.sort_index()))
+        store.append(5, {'i0': 3., 'th': 1.})
+        self.assertEqual(len(store), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
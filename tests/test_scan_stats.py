@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import os
+import shutil
+import tempfile
+import unittest
+
+# Other imports
+import h5py
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald.scan_stats import StreamStats, ScanStats
+from xdart.utils.containers import int_1d_data_static
+
+
+class FakeArch:
+    def __init__(self, idx, frame, norm):
+        self.idx = idx
+        self.map_raw = frame
+        self.bg_raw = 0
+        self.mask = None
+        self.int_1d = int_1d_data_static(norm=norm)
+
+
+class TestStreamStats(unittest.TestCase):
+    def test_matches_numpy(self):
+        rng = np.random.default_rng(0)
+        arrs = rng.normal(1e6, 1., (20, 8, 9))
+        valid = rng.random((20, 8, 9)) > 0.2
+        stats = StreamStats()
+        for arr, v in zip(arrs, valid):
+            stats.update(arr, v)
+        masked = np.ma.masked_array(arrs, ~valid)
+        self.assertTrue(np.all(stats.count == valid.sum(0)))
+        self.assertTrue(np.allclose(stats.mean, masked.mean(0)))
+        self.assertTrue(np.allclose(stats.variance(), masked.var(0, ddof=1)))
+        self.assertTrue(np.allclose(stats.min, masked.min(0)))
+        self.assertTrue(np.allclose(stats.max, masked.max(0)))
+
+
+class TestScanStats(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        rng = np.random.default_rng(1)
+        self.stats = ScanStats()
+        for i in range(12):
+            frame = rng.poisson(100, (10, 12)).astype(float)
+            frame[3, 4] = 5000.
+            norm = rng.normal(10., 0.1, 30)
+            if i == 8:
+                frame *= 3
+                norm += 5.
+            self.stats.add_arch(FakeArch(i, frame, norm))
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_hot_pixels(self):
+        self.assertEqual(list(self.stats.hot_pixels()), [3 * 12 + 4])
+
+    def test_outlier_frames(self):
+        self.assertEqual(self.stats.outlier_frames(), [8])
+        self.assertTrue(np.isnan(self.stats.frame_score[0]))
+
+    def test_hdf5(self):
+        fname = os.path.join(self.dirname, 'test.hdf5')
+        with h5py.File(fname, 'w') as f:
+            self.stats.to_hdf5(f.create_group('scan_stats'))
+        stats = ScanStats()
+        with h5py.File(fname, 'r') as f:
+            stats.from_hdf5(f['scan_stats'])
+        self.assertTrue(np.allclose(stats.pixels.m2, self.stats.pixels.m2))
+        self.assertTrue(np.allclose(stats.bins.mean, self.stats.bins.mean))
+        self.assertEqual(stats.frame_idx, list(range(12)))
+        self.assertEqual(stats.outlier_frames(), [8])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import os
+import shutil
+import tempfile
+import unittest
+
+# Other imports
+import h5py
+import numpy as np
+from pyFAI import detector_factory
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart.modules.ewald import EwaldArch, EwaldSphere
+from xdart.modules.ewald.stacked import StackedWriter, StackedReader, convert_to_stacked
+from xdart.utils.containers import PONI
+
+
+def make_poni_dict():
+    return {'_dist': 0.2, '_rot1': 0.01, '_rot2': 0.0, '_rot3': 0.0,
+            '_poni1': 0.01, '_poni2': 0.04, '_wavelength': 1e-10,
+            'detector': detector_factory('Pilatus100k')}
+
+
+class TestStacked(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def make_sphere(self, static):
+        fname = os.path.join(self.dirname, f'scan_{static}.hdf5')
+        sphere = EwaldSphere(
+            'scan', data_file=fname, static=static,
+            bai_1d_args={'numpoints': 200, 'unit': '2th_deg'},
+            bai_2d_args={'npt_rad': 50, 'npt_azim': 20, 'unit': '2th_deg'})
+        sphere.save_to_h5(replace=True)
+        for idx in [3, 1, 2]:
+            frame = self.rng.poisson(100, (195, 487)).astype(float)
+            frame[0, idx] = -1
+            kwargs = {'static': True, 'poni_dict': make_poni_dict()}
+            if not static:
+                kwargs = {'poni': PONI(dist=0.2, poni1=0.01, poni2=0.04,
+                                       rot2=0.05 * idx, wavelength=1e-10,
+                                       detector=detector_factory('Pilatus100k'))}
+            arch = EwaldArch(idx, frame, scan_info={'i0': float(idx), 'th': 0.5},
+                             **kwargs)
+            sphere.add_arch(arch, calculate=True, set_mg=False)
+        return sphere
+
+    def check_arch(self, arch, ref):
+        self.assertEqual(arch.idx, ref.idx)
+        self.assertTrue(np.all(arch.map_raw == ref.map_raw))
+        self.assertEqual(list(arch.mask), list(ref.mask))
+        self.assertEqual(arch.scan_info, ref.scan_info)
+        self.assertAlmostEqual(arch.poni.rot2, ref.poni.rot2)
+        for name in ('int_1d', 'int_2d'):
+            for key, val in vars(getattr(ref, name)).items():
+                if hasattr(val, 'full'):
+                    val = val.full()
+                out = getattr(getattr(arch, name), key)
+                if hasattr(out, 'full'):
+                    out = out.full()
+                if val is None or np.asarray(val).dtype.kind == 'O':
+                    continue
+                self.assertTrue(np.allclose(out, val, equal_nan=True), key)
+
+    def test_convert(self):
+        for static in (True, False):
+            sphere = self.make_sphere(static)
+            dst = os.path.join(self.dirname, f'stacked_{static}.hdf5')
+            self.assertEqual(convert_to_stacked(sphere.data_file, dst), 3)
+            with h5py.File(dst, 'r') as f:
+                self.assertNotIn('arches', f)
+                self.assertIn('bai_1d', f)
+                reader = StackedReader(f['stack'])
+                self.assertEqual(list(reader.index), [1, 2, 3])
+                self.assertEqual(reader.read('map_raw').shape, (3, 195, 487))
+                self.assertEqual(list(reader.scan_info()['i0']), [1., 2., 3.])
+                for idx in [1, 2, 3]:
+                    self.check_arch(reader.arch(idx), sphere.arches[idx])
+                self.assertEqual(list(reader.read('mask', 1)), [2])
+
+    def test_new_keys_and_shapes(self):
+        with h5py.File(os.path.join(self.dirname, 'w.hdf5'), 'w') as f:
+            writer = StackedWriter(f.create_group('stack'))
+            arch = EwaldArch(1, np.ones((4, 5)), scan_info={'a': 1.})
+            writer.append(arch)
+            arch = EwaldArch(2, np.ones((4, 5)), scan_info={'b': 'text'})
+            writer.append(arch)
+            with self.assertRaises(ValueError):
+                writer.append(EwaldArch(3, np.ones((5, 5))))
+            # wrong type, nothing of the frame is written
+            with self.assertRaises(ValueError):
+                writer.append(EwaldArch(3, np.ones((4, 5)),
+                                        scan_info={'a': 'text'}))
+            with self.assertRaises(ValueError):
+                writer.append(EwaldArch(3, np.ones((4, 5)),
+                                        scan_info={'b': 2.}))
+            self.assertEqual(len(writer), 2)
+            for key in ('map_raw', 'scan_info/a', 'scan_info/b'):
+                self.assertEqual(f['stack'][key].shape[0], 2)
+            writer.append(EwaldArch(3, np.ones((4, 5)), scan_info={'n': 4}))
+            info = StackedReader(f['stack']).scan_info()
+            self.assertTrue(np.isnan(info.loc[2, 'a']))
+            self.assertEqual(list(info['b']), ['', 'text', ''])
+            # integers are stored as float, missing rows are nan
+            self.assertTrue(np.isnan(info.loc[1, 'n']))
+            self.assertEqual(info.loc[3, 'n'], 4.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# Standard Library imports
+import os
+import tempfile
+import unittest
+
+# Other imports
+import h5py
+import numpy as np
+
+# add xdart to path
+import sys
+if __name__ == "__main__":
+    from config import xdart_dir
+else:
+    from .config import xdart_dir
+
+if xdart_dir not in sys.path:
+    sys.path.append(xdart_dir)
+
+from xdart import utils
+from xdart.utils import StoragePolicy, set_storage_policy, storage_policies
+
+
+class TestStoragePolicy(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmp.name, 'test.hdf5')
+        self.saved = dict(storage_policies)
+
+    def tearDown(self):
+        storage_policies.update(self.saved)
+        self.tmp.cleanup()
+
+    def test_kwargs(self):
+        self.assertEqual(StoragePolicy().dataset_kwargs((10, 10)),
+                         {'chunks': True})
+        self.assertEqual(StoragePolicy('lzf').dataset_kwargs(()), {})
+        kwargs = StoragePolicy('gzip', level=2, chunks=(4, 50)).dataset_kwargs((10, 20))
+        self.assertEqual(kwargs['chunks'], (4, 20))
+        self.assertEqual(kwargs['compression_opts'], 2)
+        kwargs = StoragePolicy(chunks=(16, 16)).stacked_kwargs((100, 8), 1)
+        self.assertEqual(kwargs['chunks'], (1, 16, 8))
+        with self.assertRaises(ValueError):
+            StoragePolicy('zstd')
+
+    def test_classes(self):
+        with h5py.File(self.fname, 'w') as f:
+            grp = f.create_group('arches/0/int_2d/i_qChi')
+            self.assertEqual(utils.dataset_class(grp, 'data'), 'int_2d')
+            self.assertEqual(utils.dataset_class(f['arches/0'], 'map_raw'), 'raw')
+            self.assertEqual(utils.dataset_class(f.create_group('bai_1d'), 'q'),
+                             'int_1d')
+            self.assertEqual(utils.dataset_class(f['arches/0'], 'map_norm'), 'meta')
+
+    def test_round_trip(self):
+        set_storage_policy('raw', 'gzip-1')
+        set_storage_policy('int_1d', codec='lzf', dtype='float32')
+        raw = np.arange(200).reshape(10, 20)
+        q = np.linspace(0, 1, 50)
+        with h5py.File(self.fname, 'w') as f:
+            utils.arr_to_h5(raw, f, 'map_raw', None)
+            utils.arr_to_h5(q, f.create_group('int_1d'), 'q', None)
+            utils.arr_to_h5(q, f['int_1d'], 'q', None)
+            self.assertEqual(f['map_raw'].compression, 'gzip')
+            self.assertEqual(f['int_1d/q'].compression, 'lzf')
+            self.assertEqual(f['int_1d/q'].dtype, np.float32)
+            self.assertTrue(np.all(f['map_raw'][()] == raw))
+            self.assertTrue(np.allclose(f['int_1d/q'][()], q))
+
+
+if __name__ == '__main__':
+    unittest.main()
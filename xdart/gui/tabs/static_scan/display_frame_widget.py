@@ -1122,7 +1122,10 @@ class displayFrameWidget(Qt.QtWidgets.QWidget):
         cen = self.ui.slice_center.value()
         wid = self.ui.slice_width.value()
         _range = np.array([cen - wid, cen + wid])
-        wavelength = self.data_1d[self.idxs_1d[0]].integrator.wavelength
+        arch = self.data_1d[self.idxs_1d[0]]
+        wavelength = getattr(arch, 'wavelength', None)
+        if wavelength is None:
+            wavelength = self.sphere.arches[arch.idx].integrator.wavelength
 
         if imageUnit == 0:
             if self.ui.slice.text() == f'2{Th} Range':
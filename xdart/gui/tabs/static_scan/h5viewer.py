@@ -10,13 +10,9 @@ import gc
 
 # This module imports
 from .ui.h5viewerUI import Ui_Form
-from xdart.modules.ewald import EwaldArch
 from .sphere_threads import fileHandlerThread
 from ...widgets import defaultWidget
-from xdart import utils
 from xdart.utils.containers import int_2d_data_static
-from xdart.utils import catch_h5py_file as catch
-from xdart.utils.containers import create_ai_from_dict
 
 # Qt imports
 from pyqtgraph import Qt
@@ -506,80 +502,51 @@ class H5Viewer(QWidget):
         self.set_file(fname)
 
     def load_arches_data(self, arch_ids, load_2d):
-        """Loads data from hdf5 file and sets attributes.
+        """Loads data from hdf5 file into data_1d, and data_2d if
+        load_2d. Only the fields that are displayed are read.
 
         args:
-            file: h5py file or group object
+            arch_ids: list of arch idx to load
+            load_2d: bool, if True also loads raw images and int_2d
         """
         # ic()
-        with catch(self.sphere.data_file, 'r') as file:
-            # ic(arch_ids)
-            for idx in arch_ids:
-                try:
-                    # ic(idx)
-                    arch = EwaldArch(idx=idx, static=True, gi=self.sphere.gi)
-                    if not load_2d:
-                        # arch.load_from_h5(file['arches'], load_2d=False)
-                        self.load_arch_data(file['arches'], arch, idx, load_2d=False)
-                        self.data_1d[int(idx)] = arch.copy(include_2d=False)
-                        # ic('loaded 1D data', self.data_1d.keys())
-                    else:
-                        try:
-                            if len(arch.int_2d.i_qChi) == 0:
-                                pass
-                        except TypeError:
-                            arch.load_from_h5(file['arches'], load_2d=True)
-
-                        self.data_1d[int(idx)] = arch.copy(include_2d=False)
-                        self.data_2d[int(idx)] = {'map_raw': arch.map_raw,
-                                                  'bg_raw': arch.bg_raw,
-                                                  'mask': arch.mask,
-                                                  'int_2d': arch.int_2d}
-
-                        # ic('loaded 1 and 2D data', self.data_1d.keys(), self.data_2d.keys())
-                        # ic(idx, self.arches['add_idxs'], self.arches['sub_idxs'])
-                        if idx in self.arches['add_idxs']:
-                            self.arches['sum_int_2d'] += self.data_2d[int(idx)]['int_2d']
-                            # self.arches['sum_map_raw'] += self.data_2d[int(idx)]['map_raw']
-                            self.arches['sum_map_raw'] += (self.data_2d[int(idx)]['map_raw'] -
-                                                           self.data_2d[int(idx)]['bg_raw'])
-                        elif idx in self.arches['sub_idxs']:
-                            self.arches['sum_int_2d'] -= self.data_2d[int(idx)]['int_2d']
-                            # self.arches['sum_map_raw'] -= self.data_2d[int(idx)]['map_raw']
-                            self.arches['sum_map_raw'] -= (self.data_2d[int(idx)]['map_raw'] -
-                                                           self.data_2d[int(idx)]['bg_raw'])
-
-                except KeyError:
-                    pass
-
-    @staticmethod
-    def load_arch_data(file, arch, idx, load_2d=True):
-        # ic()
-        if str(idx) not in file:
-            print("No data can be found")
-        else:
-            grp = file[str(idx)]
-            if 'type' in grp.attrs:
-                if grp.attrs['type'] == 'EwaldArch':
-                    if load_2d:
-                        lst_attr = [
-                            "map_raw", "mask", "map_norm", "scan_info", "ai_args",
-                            "gi", "static", "poni_dict", "bg_raw"
-                        ]
-                        utils.h5_to_attributes(arch, grp, lst_attr)
-                        arch.int_1d.from_hdf5(grp['int_1d'])
-                        arch.int_2d.from_hdf5(grp['int_2d'])
-                    else:
-                        lst_attr = [
-                            "scan_info", "ai_args",
-                            "gi", "static", "poni_dict"
-                        ]
-                        utils.h5_to_attributes(arch, grp, lst_attr)
-                        arch.int_1d.from_hdf5(grp['int_1d'])
-
-                    # if self.poni_file is not None:
-                    if arch.poni_dict is not None:
-                        arch.integrator = create_ai_from_dict(arch.poni_dict)
+        if not load_2d:
+            # frames of a scan being written come from the live file
+            live = self.sphere.live_arches(arch_ids)
+            for arch in live:
+                self.data_1d[int(arch.idx)] = arch
+            done = set(int(arch.idx) for arch in live)
+            arch_ids = [idx for idx in arch_ids if int(idx) not in done]
+            if not arch_ids:
+                return
+
+        fields = ['int_1d', 'meta']
+        if load_2d:
+            fields += ['raw', 'mask', 'int_2d']
+        try:
+            arches = self.sphere.arches.read(arch_ids, fields)
+            for arch in arches:
+                idx = arch.idx
+                self.data_1d[int(idx)] = arch
+                if not load_2d:
+                    continue
+
+                self.data_2d[int(idx)] = {'map_raw': arch.map_raw,
+                                          'bg_raw': arch.bg_raw,
+                                          'mask': arch.mask,
+                                          'int_2d': arch.int_2d}
+
+                # ic(idx, self.arches['add_idxs'], self.arches['sub_idxs'])
+                if idx in self.arches['add_idxs']:
+                    self.arches['sum_int_2d'] += self.data_2d[int(idx)]['int_2d']
+                    self.arches['sum_map_raw'] += (self.data_2d[int(idx)]['map_raw'] -
+                                                   self.data_2d[int(idx)]['bg_raw'])
+                elif idx in self.arches['sub_idxs']:
+                    self.arches['sum_int_2d'] -= self.data_2d[int(idx)]['int_2d']
+                    self.arches['sum_map_raw'] -= (self.data_2d[int(idx)]['map_raw'] -
+                                                   self.data_2d[int(idx)]['bg_raw'])
+        except KeyError:
+            pass
 
     def get_arches_sum(self, idxs, idxs_memory):
         # ic()
@@ -609,7 +576,7 @@ class H5Viewer(QWidget):
                 self.arches['sum_map_raw'] += self.data_2d[int(k)]['map_raw']
             except ValueError:
                 self.arches['sum_int_2d'] = self.data_2d[int(k)]['int_2d']
-                self.arches['sum_map_raw'] = self.data_2d[int(k)]['map_raw']
+                self.arches['sum_map_raw'] = self.data_2d[int(k)]['map_raw'].copy()
 
         for k in sub_from_data:
             try:
@@ -617,4 +584,4 @@ class H5Viewer(QWidget):
                 self.arches['sum_map_raw'] -= self.data_2d[int(k)]['map_raw']
             except ValueError:
                 self.arches['sum_int_2d'] = self.data_2d[int(k)]['int_2d']
-                self.arches['sum_map_raw'] = self.data_2d[int(k)]['map_raw']
+                self.arches['sum_map_raw'] = self.data_2d[int(k)]['map_raw'].copy()
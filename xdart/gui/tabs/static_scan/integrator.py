@@ -7,6 +7,7 @@
 import os
 import sys
 import subprocess
+import multiprocessing as mp
 
 import fabio
 from xdart.utils.pyFAI_binaries import pyFAI_drawmask_main
@@ -197,6 +198,10 @@ class integratorTree(Qt.QtWidgets.QWidget):
             self.arches, self.arch_ids, self.data_1d, self.data_2d
         )
 
+        # Worker processes and integration rate
+        self._setup_workers()
+        self.integrator_thread.rate.connect(self._show_rate)
+
         # Connect Calibrate and Mask Buttons
         self.ui.pyfai_calib.clicked.connect(self.run_pyfai_calib)
         self.ui.get_mask.clicked.connect(self.run_pyfai_drawmask)
@@ -207,6 +212,34 @@ class integratorTree(Qt.QtWidgets.QWidget):
         # Connect Axis 2D signal
         self.ui.axis2D.currentIndexChanged.connect(self._update_axes)
 
+    def _setup_workers(self):
+        """Adds worker count spin box and frames per second label next
+        to the calibration and mask buttons.
+        """
+        self.label_workers = Qt.QtWidgets.QLabel(self.ui.frame_3)
+        self.label_workers.setText(_translate("Form", "Workers"))
+        self.workers = Qt.QtWidgets.QSpinBox(self.ui.frame_3)
+        self.workers.setRange(1, max(1, mp.cpu_count()))
+        self.workers.setValue(self.integrator_thread.workers)
+        self.workers.setToolTip(
+            'Number of processes used to integrate all frames')
+        self.workers.valueChanged.connect(self._set_workers)
+        self.label_rate = Qt.QtWidgets.QLabel(self.ui.frame_3)
+        self.label_rate.setMinimumWidth(90)
+
+        self.ui.horizontalLayout_13.addWidget(self.label_workers)
+        self.ui.horizontalLayout_13.addWidget(self.workers)
+        self.ui.horizontalLayout_13.addWidget(self.label_rate)
+
+    def _set_workers(self, n):
+        """Sets number of processes used by integrator_thread."""
+        with self.integrator_thread.lock:
+            self.integrator_thread.workers = n
+
+    def _show_rate(self, rate):
+        """Shows frames per second reported by integrator_thread."""
+        self.label_rate.setText(f'{rate:.1f} frames/s')
+
     def update(self):
         """Grabs args from sphere and uses _sync_ranges and
         _update_params private methods to update.
@@ -843,6 +876,7 @@ class integratorTree(Qt.QtWidgets.QWidget):
             # else:
             #     self.integrator_thread.method = 'bai_1d_SI'
         self.data_1d.clear()
+        self.label_rate.clear()
         self.setEnabled(False)
         self.integrator_thread.start()
 
@@ -858,6 +892,7 @@ class integratorTree(Qt.QtWidgets.QWidget):
             # else:
             #     self.integrator_thread.method = 'bai_2d_SI'
         self.data_2d.clear()
+        self.label_rate.clear()
         self.setEnabled(False)
         self.integrator_thread.start()
 
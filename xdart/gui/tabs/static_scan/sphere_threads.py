@@ -6,6 +6,7 @@
 # Standard library imports
 from queue import Queue
 from threading import Condition
+import time
 import traceback
 import numpy as np
 from scipy.interpolate import RectBivariateSpline
@@ -13,7 +14,8 @@ from scipy.interpolate import RectBivariateSpline
 # Other imports
 from xdart.utils.containers import int_1d_data, int_2d_data
 from xdart.utils.containers import int_1d_data_static, int_2d_data_static
-from xdart.modules.ewald import EwaldArch
+from xdart.modules.ewald import ArchPool
+from xdart.modules.ewald.int_1d_store import Arch1D
 
 # Qt imports
 from pyqtgraph import Qt
@@ -37,13 +39,18 @@ class integratorThread(Qt.QtCore.QThread):
         method: str, which method to call in run
         mg_1d_args, mg_2d_args: dict, arguments for multigeometry
             integration
+        pool: ArchPool or None, worker processes used when workers
+            is more than 1
         sphere: EwaldSphere, object that does the integration.
+        workers: int, number of processes used by bai_1d_all and
+            bai_2d_all
     
     methods:
         bai_1d_all: Calls by arch integration 1D for all arches
         bai_1d_SI: Calls by arch integration 1D for specified arch
         bai_2d_all: Calls by arch integration 2D for all arches
         bai_2d_SI: Calls by arch integration 2D for specified arch
+        close: Stops the worker processes of pool
         load: Loads data 
         mg_1d: multigeometry 1d integration
         mg_2d: multigeometry 2d integration
@@ -52,8 +59,10 @@ class integratorThread(Qt.QtCore.QThread):
         
     signals:
         update: empty, tells parent when new data is ready.
+        rate: float, frames per second integrated so far.
     """
     update = Qt.QtCore.Signal(int)
+    rate = Qt.QtCore.Signal(float)
 
     def __init__(self, sphere, arch, file_lock,
                  arches, arch_ids, data_1d, data_2d,
@@ -70,6 +79,15 @@ class integratorThread(Qt.QtCore.QThread):
         self.lock = Condition()
         self.mg_1d_args = {}
         self.mg_2d_args = {}
+        self.workers = 1
+        self.pool = None
+
+    def close(self):
+        """Stops the worker processes of pool, called when the widget
+        is closed.
+        """
+        if self.pool is not None:
+            self.pool.close()
     
     def run(self):
         """Calls self.method. Catches exception where method does
@@ -93,12 +111,8 @@ class integratorThread(Qt.QtCore.QThread):
                 self.sphere.bai_2d = int_2d_data_static()
             else:
                 self.sphere.bai_2d = int_2d_data()
-        for arch in self.sphere.arches:
-            if self.sphere.static:
-                arch.static = True
-            if self.sphere.gi:
-                arch.gi = True
-            arch.integrate_2d(**self.sphere.bai_2d_args)
+        start = time.time()
+        for n, arch in enumerate(self._integrate_all(2, self.sphere.bai_2d_args)):
             self.sphere.arches[arch.idx] = arch
             self.sphere._update_bai_2d(arch)
 
@@ -109,6 +123,9 @@ class integratorThread(Qt.QtCore.QThread):
                 'int_2d': arch.int_2d
             }
             self.update.emit(arch.idx)
+            self.rate.emit((n + 1) / max(time.time() - start, 1e-9))
+        self.sphere.arches.flush()
+        self.sphere.flush_bai()
         with self.file_lock:
             with catch(self.sphere.data_file, 'a') as file:
                 ut.dict_to_h5(self.sphere.bai_2d_args, file, 'bai_2d_args')
@@ -119,25 +136,78 @@ class integratorThread(Qt.QtCore.QThread):
         after each image.
         """
         self.data_1d.clear()
+        # new results are read from the scan file
+        self.sphere.drop_live()
         with self.sphere.sphere_lock:
             if self.sphere.static:
                 self.sphere.bai_1d = int_1d_data_static()
             else:
                 self.sphere.bai_1d = int_1d_data()
-        for arch in self.sphere.arches:
-            if self.sphere.static:
-                arch.static = True
-            if self.sphere.gi:
-                arch.gi = True
-            arch.integrate_1d(**self.sphere.bai_1d_args)
+        start = time.time()
+        for n, arch in enumerate(self._integrate_all(1, self.sphere.bai_1d_args)):
             self.sphere.arches[arch.idx] = arch
             self.sphere._update_bai_1d(arch)
-            self.data_1d[int(arch.idx)] = arch.copy(include_2d=False)
+            self.data_1d[int(arch.idx)] = Arch1D.from_arch(arch)
             self.update.emit(arch.idx)
+            self.rate.emit((n + 1) / max(time.time() - start, 1e-9))
+        self.sphere.arches.flush()
+        self.sphere.flush_bai()
         with self.file_lock:
             with catch(self.sphere.data_file, 'a') as file:
                 ut.dict_to_h5(self.sphere.bai_1d_args, file, 'bai_1d_args')
 
+    def _sphere_arches(self):
+        """Yields arches of the sphere with static and gi flags set.
+        """
+        for arch in self.sphere.arches:
+            if self.sphere.static:
+                arch.static = True
+            if self.sphere.gi:
+                arch.gi = True
+            yield arch
+
+    def _integrate_all(self, dim, args):
+        """Integrates every arch of the sphere, in this thread or in
+        the process pool if workers is more than 1. Arches are yielded
+        as they finish, and only this thread writes to the data file.
+
+        args:
+            dim: int, 1 or 2
+            args: dict, bai_1d_args or bai_2d_args
+
+        yields:
+            arch: EwaldArch, with int_1d or int_2d updated
+        """
+        if self.workers <= 1:
+            for arch in self._sphere_arches():
+                if dim == 1:
+                    arch.integrate_1d(**args)
+                else:
+                    arch.integrate_2d(**args)
+                yield arch
+            return
+
+        if self.pool is None or self.pool.workers != self.workers:
+            if self.pool is not None:
+                self.pool.shutdown()
+            self.pool = ArchPool(self.workers)
+
+        sent = {}
+
+        def submit():
+            for arch in self._sphere_arches():
+                sent[arch.idx] = arch
+                yield arch
+
+        for idx, map_norm, result in self.pool.imap(submit(), dim, args):
+            arch = sent.pop(idx)
+            arch.map_norm = map_norm
+            if dim == 1:
+                arch.int_1d = result
+            else:
+                arch.int_2d = result
+            yield arch
+
     def bai_2d_SI(self):
         """Integrate the current arch, 2d
         """
@@ -163,12 +233,13 @@ class integratorThread(Qt.QtCore.QThread):
         idxs = self.arch_ids
         if 'Overall' in self.arch_ids:
             idxs = self.sphere.arches.index
+        self.sphere.drop_live()
         # for (idx, arch) in self.arches.items():
         for idx in idxs:
             # self.sphere.arches[arch].integrate_1d(**self.sphere.bai_1d_args)
             self.sphere.arches[int(idx)].integrate_1d(**self.sphere.bai_1d_args)
             arch = self.sphere.arches[int(idx)]
-            self.data_1d[int(arch.idx)] = arch.copy(include_2d=False)
+            self.data_1d[int(arch.idx)] = Arch1D.from_arch(arch)
             self.update.emit(arch.idx)
 
     def load(self):
@@ -248,41 +319,48 @@ class fileHandlerThread(Qt.QtCore.QThread):
 
     def load_arches(self):
         # ic()
+        fields = ['int_1d', 'meta']
+        arch_ids = list(self.arch_ids)
+        if self.update_2d:
+            fields += ['raw', 'mask', 'int_2d']
+        else:
+            # frames of a scan being written come from the live file,
+            # without waiting for the file lock
+            live = self.sphere.live_arches(arch_ids)
+            for arch in live:
+                self.data_1d[int(arch.idx)] = arch
+            done = set(arch.idx for arch in live)
+            arch_ids = [idx for idx in arch_ids if idx not in done]
+            if not arch_ids:
+                self.sigUpdate.emit()
+                return
         with self.file_lock:
-            with catch(self.sphere.data_file, 'r') as file:
-                # ic(self.arch_ids)
-                for idx in self.arch_ids:
-                    try:
-                        # ic(idx)
-                        arch = EwaldArch(idx=idx, static=True, gi=self.sphere.gi)
-                        arch.load_from_h5(file['arches'], load_2d=self.update_2d)
-                        self.data_1d[int(idx)] = arch.copy(include_2d=False)
-                        # ic('loaded 1D data', self.data_1d.keys())
-                        if self.update_2d:
-                            try:
-                                if len(arch.int_2d.i_qChi) == 0:
-                                    pass
-                            except TypeError:
-                                arch.load_from_h5(file['arches'], load_2d=self.update_2d)
-
-                            self.data_2d[int(idx)] = {'map_raw': arch.map_raw,
-                                                      'bg_raw': arch.bg_raw,
-                                                      'mask': arch.mask,
-                                                      'int_2d': arch.int_2d}
-
-                            if idx in self.arches['add_idxs']:
-                                self.arches['sum_int_2d'] += self.data_2d[int(idx)]['int_2d']
-                                # self.arches['sum_map_raw'] += self.data_2d[int(idx)]['map_raw']
-                                self.arches['sum_map_raw'] += (self.data_2d[int(idx)]['map_raw'] -
-                                                               self.data_2d[int(idx)]['bg_raw'])
-                            elif idx in self.arches['sub_idxs']:
-                                self.arches['sum_int_2d'] -= self.data_2d[int(idx)]['int_2d']
-                                # self.arches['sum_map_raw'] -= self.data_2d[int(idx)]['map_raw']
-                                self.arches['sum_map_raw'] -= (self.data_2d[int(idx)]['map_raw'] -
-                                                               self.data_2d[int(idx)]['bg_raw'])
-
-                    except KeyError:
-                        pass
+            try:
+                arches = self.sphere.arches.read(arch_ids, fields)
+            except KeyError:
+                arches = []
+            try:
+                for arch in arches:
+                    idx = arch.idx
+                    self.data_1d[int(idx)] = arch
+                    if not self.update_2d:
+                        continue
+
+                    self.data_2d[int(idx)] = {'map_raw': arch.map_raw,
+                                              'bg_raw': arch.bg_raw,
+                                              'mask': arch.mask,
+                                              'int_2d': arch.int_2d}
+
+                    if idx in self.arches['add_idxs']:
+                        self.arches['sum_int_2d'] += self.data_2d[int(idx)]['int_2d']
+                        self.arches['sum_map_raw'] += (self.data_2d[int(idx)]['map_raw'] -
+                                                       self.data_2d[int(idx)]['bg_raw'])
+                    elif idx in self.arches['sub_idxs']:
+                        self.arches['sum_int_2d'] -= self.data_2d[int(idx)]['int_2d']
+                        self.arches['sum_map_raw'] -= (self.data_2d[int(idx)]['map_raw'] -
+                                                       self.data_2d[int(idx)]['bg_raw'])
+            except KeyError:
+                pass
 
             # ic(self.data_1d.keys(), self.data_2d.keys(), self.arches.keys())
             self.sigUpdate.emit()
@@ -18,6 +18,7 @@ from pyqtgraph.Qt import QtWidgets, QtCore
 
 # This module imports
 from xdart.modules.ewald import EwaldSphere, EwaldArch
+from xdart.modules.ewald.int_1d_store import Int1DStore
 from .ui.staticUI import Ui_Form
 from .h5viewer import H5Viewer
 from .display_frame_widget import displayFrameWidget
@@ -76,7 +77,7 @@ class staticWidget(QWidget):
         arch: EwaldArch, currently loaded arch object
         arch_ids: List of EwaldArch indices currently loaded
         arches: Dictionary of currently loaded EwaldArches
-        data_1d: Dictionary object holding all 1D data in memory
+        data_1d: Int1DStore, 1D data of all frames held in memory
         data_2d: Dictionary object holding all 2D data in memory
         command_queue: Queue, used to send commands to wrangler
         dirname: str, absolute path of current directory for scan
@@ -116,11 +117,13 @@ class staticWidget(QWidget):
         self.fname = os.path.join(self.dirname, 'default.hdf5')
         self.sphere = EwaldSphere('null_main',
                                   data_file=self.fname,
-                                  static=True)
+                                  static=True,
+                                  bai_save_frames=None,
+                                  bai_save_interval=2.0)
         self.arch = EwaldArch(static=True, gi=self.sphere.gi)
         self.arch_ids = []
         self.arches = OrderedDict()
-        self.data_1d = OrderedDict()
+        self.data_1d = Int1DStore()
         self.data_2d = FixSizeOrderedDict(max=10)
 
         self.ui = Ui_Form()
@@ -369,6 +372,7 @@ class staticWidget(QWidget):
         """Tries a graceful close.
         """
         # ic()
+        self.integratorTree.integrator_thread.close()
         del self.sphere
         del self.displayframe.sphere
         del self.arch
@@ -1020,6 +1020,8 @@ class specThread(wranglerThread):
 
             # Initialize sphere and save to disk, send update for new scan
             if (sphere is None) or (self.scan_name != sphere.name):
+                if sphere is not None:
+                    sphere.close_live()
                 sphere = self.initialize_sphere()
 
             if img_number in list(sphere.arches.index):
@@ -1073,6 +1075,9 @@ class specThread(wranglerThread):
             time.sleep(0.02)
             start = time.time()
 
+        if sphere is not None:
+            sphere.close_live()
+
         # If loop ends, signal terminate to parent thread.
         print(f'\nTotal Files Processed: {files_processed}')
 
@@ -1187,6 +1192,7 @@ class specThread(wranglerThread):
                              series_average=self.series_average,
                              single_img=self.single_img,
                              global_mask=self.mask,
+                             live=True,
                              **self.sphere_args)
 
         write_mode = self.write_mode
@@ -97,6 +97,7 @@ class integratorThread(Qt.QtCore.QThread):
             # self.sphere.arches[arch.idx] = arch
             self.sphere._update_bai_2d(arch)
             self.update.emit(arch.idx)
+        self.sphere.flush_bai()
         with self.file_lock:
             with catch(self.sphere.data_file, 'a') as file:
                 ut.dict_to_h5(self.sphere.bai_2d_args, file, 'bai_2d_args')
@@ -118,6 +119,7 @@ class integratorThread(Qt.QtCore.QThread):
             # self.sphere.arches[arch.idx] = arch
             self.sphere._update_bai_1d(arch)
             self.update.emit(arch.idx)
+        self.sphere.flush_bai()
         with self.file_lock:
             with catch(self.sphere.data_file, 'a') as file:
                 ut.dict_to_h5(self.sphere.bai_1d_args, file, 'bai_1d_args')
@@ -103,7 +103,9 @@ class tthetaWidget(QWidget):
         if not os.path.isdir(dirname):
             os.mkdir(dirname)
         self.fname = os.path.join(dirname, 'default.hdf5')
-        self.sphere = EwaldSphere('null_main', data_file=self.fname)
+        self.sphere = EwaldSphere('null_main', data_file=self.fname,
+                                  bai_save_frames=None,
+                                  bai_save_interval=2.0)
         self.sphere.file_lock = self.file_lock
         self.arch = EwaldArch()
 
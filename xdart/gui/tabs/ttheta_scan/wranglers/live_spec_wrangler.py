@@ -545,6 +545,7 @@ class liveSpecProcess(wranglerProcess):
         
         # Initialize MakePONI
         self.scan_name = None
+        sphere = None
         make_poni = MakePONI()
         make_poni.inputs.update(self.mp_inputs)
         
@@ -555,6 +556,9 @@ class liveSpecProcess(wranglerProcess):
                 added = q.get()
                 self.signal_q.put(('message', added))
                 if added == 'BREAK':
+                    if sphere is not None:
+                        with self.file_lock:
+                            sphere.flush_bai()
                     self.signal_q.put(('TERMINATE', None))
                     return
                 elif key == 'pdi':
@@ -568,12 +572,17 @@ class liveSpecProcess(wranglerProcess):
             
             # If new scan has started, create new sphere object
             if scan_name != self.scan_name:
+                if sphere is not None:
+                    with self.file_lock:
+                        sphere.flush_bai()
                 self.scan_name = scan_name
                 sphere = EwaldSphere(
                     name=scan_name,
                     data_file = os.path.join(
                         self.out_dir, scan_name + ".hdf5"
                     ),
+                    bai_save_frames=None, bai_save_interval=1.0,
+                    scan_stats=True,
                     **self.sphere_args
                 )
                 sphere.global_mask = self.mask
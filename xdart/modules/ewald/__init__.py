@@ -1,3 +1,6 @@
 from .sphere import EwaldSphere
 from .sphere import get_1D_data
 from .arch import EwaldArch
+from .integrator_cache import get_integrator, integrator_cache
+from .arch_pool import ArchPool
+from .mask_cache import mask_cache
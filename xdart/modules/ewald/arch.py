@@ -7,14 +7,15 @@ Created on Mon Aug 26 14:21:58 2019
 import copy
 from threading import Condition
 
-from pyFAI.azimuthalIntegrator import AzimuthalIntegrator
 from pyFAI.containers import Integrate1dResult, Integrate2dResult
 from pyFAI import units
 import numpy as np
 
 from xdart import utils
-from xdart.utils.containers import PONI, int_1d_data, int_2d_data, create_ai_from_dict
+from xdart.utils.containers import PONI, int_1d_data, int_2d_data
 from xdart.utils.containers import int_1d_data_static, int_2d_data_static
+from .integrator_cache import get_integrator
+from .mask_cache import get_mask, negative_pixels, pyfai_mask
 
 from icecream import ic; ic.configureOutput(prefix='', includeContext=True)
 
@@ -90,7 +91,7 @@ class EwaldArch():
             self.poni = poni
         self.poni_dict = poni_dict
         if mask is None and map_raw is not None:
-            self.mask = np.arange(map_raw.size)[map_raw.flatten() < 0]
+            self.mask = negative_pixels(map_raw)
         else:
             self.mask = mask
         self.scan_info = scan_info
@@ -116,26 +117,33 @@ class EwaldArch():
             self.int_2d = int_2d_data()
 
     def setup_integrator(self):
-        """Sets up integrator object"""
-        # if self.poni_dict is not None:
+        """Gets integrator object from the shared integrator cache, so
+        arches with the same geometry share one integrator. In gi mode
+        the incident and tilt angles are part of the geometry, the
+        shared transform must not be modified."""
         if self.static:
-            if self.poni_dict is not None:
-                integrator = create_ai_from_dict(self.poni_dict, self.gi)
-            else:
-                integrator = AzimuthalIntegrator()
-        else:
-            integrator = AzimuthalIntegrator(
-                dist=self.poni.dist,
-                poni1=self.poni.poni1,
-                poni2=self.poni.poni2,
-                rot1=self.poni.rot1,
-                rot2=self.poni.rot2,
-                rot3=self.poni.rot3,
-                wavelength=self.poni.wavelength,
-                detector=self.poni.detector,
-                **self.ai_args
-            )
-        return integrator
+            return get_integrator(poni_dict=self.poni_dict, gi=self.gi,
+                                  gi_angles=self.gi_angles())
+        return get_integrator(poni=self.poni, ai_args=self.ai_args)
+
+    def gi_angles(self):
+        """Returns (incident_angle, tilt_angle) in degrees for gi
+        mode, None if not in gi mode. The incident angle is th_mtr if
+        it is a number, else the th_mtr value in scan_info, None if
+        neither is known.
+        """
+        if not self.gi:
+            return None
+        # incident angle in deg
+        try:
+            incident_angle = float(self.th_mtr)
+        except (TypeError, ValueError):
+            try:
+                incident_angle = float(self.scan_info[self.th_mtr])
+            except (KeyError, TypeError, ValueError):
+                incident_angle = None
+        # tilt angle of sample in deg (misalignment in "chi")
+        return incident_angle, self.tilt_angle
 
     def reset(self):
         """Clears all data, resets to a default EwaldArch.
@@ -157,18 +165,23 @@ class EwaldArch():
             self.int_2d = int_2d_data()
             
     def get_mask(self, global_mask=None):
-        if global_mask is not None:
-            mask_idx = np.unique(np.append(self.mask, global_mask))
-            # mask_idx.sort()
-        else:
-            mask_idx = self.mask
-        mask = np.zeros(self.map_raw.size, dtype=int)
+        """Returns the union of mask and global_mask as an array with
+        the shape of map_raw, 1 for masked pixels. The array comes from
+        the shared mask cache, frames with the same masks get the same
+        array, so it is read only. Use pyfai_mask to pass it to pyFAI.
+
+        args:
+            global_mask: numpy array or None, flat indices of pixels
+                masked for the whole scan
+
+        returns:
+            mask: numpy int8 array
+        """
         try:
-            mask[mask_idx] = 1
-            return mask.reshape(self.map_raw.shape)
+            return get_mask(self.map_raw.shape, self.mask, global_mask)
         except IndexError:
             print('Mask File Shape Mismatch')
-            return mask
+            return np.zeros(self.map_raw.shape, dtype=np.int8)
 
     def integrate_1d(self, numpoints=10000, radial_range=None,
                      monitor=None, unit=units.TTH_DEG, global_mask=None, **kwargs):
@@ -198,13 +211,13 @@ class EwaldArch():
                     self.map_norm = self.scan_info[monitor.lower()]
 
             if self.mask is None:
-                self.mask = np.arange(self.map_raw.size)[self.map_raw.flatten() < 0]
+                self.mask = negative_pixels(self.map_raw)
 
             if not self.gi:
                 result = self.integrator.integrate1d(
                     # self.map_raw/self.map_norm, numpoints, unit=unit,
                     (self.map_raw-self.bg_raw)/self.map_norm, numpoints, unit=unit,
-                    radial_range=radial_range, mask=self.get_mask(global_mask),
+                    radial_range=radial_range, mask=pyfai_mask(self.get_mask(global_mask)),
                     **kwargs
                 )
 
@@ -218,24 +231,15 @@ class EwaldArch():
                            'method', 'safe', 'normalization_factor']
                 pg_args = {k: v for (k, v) in kwargs.items() if k in pg_args}
 
-                # incident angle in deg
-                try:
-                    self.integrator.incident_angle = float(self.th_mtr)
-                except ValueError:
-                    try:
-                        self.integrator.incident_angle = self.scan_info[self.th_mtr]
-                    except KeyError:
-                        pass
-
-                # ic(self.integrator.incident_angle)
-                # tilt angle of sample in deg (misalignment in "chi")
-                self.integrator.tilt_angle = self.tilt_angle
+                # transform for the angles of this arch, see gi_angles
+                self.integrator = self.setup_integrator()
+                mask = pyfai_mask(self.get_mask(global_mask))
 
                 Intensity, qAxis = self.integrator.integrate_1d(
                     # self.map_raw/self.map_norm, numpoints, unit='q_A^-1',
                     (self.map_raw-self.bg_raw)/self.map_norm, numpoints, unit='q_A^-1',
                     p0_range=radial_range, p1_range=kwargs['azimuth_range'],
-                    mask=self.get_mask(global_mask), **pg_args
+                    mask=mask, **pg_args
                 )
                 result = Integrate1dResult(qAxis, Intensity)
                 self.int_1d.from_result(result, self.integrator.wavelength, unit='q_A^-1')
@@ -246,7 +250,7 @@ class EwaldArch():
                     (self.map_raw-self.bg_raw)/self.map_norm, numpoints, unit='q_A^-1',
                     ip_width=360.,
                     # p0_range=radial_range, p1_range=kwargs['azimuth_range'],
-                    mask=self.get_mask(global_mask), **pg_args
+                    mask=mask, **pg_args
                 )
                 self.int_1d.i_qz, self.int_1d.qz = i_qz, qz
 
@@ -254,7 +258,7 @@ class EwaldArch():
                     (self.map_raw-self.bg_raw)/self.map_norm, numpoints, unit='q_A^-1',
                     op_width=360.,
                     # p0_range=radial_range, p1_range=kwargs['azimuth_range'],
-                    mask=self.get_mask(global_mask), **pg_args
+                    mask=mask, **pg_args
                 )
                 self.int_1d.i_qxy, self.int_1d.qxy = i_qxy, qxy
 
@@ -304,7 +308,7 @@ class EwaldArch():
                     # self.map_norm = self.scan_info[monitor]
 
             if self.mask is None:
-                self.mask = np.arange(self.map_raw.size)[self.map_raw.flatten() < 0]
+                self.mask = negative_pixels(self.map_raw)
             
             if npt_rad is None:
                 npt_rad = self.map_raw.shape[0]
@@ -316,7 +320,7 @@ class EwaldArch():
                 result = self.integrator.integrate2d(
                     # self.map_raw/self.map_norm, npt_rad, npt_azim, unit=unit,
                     (self.map_raw-self.bg_raw)/self.map_norm, npt_rad, npt_azim, unit=unit,
-                    mask=self.get_mask(global_mask), radial_range=radial_range,
+                    mask=pyfai_mask(self.get_mask(global_mask)), radial_range=radial_range,
                     azimuth_range=azimuth_range, **kwargs
                 )
                 wavelength = self.poni.wavelength
@@ -329,19 +333,8 @@ class EwaldArch():
                            'method', 'safe', 'normalization_factor']
                 pg_args = {k: v for (k, v) in kwargs.items() if k in pg_args}
 
-                # incident angle in deg
-                try:
-                    self.integrator.incident_angle = float(self.th_mtr)
-                except ValueError:
-                    try:
-                        self.integrator.incident_angle = self.scan_info[self.th_mtr]
-                    except KeyError:
-                        pass
-
-                # ic(self.integrator.incident_angle)
-
-                # tilt angle of sample in deg (misalignment in "chi")
-                self.integrator.tilt_angle = self.tilt_angle
+                # transform for the angles of this arch, see gi_angles
+                self.integrator = self.setup_integrator()
 
                 if unit == '2th_deg':
                     radial_range = self.convert_radial_range(radial_range, self.integrator.wavelength)
@@ -350,14 +343,14 @@ class EwaldArch():
                 i_qchi, Q, Chi = self.integrator.transform_image(
                     self.map_raw-self.bg_raw, process='polar', npt=(npt_rad, npt_azim),
                     x_range=radial_range, y_range=azimuth_range, unit='q_A^-1',
-                    mask=self.get_mask(global_mask), all=False, **pg_args)
+                    mask=pyfai_mask(self.get_mask(global_mask)), all=False, **pg_args)
                 result = Integrate2dResult(i_qchi, Q, Chi)
 
                 # Transform to reciprocal (Qz-Qxy) coordinates
                 i_QxyQz, qxy, qz = self.integrator.transform_image(
                     self.map_raw-self.bg_raw, process='reciprocal', npt=(npt_rad, npt_azim),
                     x_range=x_range, y_range=y_range, unit='q_A^-1',
-                    mask=self.get_mask(), all=False, **pg_args)
+                    mask=pyfai_mask(self.get_mask()), all=False, **pg_args)
 
                 self.int_2d.from_result(result, self.integrator.wavelength, unit=unit,
                                         i_QxyQz=np.flipud(i_QxyQz), qz=qz, qxy=qxy)
@@ -381,7 +374,7 @@ class EwaldArch():
         with self.arch_lock:
             self.map_raw = new_data
             if self.mask is None:
-                self.mask = np.arange(new_data.size)[new_data.flatten() < 0]
+                self.mask = negative_pixels(new_data)
 
     def set_poni(self, new_data):
         with self.arch_lock:
@@ -467,18 +460,13 @@ class EwaldArch():
                             )
 
                             if self.poni_dict is not None:
-                                self.integrator = create_ai_from_dict(self.poni_dict)
+                                self.integrator = get_integrator(
+                                    poni_dict=self.poni_dict, gi=self.gi,
+                                    gi_angles=self.gi_angles()
+                                )
                             else:
-                                self.integrator = AzimuthalIntegrator(
-                                    dist=self.poni.dist,
-                                    poni1=self.poni.poni1,
-                                    poni2=self.poni.poni2,
-                                    rot1=self.poni.rot1,
-                                    rot2=self.poni.rot2,
-                                    rot3=self.poni.rot3,
-                                    wavelength=self.poni.wavelength,
-                                    detector=self.poni.detector,
-                                    **self.ai_args
+                                self.integrator = get_integrator(
+                                    poni=self.poni, ai_args=self.ai_args
                                 )
 
     def copy(self, include_2d=True):
@@ -493,7 +481,8 @@ class EwaldArch():
             th_mtr=copy.deepcopy(self.th_mtr),
             series_average=copy.deepcopy(self.series_average)
         )
-        arch_copy.integrator = copy.deepcopy(self.integrator)
+        # integrators are shared through the integrator cache
+        arch_copy.integrator = self.integrator
         arch_copy.arch_lock = Condition()
         arch_copy.int_1d = copy.deepcopy(self.int_1d)
         if include_2d:
@@ -504,3 +493,142 @@ class EwaldArch():
             arch_copy.int_2d = copy.deepcopy(self.int_2d)
 
         return arch_copy
+
+
+class LazyArch(EwaldArch):
+    """EwaldArch whose data is read from the hdf5 file the first time
+    it is used, one group of fields at a time. Handed out by
+    ArchSeries so callers that only need int_1d or scan_info do not
+    read raw images or build an integrator.
+
+    Fields:
+        raw: map_raw, bg_raw, map_norm
+        mask: mask
+        int_1d: int_1d
+        int_2d: int_2d
+        meta: scan_info, ai_args, poni_dict, poni, gi, static
+
+    Attributes set on the arch before a field is loaded are kept, the
+    integrator is created on first access. gi and static are given
+    when the arch is made and replaced by the values saved in the file
+    when meta is loaded, as in load_from_h5. int_1d and int_2d loaded
+    before meta use the static flag saved in the file. If on_load is set it is
+    called with the arch after fields are loaded.
+
+    methods:
+        load: read fields from file, all fields by default
+    """
+    fields = {
+        'raw': ('map_raw', 'bg_raw', 'map_norm'),
+        'mask': ('mask',),
+        'int_1d': ('int_1d',),
+        'int_2d': ('int_2d',),
+        'meta': ('scan_info', 'ai_args', 'poni_dict', 'poni', 'gi',
+                 'static'),
+    }
+    # set in __init__, replaced by the saved values with meta
+    flags = ('gi', 'static')
+    defaults = {
+        'map_raw': None, 'bg_raw': 0, 'map_norm': 1, 'mask': None,
+        'scan_info': {}, 'ai_args': {}, 'poni_dict': None,
+    }
+
+    def __init__(self, idx, data_file, file_lock=None, static=False,
+                 gi=False, th_mtr='th', tilt_angle=0, series_average=False):
+        """idx: int, name of the arch.
+        data_file: str, hdf5 file holding the arch in its arches group
+        file_lock: Condition or None, lock for file access, a new lock
+            if None.
+        static, gi: bool, used until meta is loaded from the file
+        """
+        # EwaldArch.__init__ is skipped on purpose, fields are loaded
+        # on first access by __getattr__
+        self.idx = idx
+        self._data_file = data_file
+        self._loaded = set()
+        if file_lock is None:
+            file_lock = Condition()
+        self.file_lock = file_lock
+        self.arch_lock = Condition()
+        self.static = static
+        self.gi = gi
+        self.th_mtr = th_mtr
+        self.tilt_angle = tilt_angle
+        self.series_average = series_average
+        self.on_load = None
+
+    def __getattr__(self, name):
+        """Only called for attributes which are not set yet, loads the
+        field holding name.
+        """
+        if name == 'integrator':
+            self.integrator = self.setup_integrator()
+            return self.integrator
+        loaded = self.__dict__.get('_loaded')
+        for field, names in LazyArch.fields.items():
+            if name in names and loaded is not None and field not in loaded:
+                self.load(field)
+                return self.__dict__[name]
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{name}'"
+        )
+
+    def load(self, *fields, grp=None):
+        """Reads fields from file.
+
+        args:
+            fields: str, names of fields, see class docstring. All
+                fields if none are given.
+            grp: h5py group of the arch, the data file is opened if
+                not provided.
+        """
+        if not fields:
+            fields = tuple(LazyArch.fields)
+        fields = [f for f in fields if f not in self._loaded]
+        if not fields:
+            return
+        if grp is not None:
+            self._load_fields(grp, fields)
+            return
+        with self.file_lock:
+            with utils.catch_h5py_file(self._data_file, 'r') as file:
+                grp = file['arches'].get(str(self.idx))
+                self._load_fields(grp, fields)
+
+    def _load_fields(self, grp, fields):
+        """Sets attributes of fields from grp, missing data gets the
+        same defaults as a new EwaldArch.
+        """
+        with self.arch_lock:
+            static = self.static
+            if ('meta' not in self._loaded and grp is not None
+                    and 'static' in grp):
+                static = utils.h5_to_data(grp['static'])
+            for field in fields:
+                for name in LazyArch.fields[field]:
+                    if name in LazyArch.flags:
+                        if grp is not None and name in grp:
+                            setattr(self, name, utils.h5_to_data(grp[name]))
+                        continue
+                    if name in self.__dict__:
+                        continue
+                    if name == 'int_1d':
+                        val = int_1d_data_static() if static else int_1d_data()
+                        if grp is not None and name in grp:
+                            val.from_hdf5(grp[name])
+                    elif name == 'int_2d':
+                        val = int_2d_data_static() if static else int_2d_data()
+                        if grp is not None and name in grp:
+                            val.from_hdf5(grp[name])
+                    elif name == 'poni':
+                        val = PONI()
+                        if grp is not None and name in grp:
+                            val = PONI.from_yamdict(utils.h5_to_dict(grp[name]))
+                    elif grp is not None and name in grp:
+                        val = utils.h5_to_data(grp[name])
+                    else:
+                        val = copy.copy(LazyArch.defaults[name])
+                    setattr(self, name, val)
+                self._loaded.add(field)
+        if self.on_load is not None:
+            self.on_load(self)
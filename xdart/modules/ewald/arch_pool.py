@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+@author: thampy, walroth
+"""
+
+# Standard library imports
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing as mp
+
+# Other imports
+
+# This module imports
+from .arch import EwaldArch
+
+
+class ArchPool():
+    """Pool of worker processes which integrate arches of a scan in
+    parallel. Each worker keeps its own integrator cache, so the
+    integrator for a geometry is only built once per process. Results
+    are returned to the calling thread, which stays the only writer to
+    the data file.
+
+    attributes:
+        workers: int, number of worker processes
+        max_pending: int, number of arches sent to the workers at once,
+            bounds the memory used by frames in flight
+
+    methods:
+        imap: integrate arches, yielding results in completion order
+        close: stop the worker processes without waiting for them
+        shutdown: stop the worker processes
+    """
+    def __init__(self, workers=1, max_pending=None):
+        """workers: int, number of processes
+        max_pending: int or None, arches in flight, defaults to twice
+            the number of workers.
+        """
+        self.workers = max(1, int(workers))
+        if max_pending is None:
+            max_pending = 2 * self.workers
+        self.max_pending = max_pending
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn avoids forking the threads of the gui process
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=mp.get_context('spawn')
+            )
+        return self._executor
+
+    def imap(self, arches, dim, args):
+        """Integrates each arch in a worker process.
+
+        args:
+            arches: iterable of EwaldArch
+            dim: int, 1 or 2 for integrate_1d or integrate_2d
+            args: dict, arguments for integrate_1d or integrate_2d
+
+        yields:
+            idx: arch idx
+            map_norm: float, normalization used for the arch
+            result: int_1d_data(_static) or int_2d_data(_static)
+        """
+        executor = self._get_executor()
+        pending = set()
+        for arch in arches:
+            pending.add(executor.submit(integrate_task,
+                                        make_task(arch, dim, args)))
+            if len(pending) >= self.max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+    def close(self):
+        """Stops the worker processes without waiting, arches not yet
+        started are cancelled. The pool starts new workers if imap is
+        called again.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def shutdown(self):
+        """Stops the worker processes.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+def make_task(arch, dim, args):
+    """Packs the data a worker needs to integrate arch.
+
+    args:
+        arch: EwaldArch
+        dim: int, 1 or 2
+        args: dict, arguments for integrate_1d or integrate_2d
+
+    returns:
+        task: dict, picklable description of the integration
+    """
+    return {
+        'idx': arch.idx,
+        'map_raw': arch.map_raw,
+        'bg_raw': arch.bg_raw,
+        'mask': arch.mask,
+        'scan_info': arch.scan_info,
+        'poni': arch.poni,
+        'poni_dict': arch.poni_dict,
+        'ai_args': arch.ai_args,
+        'static': arch.static,
+        'gi': arch.gi,
+        'th_mtr': arch.th_mtr,
+        'tilt_angle': arch.tilt_angle,
+        'map_norm': arch.map_norm,
+        'dim': dim,
+        'args': args,
+    }
+
+
+def integrate_task(task):
+    """Worker side of ArchPool, rebuilds the arch and integrates it.
+
+    args:
+        task: dict, see make_task
+
+    returns:
+        idx: arch idx
+        map_norm: float, normalization used for the arch
+        result: int_1d_data(_static) or int_2d_data(_static)
+    """
+    arch = EwaldArch(
+        idx=task['idx'], map_raw=task['map_raw'], poni=task['poni'],
+        mask=task['mask'], scan_info=task['scan_info'],
+        ai_args=task['ai_args'], static=task['static'],
+        poni_dict=task['poni_dict'], bg_raw=task['bg_raw'],
+        gi=task['gi'], th_mtr=task['th_mtr'],
+        tilt_angle=task['tilt_angle']
+    )
+    arch.map_norm = task['map_norm']
+    if task['dim'] == 1:
+        arch.integrate_1d(**task['args'])
+        return arch.idx, arch.map_norm, arch.int_1d
+    arch.integrate_2d(**task['args'])
+    return arch.idx, arch.map_norm, arch.int_2d
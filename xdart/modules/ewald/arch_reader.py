@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import os
+import zlib
+
+# Other imports
+import numpy as np
+
+# This module imports
+from xdart import utils
+from xdart.utils.containers import int_1d_data_static, int_2d_data_static
+from .arch import LazyArch
+
+
+class ArchReader():
+    """Reads fields of many arches of a scan file in one batch, for
+    viewers showing a selection of frames. No integrators are built,
+    the arches returned are LazyArch objects with the fields set.
+
+    A selection is resolved to a read plan with the file open once.
+    The numeric arrays of the raw, int_1d and int_2d fields of static
+    arches are grouped by name, shape and type, and each group is read
+    into one preallocated array, so frames share a block of memory
+    instead of one allocation per dataset. Arrays saved with gzip are
+    read as raw chunks and decompressed on a thread pool after the
+    file is closed, since h5py serializes all other reads. Of the meta
+    field only scan_info, gi and static are read, the geometry is read
+    from the file if it is used, as viewers only need it for one frame.
+    Other fields are read as in LazyArch.load, with yaml data such as
+    the detector decoded once per batch and shared by the arches.
+
+    attributes:
+        max_workers: int, threads used to decompress chunks
+        series: ArchSeries, arches to read
+
+    methods:
+        read: returns arches with fields loaded
+    """
+    def __init__(self, series, max_workers=None):
+        """series: ArchSeries, arches to read
+        max_workers: int or None, decompression threads, defaults to
+            the number of cpus up to 8
+        """
+        self.series = series
+        if max_workers is None:
+            max_workers = min(8, os.cpu_count() or 1)
+        self.max_workers = max_workers
+
+    def read(self, idxs, fields=('int_1d', 'meta')):
+        """Reads fields of arches idxs. Arches held in the cache of the
+        series are taken from memory, arches missing from the file are
+        skipped.
+
+        args:
+            idxs: list, arch idx to read
+            fields: list of str, fields to read, see LazyArch
+
+        returns:
+            arches: list of LazyArch, in the order of idxs
+        """
+        series = self.series
+        arches = {}
+        plan = []
+        with series.file_lock, utils.shared_yaml_loads():
+            with utils.catch_h5py_file(series.data_file, 'r') as f:
+                for idx in idxs:
+                    if series.cache is not None:
+                        cached = series.cache.get(idx)
+                        if cached is not None:
+                            arches[idx] = _from_arch(series, cached, fields)
+                            continue
+                    grp = f['arches'].get(str(idx))
+                    if grp is None:
+                        continue
+                    arches[idx] = self._plan_arch(idx, grp, fields, plan)
+                items = _allocate(plan)
+                jobs = _execute(items)
+        _decode_all(jobs, self.max_workers)
+        _assign(items)
+        return [arches[idx] for idx in idxs if idx in arches]
+
+    def _plan_arch(self, idx, grp, fields, plan):
+        """Makes the LazyArch for grp, reads its small fields and adds
+        its arrays to plan.
+        """
+        series = self.series
+        arch = LazyArch(idx, series.data_file, series.file_lock,
+                        static=series.static, gi=series.gi)
+        rest = []
+        for field in fields:
+            if field == 'raw':
+                for name in LazyArch.fields['raw']:
+                    dset = grp.get(name)
+                    if dset is not None:
+                        _plan_data(arch, name, dset, 'raw/' + name, plan)
+                    else:
+                        setattr(arch, name, copy.copy(LazyArch.defaults[name]))
+                arch._loaded.add(field)
+            elif field in ('int_1d', 'int_2d') and series.static:
+                if field == 'int_1d':
+                    val = int_1d_data_static()
+                else:
+                    val = int_2d_data_static()
+                sub = grp.get(field)
+                if sub is not None:
+                    for name in list(val.__dict__):
+                        dset = sub.get(name)
+                        if dset is not None:
+                            _plan_data(val, name, dset, field + '/' + name,
+                                       plan)
+                setattr(arch, field, val)
+                arch._loaded.add(field)
+            elif field == 'meta':
+                if 'scan_info' in grp:
+                    arch.scan_info = utils.h5_to_data(grp['scan_info'])
+                else:
+                    arch.scan_info = {}
+                for name in LazyArch.flags:
+                    if name in grp:
+                        setattr(arch, name, utils.h5_to_data(grp[name]))
+            else:
+                rest.append(field)
+        if rest:
+            arch._load_fields(grp, rest)
+        return arch
+
+
+def _from_arch(series, arch, fields):
+    """LazyArch with the fields of an arch held in memory. Arrays are
+    shared, int_1d and scan_info are copied.
+    """
+    out = LazyArch(arch.idx, series.data_file, series.file_lock,
+                   static=series.static, gi=series.gi)
+    for field in fields:
+        for name in LazyArch.fields[field]:
+            val = getattr(arch, name)
+            if name in ('int_1d', 'scan_info'):
+                val = copy.deepcopy(val)
+            setattr(out, name, val)
+        out._loaded.add(field)
+    return out
+
+
+def _plan_data(obj, name, dset, key, plan):
+    """Adds dataset dset to plan if it is a numeric array, otherwise
+    reads it and sets it on obj right away.
+    """
+    if (hasattr(dset, 'dtype') and dset.attrs.get('encoded', 'arr') == 'arr'
+            and dset.shape is not None and len(dset.shape) > 0
+            and dset.dtype.kind in 'biuf'):
+        plan.append((obj, name, dset, (key, dset.shape, dset.dtype.str)))
+    else:
+        setattr(obj, name, utils.h5_to_data(dset))
+
+
+def _allocate(plan):
+    """Allocates one array per group of datasets with the same key,
+    shape and type, with a view of it for each object. The views are
+    set on the objects by _assign once they are filled, as containers
+    may copy what is set on them, for example interned axes.
+
+    returns:
+        items: list of (object, name, dataset, view) to fill
+    """
+    groups = {}
+    for item in plan:
+        groups.setdefault(item[3], []).append(item)
+    items = []
+    for (key, shape, dtype), group in groups.items():
+        block = np.empty((len(group),) + tuple(shape), dtype=dtype)
+        for i, (obj, name, dset, _) in enumerate(group):
+            items.append((obj, name, dset, block[i, ...]))
+    return items
+
+
+def _execute(items):
+    """Reads datasets into their views. gzip datasets are read as raw
+    chunks to be decoded later.
+
+    returns:
+        jobs: list of chunks to decode, see _decode
+    """
+    jobs = []
+    for _, _, dset, out in items:
+        if out.size == 0:
+            continue
+        chunk_jobs = _raw_chunks(dset, out)
+        if chunk_jobs is None:
+            dset.read_direct(out)
+        else:
+            jobs.extend(chunk_jobs)
+    return jobs
+
+
+def _assign(items):
+    """Sets the filled views on their objects.
+    """
+    for obj, name, _, view in items:
+        setattr(obj, name, view)
+
+
+def _raw_chunks(dset, out):
+    """Reads the compressed chunks of a gzip dataset, None if the
+    dataset can not be decoded here.
+    """
+    if (dset.chunks is None or dset.compression != 'gzip' or
+            dset.fletcher32 or dset.scaleoffset is not None):
+        return None
+    dsid = dset.id
+    n = dsid.get_num_chunks()
+    expected = 1
+    for s, c in zip(dset.shape, dset.chunks):
+        expected *= -(-s // c)
+    if n != expected:
+        # unwritten chunks hold the fill value, let hdf5 handle them
+        return None
+    jobs = []
+    for i in range(n):
+        offset = dsid.get_chunk_info(i).chunk_offset
+        mask, raw = dsid.read_direct_chunk(offset)
+        if mask != 0:
+            return None
+        jobs.append((raw, offset, dset.chunks, dset.shuffle, out))
+    return jobs
+
+
+def _decode(job):
+    """Decompresses a chunk into its place in the output array.
+    """
+    raw, offset, chunks, shuffle, out = job
+    buf = zlib.decompress(raw)
+    if shuffle:
+        buf = np.frombuffer(buf, dtype=np.uint8).reshape(
+            out.dtype.itemsize, -1).T.tobytes()
+    chunk = np.frombuffer(buf, dtype=out.dtype).reshape(chunks)
+    dst = tuple(slice(o, min(o + c, s))
+                for o, c, s in zip(offset, chunks, out.shape))
+    src = tuple(slice(0, d.stop - d.start) for d in dst)
+    out[dst] = chunk[src]
+
+
+def _decode_all(jobs, max_workers):
+    """Decodes chunks, on a thread pool if there is more than one.
+    zlib releases the GIL while decompressing.
+    """
+    if len(jobs) < 2 or max_workers < 2:
+        for job in jobs:
+            _decode(job)
+        return
+    with ThreadPoolExecutor(max_workers) as pool:
+        for _ in pool.map(_decode, jobs):
+            pass
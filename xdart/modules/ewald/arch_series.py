@@ -4,8 +4,12 @@
 """
 
 # Standard library imports
+from bisect import bisect_left
+from collections import OrderedDict
+from threading import Condition, Thread
 
 # Other imports
+import numpy as np
 from pandas import Series
 
 # Qt imports
@@ -14,37 +18,200 @@ from pandas import Series
 from xdart.utils import catch_h5py_file as catch
 
 # This module imports
-from .arch import EwaldArch
+from .arch import LazyArch
+from .arch_reader import ArchReader
+
+
+class ArchCache():
+    """Bounded in-memory store of arches, shared by an ArchSeries and
+    the copies made by append and sort_index. Arches are kept in least
+    recently used order and evicted once the estimated size of the
+    stored arrays exceeds max_bytes. Arches set on the series but not
+    yet written to file are tracked as dirty.
+
+    attributes:
+        arches: OrderedDict, arches keyed by idx
+        closed: bool, set when the owning series is closed
+        dirty: set, idx of arches not yet written to file
+        flush_interval: float or None, seconds between background
+            flushes, None for no background flusher
+        hits, misses: int, counters for cache lookups
+        lock: Condition, lock around the store
+        max_bytes: float, memory budget for stored arches
+        nbytes: int, estimated size of stored arches
+
+    methods:
+        get: return arch if stored
+        put: store arch, returning dirty arches that were evicted
+        update_size: measure a stored arch again
+        pop_dirty: return dirty arches and mark them clean
+        clear: remove all arches
+    """
+    def __init__(self, max_bytes, flush_interval=None):
+        """max_bytes: float, memory budget for stored arches
+        flush_interval: float or None, seconds between background
+            flushes.
+        """
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.lock = Condition()
+        self.arches = OrderedDict()
+        self.dirty = set()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.closed = False
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self.arches)
+
+    def __contains__(self, idx):
+        return idx in self.arches
+
+    def get(self, idx):
+        """Returns stored arch or None.
+        """
+        with self.lock:
+            if idx in self.arches:
+                self.arches.move_to_end(idx)
+                self.hits += 1
+                return self.arches[idx]
+            self.misses += 1
+            return None
+
+    def put(self, idx, arch, dirty=False):
+        """Stores arch under idx.
+
+        args:
+            idx: arch idx
+            arch: EwaldArch
+            dirty: bool, True if arch still has to be written to file
+
+        returns:
+            evicted: list of dirty EwaldArch that were evicted and have
+                to be written by the caller
+        """
+        evicted = []
+        with self.lock:
+            if idx in self.arches:
+                self.nbytes -= self._sizes[idx]
+            self.arches[idx] = arch
+            self.arches.move_to_end(idx)
+            self._sizes[idx] = arch_nbytes(arch)
+            self.nbytes += self._sizes[idx]
+            if dirty:
+                self.dirty.add(idx)
+            while self.nbytes > self.max_bytes and len(self.arches) > 1:
+                old_idx, old_arch = self.arches.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old_idx)
+                if old_idx in self.dirty:
+                    self.dirty.discard(old_idx)
+                    evicted.append(old_arch)
+        return evicted
+
+    def update_size(self, arch):
+        """Measures arch again, used when a LazyArch loads fields after
+        it was stored. Eviction happens on the next put.
+        """
+        with self.lock:
+            idx = arch.idx
+            if self.arches.get(idx) is arch:
+                self.nbytes -= self._sizes[idx]
+                self._sizes[idx] = arch_nbytes(arch)
+                self.nbytes += self._sizes[idx]
+
+    def pop_dirty(self):
+        """Returns all dirty arches, in least recently used order, and
+        marks them clean.
+        """
+        with self.lock:
+            arches = [a for i, a in self.arches.items() if i in self.dirty]
+            self.dirty.clear()
+        return arches
+
+    def clear(self):
+        """Removes all arches. Dirty arches are dropped, flush first.
+        """
+        with self.lock:
+            self.arches.clear()
+            self._sizes.clear()
+            self.dirty.clear()
+            self.nbytes = 0
+
+
+def arch_nbytes(arch):
+    """Estimates memory held by an arch from the numpy arrays on it and
+    on its int_1d and int_2d containers.
+    """
+    nbytes = 0
+    # vars is used so unloaded LazyArch fields are not read
+    for obj in (arch, vars(arch).get('int_1d'), vars(arch).get('int_2d')):
+        if obj is None:
+            continue
+        for val in vars(obj).values():
+            if isinstance(val, np.ndarray):
+                nbytes += val.nbytes
+            elif hasattr(val, 'data') and isinstance(val.data, np.ndarray):
+                nbytes += val.data.nbytes
+    return nbytes
 
 
 class ArchSeries():
     """Container for storing EwaldArch objects. Data is stored in an
     hdf5 file, rather than in memory. __getitem__ and __setitem__ have
     been overridden to write the information to a file, whose path is
-    stored as an attribute.
+    stored as an attribute. __getitem__ returns a LazyArch, which
+    only reads the fields that are used. iter_fields reads declared
+    fields for many arches with one file open.
+
+    If cache_size is set, arches are also kept in an ArchCache.
+    __getitem__ then returns the stored arch without reading the file,
+    and __setitem__ only marks the arch dirty. Dirty arches are written
+    when evicted, by flush, and by a background flusher thread if
+    flush_interval is set. The cache is off by default. Cached arches
+    are shared with every caller and are not read again if another
+    process writes the file, so it is only for a series owned by the
+    process writing the scan.
     
     attributes:
+        cache: ArchCache or None, in-memory store of arches
         data_file: Path where hdf5 file is stored.
         file_lock: Thread safe lock which ensures only one thread
                    accesses data at a time.
-        index: List of all arch id numbers.
+        index: Sorted list of all arch id numbers.
     
     methods:
-        append: Add a new arch at the end of the index.
+        append: Copy of the series with a new arch added.
+        close: Flush dirty arches and stop the background flusher.
+        flush: Write all dirty arches to the file.
         iloc: Retrieve an arch by its absolute location not its id.
+        iter_fields: Iterate over arches with only some fields loaded.
+        read: Read fields of many arches in one batch.
         sort_index: Sort the index by arch id.
     """
     def __init__(self, data_file, file_lock, arches=[],
-                 static=False, gi=False):
+                 static=False, gi=False, cache_size=0,
+                 flush_interval=None, cache=None):
         """data_file: Path to hdf5 file for storing data.
         file_lock: Thread safe lock.
         arches: List of arches to initialize series with.
+        cache_size: float, bytes of arches to keep in memory, 0 to
+            always read and write the file.
+        flush_interval: float or None, seconds between background
+            writes of dirty arches.
+        cache: ArchCache or None, existing cache to share.
         """
         self.data_file = data_file
         self.file_lock = file_lock
         self.index = []
         self.static = static
         self.gi = gi
+        self.cache = cache
+        if self.cache is None and cache_size:
+            self.cache = ArchCache(cache_size, flush_interval)
+            if flush_interval is not None:
+                Thread(target=self._flush_loop, daemon=True).start()
         if arches:
             for a in arches:
                 self.__setitem__(a.idx, a)
@@ -57,21 +224,101 @@ class ArchSeries():
                     f.create_group('arches')
                 
     def __getitem__(self, idx):
-        """Initializes a new EwaldArch object and loads data from file
-        into it.
+        """Returns a LazyArch which loads its data from file when it
+        is used.
         """
-        if idx in self.index:
+        if self._find(idx) is not None:
+            if self.cache is not None:
+                arch = self.cache.get(idx)
+                if arch is not None:
+                    return arch
 
-            arch = EwaldArch(idx, static=self.static, gi=self.gi)
-            # invoke the lock to prevent conflicts
-            with self.file_lock:
-                # use catch to avoid oserrors which will resolve with time.
-                with catch(self.data_file, 'r') as f:
-                    arch.load_from_h5(f['arches'])
+            arch = self._lazy_arch(idx)
+            if self.cache is not None:
+                self._cache_put(idx, arch)
             return arch
         else:
             raise KeyError(f"Arch not found with {idx} index")
-    
+
+    def _lazy_arch(self, idx):
+        arch = LazyArch(idx, self.data_file, self.file_lock,
+                        static=self.static, gi=self.gi)
+        if self.cache is not None:
+            arch.on_load = self.cache.update_size
+        return arch
+
+    def iter_fields(self, fields=('int_1d', 'meta'), idxs=None,
+                    chunk_size=100):
+        """Iterates over arches, reading only the requested fields.
+        Arches are read chunk_size at a time with a single file open,
+        and the file is closed while the caller works on them. Other
+        fields are still loaded if they are used.
+
+        args:
+            fields: list of str, fields to read, see LazyArch
+            idxs: list of arch idx, all arches in index if None.
+                Arches missing from the file are skipped.
+            chunk_size: int, arches read per file open
+
+        yields:
+            arch: LazyArch, or cached arch if a cache is used
+        """
+        if idxs is None:
+            idxs = self.index[:]
+        for start in range(0, len(idxs), chunk_size):
+            chunk = []
+            with self.file_lock:
+                with catch(self.data_file, 'r') as f:
+                    for idx in idxs[start:start + chunk_size]:
+                        arch = None
+                        if self.cache is not None:
+                            arch = self.cache.get(idx)
+                        if arch is None:
+                            if str(idx) not in f['arches']:
+                                continue
+                            arch = self._lazy_arch(idx)
+                            arch.load(*fields, grp=f['arches'][str(idx)])
+                            if self.cache is not None:
+                                self._cache_put(idx, arch)
+                        chunk.append(arch)
+            for arch in chunk:
+                yield arch
+
+    def read(self, idxs=None, fields=('int_1d', 'meta')):
+        """Reads fields of many arches in one batch, without building
+        integrators. See ArchReader.
+
+        args:
+            idxs: list of arch idx, all arches in index if None.
+                Arches missing from the file are skipped.
+            fields: list of str, fields to read, see LazyArch
+
+        returns:
+            arches: list of LazyArch
+        """
+        if idxs is None:
+            idxs = self.index[:]
+        return ArchReader(self).read(idxs, fields)
+
+    def _find(self, idx):
+        """Position of idx in the sorted index, or None.
+        """
+        try:
+            i = bisect_left(self.index, idx)
+        except TypeError:
+            return None
+        if i < len(self.index) and self.index[i] == idx:
+            return i
+        return None
+
+    def _add_index(self, idx):
+        """Inserts idx into the sorted index in place, if it is not
+        already there.
+        """
+        i = bisect_left(self.index, idx)
+        if i == len(self.index) or self.index[i] != idx:
+            self.index.insert(i, idx)
+
     def iloc(self, idx):
         """Location based retrieval of arches instead of id based.
         Similar to .iloc in pandas Series but called by .iloc(i) not
@@ -84,6 +331,14 @@ class ArchSeries():
         is stored with the same idx, replaces the data with the new
         data.
         """
+        if self.cache is not None:
+            if idx != arch.idx:
+                arch.idx = idx
+            self._cache_put(arch.idx, arch, dirty=True)
+            self._add_index(arch.idx)
+            return
+        if isinstance(arch, LazyArch):
+            arch.load()
         # invoke the lock to prevent conflicts
         with self.file_lock:
             # use catch to avoid oserrors which will resolve with time.
@@ -93,15 +348,14 @@ class ArchSeries():
                 if idx != arch.idx:
                     arch.idx = idx
                 arch.save_to_h5(f['arches'])
-                if arch.idx not in self.index:
-                    self.index.append(arch.idx)
+                self._add_index(arch.idx)
     
     def append(self, arch):
-        """Adds a new arch to the end of the index, unless idx is
+        """Returns a copy of the series with arch added, unless idx is
         already stored in which case the arch at that idx is replaced.
+        Use __setitem__ to add an arch without copying the index.
         """
-        arches = ArchSeries(self.data_file, self.file_lock)
-        arches.index = self.index[:]
+        arches = self._copy()
         if isinstance(arch, Series):
             _arch = arch.iloc[0]
         else:
@@ -111,15 +365,80 @@ class ArchSeries():
     
     def sort_index(self, inplace=False):
         """Sorts the index by idx. If inplace is true, returns nothing.
-        Else, returns a copy with the index sorted.
+        Else, returns a copy with the index sorted. The index is kept
+        sorted as arches are set, so this is only needed after the
+        index list is changed directly.
         """
         if inplace:
             self.index.sort()
         else:
-            arches = ArchSeries(self.data_file, self.file_lock)
-            arches.index = self.index[:]
+            arches = self._copy()
             arches.index.sort()
             return arches
+
+    def _copy(self):
+        """New series with the same file, flags, index and cache.
+        """
+        arches = ArchSeries(self.data_file, self.file_lock,
+                            static=self.static, gi=self.gi,
+                            cache=self.cache)
+        arches.index = self.index[:]
+        return arches
+
+    def _cache_put(self, idx, arch, dirty=False):
+        """Stores arch in the cache, writing any dirty arches evicted
+        to make room. Holds the file_lock so writes stay in order.
+        """
+        with self.file_lock:
+            evicted = self.cache.put(idx, arch, dirty)
+            if evicted:
+                self._write(evicted)
+
+    def _write(self, arches):
+        """Writes arches to the file, caller holds the file_lock.
+        """
+        for arch in arches:
+            if isinstance(arch, LazyArch):
+                arch.load()
+        with catch(self.data_file, 'a') as f:
+            if 'arches' not in f:
+                f.create_group('arches')
+            for arch in arches:
+                arch.save_to_h5(f['arches'])
+
+    def flush(self):
+        """Writes all dirty arches to the file. Does nothing if there
+        is no cache.
+        """
+        if self.cache is None:
+            return
+        with self.file_lock:
+            arches = self.cache.pop_dirty()
+            if arches:
+                self._write(arches)
+
+    def close(self):
+        """Flushes dirty arches and stops the background flusher.
+        """
+        if self.cache is None:
+            return
+        self.flush()
+        with self.cache.lock:
+            self.cache.closed = True
+            self.cache.lock.notify_all()
+
+    def _flush_loop(self):
+        """Background flusher, writes dirty arches every
+        flush_interval seconds until the cache is closed.
+        """
+        cache = self.cache
+        while True:
+            with cache.lock:
+                if not cache.closed:
+                    cache.lock.wait(cache.flush_interval)
+                if cache.closed:
+                    return
+            self.flush()
     
     def __next__(self):
         """Allows for iteration.
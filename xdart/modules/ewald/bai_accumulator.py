@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+from threading import Condition
+import time
+
+# Other imports
+import numpy as np
+
+# This module imports
+from xdart import utils
+
+
+class BaiAccumulator():
+    """Running sums of the by arch integration results of a scanning
+    sphere. raw, pcount and sigma_raw are held in preallocated float64
+    arrays, and each frame is added in place over the region holding
+    its non-zero data. norm and sigma are only computed when result is
+    called. Also counts frames added since the sums were last saved,
+    so the sphere can write them every save_frames frames or every
+    save_interval seconds instead of after every frame.
+
+    attributes:
+        axes: dict, ttheta, q and chi of the last frame added
+        lock: Condition, lock around the sums
+        pcount, raw, sigma_raw: numpy arrays, running sums, None until
+            the first frame is added
+        save_frames: int or None, frames between saves
+        save_interval: float or None, seconds between saves
+        stale: bool, True if frames were added since result was called
+        unsaved: int, frames added since the last save
+
+    methods:
+        add: adds an int_1d_data or int_2d_data in place
+        tick: counts a frame towards the save cadence
+        save_due: whether the sums should be saved
+        saved: restarts the save cadence
+        result: writes the sums into an int_1d_data or int_2d_data
+        reset: drops the sums
+    """
+    keys = ('raw', 'pcount', 'sigma_raw')
+
+    def __init__(self, save_frames=1, save_interval=None):
+        """save_frames: int or None, frames between saves
+        save_interval: float or None, seconds between saves. If both
+            are None the sums are only saved when asked.
+        """
+        self.save_frames = save_frames
+        self.save_interval = save_interval
+        self.lock = Condition()
+        self.unsaved = 0
+        self._saved_at = time.time()
+        self.reset()
+
+    def reset(self):
+        """Drops the sums, the next frame added starts new ones.
+        """
+        with self.lock:
+            self.raw = None
+            self.pcount = None
+            self.sigma_raw = None
+            self.axes = {}
+            self.stale = False
+
+    def add(self, int_data, base=None):
+        """Adds the raw, pcount and sigma_raw of int_data to the sums.
+
+        args:
+            int_data: int_1d_data or int_2d_data, result of one arch
+            base: int_1d_data or int_2d_data or None, if the sums are
+                started by this frame they start from base when it has
+                the same shape, else from zeros
+        """
+        with self.lock:
+            shape = tuple(int_data.raw.shape)
+            if self.raw is None or self.raw.shape != shape:
+                self._start(shape, base)
+            self._add(int_data)
+            self.stale = True
+        self.tick()
+
+    def _start(self, shape, base):
+        for key in self.keys:
+            setattr(self, key, np.zeros(shape))
+        self.axes = {}
+        if base is not None and tuple(base.raw.shape) == shape:
+            self._add(base)
+
+    def _add(self, int_data):
+        for key in self.keys:
+            getattr(int_data, key).add_to(getattr(self, key))
+        for key in ('ttheta', 'q', 'chi'):
+            if key in vars(int_data):
+                self.axes[key] = getattr(int_data, key)
+
+    def tick(self):
+        """Counts one frame towards the save cadence.
+        """
+        with self.lock:
+            self.unsaved += 1
+
+    def save_due(self):
+        """Returns True if frames were added and save_frames or
+        save_interval has been reached.
+        """
+        with self.lock:
+            if self.unsaved == 0:
+                return False
+            if self.save_frames is not None and self.unsaved >= self.save_frames:
+                return True
+            if (self.save_interval is not None and
+                    time.time() - self._saved_at >= self.save_interval):
+                return True
+            return False
+
+    def saved(self):
+        """Restarts the save cadence, called after the sums are saved.
+        """
+        with self.lock:
+            self.unsaved = 0
+            self._saved_at = time.time()
+
+    def result(self, out):
+        """Writes the sums and the norm and sigma computed from them
+        into out, if frames were added since the last call.
+
+        args:
+            out: int_1d_data or int_2d_data, container to fill
+
+        returns:
+            out: the same container
+        """
+        with self.lock:
+            if not self.stale:
+                return out
+            out.raw = self.raw.copy()
+            out.pcount = self.pcount.copy()
+            out.sigma_raw = self.sigma_raw.copy()
+            out.norm = utils.div0(self.raw, self.pcount)
+            out.sigma = utils.div0(np.sqrt(self.sigma_raw), self.pcount)
+            for key, val in self.axes.items():
+                setattr(out, key, val)
+            self.stale = False
+        return out
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+@author: thampy, walroth
+"""
+
+# Standard library imports
+
+# Other imports
+import numpy as np
+import scipy.sparse as sp
+from pyFAI import units
+from pyFAI.containers import Integrate1dResult, Integrate2dResult
+from pyFAI.method_registry import IntegrationMethod
+
+# This module imports
+from .mask_cache import pyfai_mask
+
+
+# integration keywords the sparse product does not apply
+PER_FRAME = ('dark', 'flat', 'variance', 'error_model')
+
+
+class BatchIntegrator():
+    """Integrates a stack of frames which share one geometry. The
+    sparse (CSR) integration matrix is built once by pyFAI and then
+    applied to the whole (N, ny, nx) stack as a single sparse-dense
+    product, instead of calling integrate1d/integrate2d frame by frame.
+
+    pyFAI leaves masked pixels out of the matrix and picks automatic
+    ranges from the unmasked ones, so frames are grouped by mask and
+    one matrix is used per group. Static scans normally share a single
+    mask, in which case the whole stack is one product.
+
+    The product only applies the solid angle, polarization, dummy and
+    normalization factor corrections. If any of the keywords in
+    PER_FRAME is set, or the pyFAI engine does not expose its CSR
+    matrix, frames are integrated one at a time by pyFAI instead, so
+    results are always those of integrate1d/integrate2d.
+
+    attributes:
+        integrator: AzimuthalIntegrator, shared integrator for the
+            geometry
+
+    methods:
+        integrate_1d: integrate stack to list of Integrate1dResult
+        integrate_2d: integrate stack to list of Integrate2dResult
+    """
+    def __init__(self, integrator):
+        """integrator: AzimuthalIntegrator, see integrator_cache.
+        """
+        self.integrator = integrator
+
+    def integrate_1d(self, stack, numpoints=10000, radial_range=None,
+                     unit=units.TTH_DEG, masks=None, norms=None,
+                     method='csr', **kwargs):
+        """Integrates each frame in stack to 1D.
+
+        args:
+            stack: numpy array, (N, ny, nx) frames
+            numpoints: int, number of points in final array
+            radial_range: tuple or list, lower and upper end of
+                integration
+            unit: pyFAI unit for integration
+            masks: list or array of (ny, nx) masks, 1 for masked
+                pixels. A single mask is used for all frames.
+            norms: list of normalization constants, one per frame
+            method: pyFAI method, only the pixel splitting is used,
+                integration is always done with a CSR matrix
+            kwargs: other keywords for integrate1d, see pyFAI docs.
+
+        returns:
+            results: list of Integrate1dResult, one per frame
+        """
+        stack, masks, norms = self._prepare(stack, masks, norms)
+
+        def single(i, method):
+            return self.integrator.integrate1d(
+                stack[i] / norms[i], numpoints, unit=unit,
+                radial_range=radial_range, mask=pyfai_mask(masks[i]),
+                method=method, **kwargs
+            )
+
+        if not self.batchable(**kwargs):
+            return [single(i, method) for i in range(len(stack))]
+        csr = self._csr_method(method, 1)
+        results = [None] * len(stack)
+        for idxs in self._mask_groups(masks):
+            first = single(idxs[0], csr)
+            matrix, bins = self._get_matrix(csr, 1)
+            if matrix is None:
+                for i in idxs:
+                    results[i] = single(i, method)
+                continue
+            intensity = self._apply(matrix, stack[idxs], masks[idxs[0]],
+                                    norms[idxs], **kwargs)
+            for i, frame in zip(idxs, intensity):
+                result = Integrate1dResult(first.radial, frame)
+                result._set_unit(first.unit)
+                results[i] = result
+        return results
+
+    def integrate_2d(self, stack, npt_rad=1000, npt_azim=1000,
+                     radial_range=None, azimuth_range=None,
+                     unit=units.TTH_DEG, masks=None, norms=None,
+                     method='csr', **kwargs):
+        """Integrates each frame in stack to 2D.
+
+        args:
+            stack: numpy array, (N, ny, nx) frames
+            npt_rad: int, number of points in radial dimension
+            npt_azim: int, number of points in azimuthal dimension
+            radial_range: tuple or list, lower and upper end of
+                integration
+            azimuth_range: tuple or list, lower and upper end of
+                integration in azimuthal direction
+            unit: pyFAI unit for integration
+            masks, norms, method: see integrate_1d
+            kwargs: other keywords for integrate2d, see pyFAI docs.
+
+        returns:
+            results: list of Integrate2dResult, one per frame
+        """
+        stack, masks, norms = self._prepare(stack, masks, norms)
+
+        def single(i, method):
+            return self.integrator.integrate2d(
+                stack[i] / norms[i], npt_rad, npt_azim, unit=unit,
+                radial_range=radial_range, azimuth_range=azimuth_range,
+                mask=pyfai_mask(masks[i]), method=method, **kwargs
+            )
+
+        if not self.batchable(**kwargs):
+            return [single(i, method) for i in range(len(stack))]
+        csr = self._csr_method(method, 2)
+        results = [None] * len(stack)
+        for idxs in self._mask_groups(masks):
+            first = single(idxs[0], csr)
+            matrix, bins = self._get_matrix(csr, 2)
+            if matrix is None:
+                for i in idxs:
+                    results[i] = single(i, method)
+                continue
+            intensity = self._apply(matrix, stack[idxs], masks[idxs[0]],
+                                    norms[idxs], **kwargs)
+            for i, frame in zip(idxs, intensity):
+                # pyFAI engines bin (radial, azimuthal), results are
+                # (chi, radial)
+                result = Integrate2dResult(frame.reshape(bins).T,
+                                           first.radial, first.azimuthal)
+                result._set_unit(first.unit)
+                results[i] = result
+        return results
+
+    @staticmethod
+    def batchable(**kwargs):
+        """Returns True if the integration keywords kwargs can be
+        applied by the sparse product, False if frames must be
+        integrated one at a time, see PER_FRAME.
+        """
+        for key in PER_FRAME:
+            value = kwargs.get(key)
+            if key == 'error_model' and str(value).lower() in ('none', 'no'):
+                continue
+            if value is not None:
+                return False
+        return True
+
+    @staticmethod
+    def _prepare(stack, masks, norms):
+        """Ensures stack is 3D and there is one mask and one norm per
+        frame.
+        """
+        stack = np.asarray(stack)
+        if stack.ndim == 2:
+            stack = stack[np.newaxis]
+        n = len(stack)
+        if masks is None or np.ndim(masks) == 2:
+            masks = [masks] * n
+        masks = list(masks)
+        if norms is None:
+            norms = np.ones(n)
+        norms = np.asarray(norms, dtype=float)
+        if norms.ndim == 0:
+            norms = np.full(n, float(norms))
+        return stack, masks, norms
+
+    @staticmethod
+    def _mask_groups(masks):
+        """Groups frame indices by mask content, keeping the order in
+        which masks first appear.
+
+        returns:
+            groups: list of lists of frame indices
+        """
+        groups = {}
+        for i, mask in enumerate(masks):
+            if mask is None:
+                key = None
+            else:
+                mask = np.ascontiguousarray(mask)
+                key = (mask.shape, mask.dtype.str, mask.tobytes())
+            groups.setdefault(key, []).append(i)
+        return list(groups.values())
+
+    def _csr_method(self, method, dim):
+        """Returns CSR method with the pixel splitting of method.
+        """
+        split = 'bbox'
+        if method is not None:
+            default = self.integrator.DEFAULT_METHOD_1D
+            if dim == 2:
+                default = self.integrator.DEFAULT_METHOD_2D
+            try:
+                _method = self.integrator._normalize_method(
+                    method, dim=dim, default=default
+                )
+                split = _method.split_lower
+            except (AttributeError, TypeError, ValueError):
+                pass
+        if split == 'pseudo':
+            split = 'full'
+        return (split, 'csr', 'cython')
+
+    def _get_matrix(self, method, dim):
+        """Gets the CSR matrix of the engine pyFAI just set up. Returns
+        None, None if the engine does not expose it, the attributes
+        used are not part of the public pyFAI API.
+        """
+        try:
+            key = IntegrationMethod.select_method(dim, *method)[0]
+            engine = self.integrator.engines[key].engine
+        except (AttributeError, IndexError, KeyError, TypeError):
+            return None, None
+        if not all(hasattr(engine, attr) for attr in
+                   ('bins', 'size', 'data', 'indices', 'indptr')):
+            return None, None
+        bins = engine.bins
+        matrix = sp.csr_matrix(
+            (engine.data, engine.indices, engine.indptr),
+            shape=(int(np.prod(bins)), engine.size)
+        )
+        return matrix, bins
+
+    def _apply(self, matrix, stack, mask, norms, correctSolidAngle=True,
+               polarization_factor=None, dummy=None, delta_dummy=None,
+               normalization_factor=1.0, **kwargs):
+        """Applies the CSR matrix to a stack of frames sharing one
+        mask. Signal and normalization are summed separately, as in
+        pyFAI, and divided at the end.
+
+        returns:
+            intensity: numpy array, (N, nbins)
+        """
+        shape = stack.shape[1:]
+        normalization = np.ones(shape)
+        if correctSolidAngle:
+            normalization = normalization * self.integrator.solidAngleArray(
+                shape, correctSolidAngle
+            )
+        if polarization_factor is not None:
+            normalization = normalization * self.integrator.polarization(
+                shape, polarization_factor
+            )
+
+        data = stack.reshape(len(stack), -1) / norms[:, np.newaxis]
+        valid = np.ones(data.shape, dtype=bool)
+        if mask is not None:
+            valid &= (np.asarray(mask).ravel() == 0)
+        if dummy is not None:
+            if delta_dummy:
+                valid &= np.abs(data - dummy) > delta_dummy
+            else:
+                valid &= (data != dummy)
+
+        signal = matrix @ np.where(valid, data, 0).T
+        norm = matrix @ (valid * normalization.ravel()).T
+        norm *= normalization_factor
+
+        empty = dummy if dummy is not None else self.integrator._empty
+        filled = norm > 0
+        intensity = np.full(signal.shape, empty, dtype=float)
+        intensity[filled] = signal[filled] / norm[filled]
+        return intensity.T
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+from threading import Condition
+
+# Other imports
+import numpy as np
+
+# This module imports
+from xdart.utils.containers import int_1d_record
+
+
+class Arch1D():
+    """What viewers read of an EwaldArch to plot its 1D integration,
+    without the images, geometry or integrator. Uses __slots__, so a
+    record has no __dict__.
+
+    attributes:
+        idx: int, name of the arch
+        int_1d: int_1d_record, 1D integration
+        scan_info: dict, scan metadata
+        wavelength: float or None, wavelength in meters, None if it
+            was not known without building the integrator
+
+    methods:
+        from_arch: makes a record of an arch
+    """
+    __slots__ = ('idx', 'int_1d', 'scan_info', 'wavelength')
+
+    def __init__(self, idx, int_1d, scan_info=None, wavelength=None):
+        self.idx = idx
+        self.int_1d = int_1d
+        self.scan_info = {} if scan_info is None else scan_info
+        self.wavelength = wavelength
+
+    @classmethod
+    def from_arch(cls, arch):
+        """Makes a record of arch, sharing its arrays. Returns arch if
+        it is already a record.
+
+        args:
+            arch: EwaldArch, LazyArch or Arch1D
+
+        returns:
+            record: Arch1D
+        """
+        if isinstance(arch, cls):
+            return arch
+        return cls(int(arch.idx), int_1d_record.from_data(arch.int_1d),
+                   dict(arch.scan_info), _wavelength(arch))
+
+
+class Int1DStore():
+    """Column store of the 1D integrations shown by the static scan
+    viewer, used in place of a dict of arch copies so many frames can
+    be held in memory. Behaves as a dict of Arch1D by arch idx, arches
+    set in it are converted with Arch1D.from_arch.
+
+    Each value array of int_1d_record, norm and for grazing incidence
+    i_qz and i_qxy, is a column of a (frames, bins) array,
+    preallocated and doubled when full. The axes are kept once for
+    each distinct set, and rows point to their set, so frames with
+    the same axes share them. The layout is set by the first frame,
+    frames with other bins or value arrays are kept as records.
+
+    Records returned are made on access and hold read-only views of the
+    rows. Setting an idx already in the store overwrites its row, so
+    views of it see the new data.
+
+    attributes:
+        lock: Condition, lock around the arrays
+
+    methods:
+        column: the rows of a value array as one 2d array
+        clear: removes all frames
+        get, items, keys, pop, values: as for dict
+    """
+    def __init__(self, capacity=64):
+        """capacity: int, frames allocated at first
+        """
+        self.lock = Condition()
+        self._capacity = max(1, int(capacity))
+        self.clear()
+
+    def clear(self):
+        """Removes all frames.
+        """
+        with self.lock:
+            self._rows = {}
+            self._extra = {}
+            self._n = 0
+            self._bins = None
+            self._columns = {}
+            self._axes = []
+            self._axes_id = np.zeros(self._capacity, dtype=np.int32)
+            self._wavelength = np.full(self._capacity, np.nan)
+            self._scan_info = [None] * self._capacity
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, idx):
+        try:
+            return int(idx) in self._rows
+        except (TypeError, ValueError):
+            return False
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        with self.lock:
+            return list(self._rows)
+
+    def values(self):
+        return [self[idx] for idx in self.keys()]
+
+    def items(self):
+        return [(idx, self[idx]) for idx in self.keys()]
+
+    def get(self, idx, default=None):
+        try:
+            return self[idx]
+        except KeyError:
+            return default
+
+    def pop(self, idx, *default):
+        try:
+            out = self[idx]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[idx]
+        return out
+
+    def __delitem__(self, idx):
+        # the row stays allocated until clear
+        idx = int(idx)
+        with self.lock:
+            del self._rows[idx]
+            self._extra.pop(idx, None)
+
+    def __getitem__(self, idx):
+        idx = int(idx)
+        with self.lock:
+            row = self._rows[idx]
+            if row is None:
+                return self._extra[idx]
+            kwargs = {}
+            for name, col in self._columns.items():
+                view = col[row]
+                view.flags.writeable = False
+                kwargs[name] = view
+            kwargs.update(zip(int_1d_record.axes,
+                              self._axes[self._axes_id[row]]))
+            wavelength = self._wavelength[row]
+            return Arch1D(
+                idx, int_1d_record(**kwargs), self._scan_info[row],
+                None if np.isnan(wavelength) else float(wavelength)
+            )
+
+    def __setitem__(self, idx, arch):
+        record = Arch1D.from_arch(arch)
+        idx = int(idx)
+        record.idx = idx
+        with self.lock:
+            values = self._values(record.int_1d)
+            row = self._rows.get(idx)
+            if values is None:
+                # kept as it is, outside the columns
+                self._rows[idx] = None
+                self._extra[idx] = record
+                return
+            self._extra.pop(idx, None)
+            if row is None:
+                row = self._n
+                if row == self._axes_id.shape[0]:
+                    self._grow(2 * row)
+                self._n = row + 1
+                self._rows[idx] = row
+            for name, val in values.items():
+                self._columns[name][row] = val
+            self._axes_id[row] = self._intern(record.int_1d)
+            self._wavelength[row] = (np.nan if record.wavelength is None
+                                     else record.wavelength)
+            self._scan_info[row] = record.scan_info
+
+    def column(self, name='norm'):
+        """Returns the rows of a value array as one 2d array, in the
+        order frames were added.
+
+        args:
+            name: str, one of int_1d_record.values
+
+        returns:
+            idxs: list, arch idx of the rows
+            data: numpy array, (frames, bins), a copy
+        """
+        with self.lock:
+            idxs = [idx for idx, row in self._rows.items() if row is not None]
+            rows = [self._rows[idx] for idx in idxs]
+            if name not in self._columns:
+                return idxs, np.zeros((len(rows), 0))
+            return idxs, self._columns[name][rows]
+
+    def _values(self, int_1d):
+        """Value arrays of int_1d for the columns, None if they do not
+        fit. The first frame sets the columns.
+        """
+        values = {}
+        for name in int_1d_record.values:
+            val = getattr(int_1d, name)
+            if val is None:
+                continue
+            val = np.asarray(val)
+            if val.ndim == 1 and val.size > 0:
+                values[name] = val
+        if 'norm' not in values:
+            return None
+        bins = values['norm'].size
+        if self._bins is None:
+            if any(val.size != bins for val in values.values()):
+                return None
+            self._bins = bins
+            self._columns = {}
+            for name, val in values.items():
+                dtype = val.dtype if val.dtype.kind == 'f' else np.float64
+                self._columns[name] = np.zeros(
+                    (self._axes_id.shape[0], bins), dtype=dtype
+                )
+            return values
+        if bins != self._bins or set(values) != set(self._columns) or \
+                any(val.size != bins for val in values.values()):
+            return None
+        return values
+
+    def _intern(self, int_1d):
+        """Index of the set of axes of int_1d in _axes, added if new.
+        """
+        axes = [getattr(int_1d, name) for name in int_1d_record.axes]
+        for i in range(len(self._axes) - 1, -1, -1):
+            if all(_same(a, b) for a, b in zip(axes, self._axes[i])):
+                return i
+        self._axes.append(tuple(np.array(a) for a in axes))
+        return len(self._axes) - 1
+
+    def _grow(self, capacity):
+        """Copies the rows to new arrays with room for capacity rows.
+        """
+        n = self._n
+        for name, col in self._columns.items():
+            new = np.zeros((capacity,) + col.shape[1:], dtype=col.dtype)
+            new[:n] = col[:n]
+            self._columns[name] = new
+        axes_id = np.zeros(capacity, dtype=np.int32)
+        axes_id[:n] = self._axes_id[:n]
+        self._axes_id = axes_id
+        wavelength = np.full(capacity, np.nan)
+        wavelength[:n] = self._wavelength[:n]
+        self._wavelength = wavelength
+        self._scan_info.extend([None] * (capacity - len(self._scan_info)))
+
+
+def _same(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    if a is b:
+        return True
+    if a.shape != b.shape or a.dtype != b.dtype:
+        return False
+    return np.array_equal(a, b, equal_nan=a.dtype.kind in 'fc')
+
+
+def _wavelength(arch):
+    """Wavelength of arch if known without building an integrator or
+    reading the geometry from file, else None.
+    """
+    attrs = getattr(arch, '__dict__', {})
+    integrator = attrs.get('integrator')
+    if integrator is not None:
+        return integrator.wavelength
+    poni_dict = attrs.get('poni_dict')
+    if poni_dict and '_wavelength' in poni_dict:
+        return poni_dict['_wavelength']
+    poni = attrs.get('poni')
+    if poni is not None and not attrs.get('static'):
+        return poni.wavelength
+    return None
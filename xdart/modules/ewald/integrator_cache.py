@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+@author: thampy, walroth
+"""
+
+# Standard library imports
+from collections import OrderedDict
+import hashlib
+from threading import Condition
+import weakref
+
+# Other imports
+import numpy as np
+from pyFAI.azimuthalIntegrator import AzimuthalIntegrator
+
+# xdart imports
+from xdart.utils.containers import create_ai_from_dict
+
+
+class IntegratorCache():
+    """Process wide registry of pyFAI integrators, keyed by a hash of
+    the geometry. pyFAI stores its expensive per-geometry arrays
+    (pixel positions, chi/2theta maps, CSR/LUT sparse matrices) on the
+    integrator object, so handing the same integrator to every arch
+    of a static scan means those arrays are only built once. Grazing
+    incidence transforms are also keyed by the incident and tilt
+    angles, which are set when the transform is built and must not be
+    changed on a cached transform, as other arches may be using it.
+
+    attributes:
+        lock: Condition, lock around the registry
+        maxsize: int, number of integrators kept before the least
+            recently used one is evicted
+        hits, misses: int, counters for cache lookups
+
+    methods:
+        get: return cached integrator, creating it if needed
+        clear: remove all integrators
+    """
+    def __init__(self, maxsize=8):
+        """maxsize: int, number of integrators to keep.
+        """
+        self.maxsize = maxsize
+        self.lock = Condition()
+        self.hits = 0
+        self.misses = 0
+        self._integrators = OrderedDict()
+
+    def __len__(self):
+        return len(self._integrators)
+
+    def __contains__(self, key):
+        return key in self._integrators
+
+    def get(self, poni_dict=None, gi=False, poni=None, ai_args={},
+            mask=None, gi_angles=None):
+        """Returns integrator for the geometry, creating one if it is
+        not already in the registry.
+
+        args:
+            poni_dict: dict, poni information as returned by
+                get_poni_dict. Used for static detectors.
+            gi: bool, if True a pygix Transform is returned
+            poni: PONI, calibration for scanning detectors, used if
+                poni_dict is None
+            ai_args: dict, extra args for AzimuthalIntegrator, only
+                used with poni
+            mask: numpy array or None, detector mask to include in key
+            gi_angles: tuple or None, (incident_angle, tilt_angle) in
+                degrees for gi transforms, None entries keep the pygix
+                defaults
+
+        returns:
+            integrator: AzimuthalIntegrator or pygix Transform
+        """
+        key = integrator_key(poni_dict, gi, poni, ai_args, mask, gi_angles)
+        with self.lock:
+            if key in self._integrators:
+                self._integrators.move_to_end(key)
+                self.hits += 1
+                return self._integrators[key]
+            self.misses += 1
+
+        integrator = _create_integrator(poni_dict, gi, poni, ai_args,
+                                        gi_angles)
+
+        with self.lock:
+            # another thread may have beaten us to it
+            if key in self._integrators:
+                self._integrators.move_to_end(key)
+                return self._integrators[key]
+            self._integrators[key] = integrator
+            while self.maxsize > 0 and len(self._integrators) > self.maxsize:
+                self._integrators.popitem(last=False)
+        return integrator
+
+    def clear(self):
+        """Removes all integrators from the registry.
+        """
+        with self.lock:
+            self._integrators.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def _create_integrator(poni_dict=None, gi=False, poni=None, ai_args={},
+                       gi_angles=None):
+    """Builds a new integrator, same logic as EwaldArch used to run
+    for every arch.
+    """
+    if poni_dict is not None:
+        integrator = create_ai_from_dict(poni_dict, gi)
+        if gi and gi_angles is not None:
+            incident_angle, tilt_angle = gi_angles
+            if incident_angle is not None:
+                integrator.incident_angle = incident_angle
+            if tilt_angle is not None:
+                integrator.tilt_angle = tilt_angle
+        return integrator
+    if poni is None:
+        return AzimuthalIntegrator()
+    return AzimuthalIntegrator(
+        dist=poni.dist,
+        poni1=poni.poni1,
+        poni2=poni.poni2,
+        rot1=poni.rot1,
+        rot2=poni.rot2,
+        rot3=poni.rot3,
+        wavelength=poni.wavelength,
+        detector=poni.detector,
+        **ai_args
+    )
+
+
+def _detector_key(detector):
+    """Hashable description of a pyFAI detector.
+    """
+    if detector is None:
+        return None
+    try:
+        config = sorted(detector.get_config().items())
+    except AttributeError:
+        config = [('pixel1', detector.pixel1), ('pixel2', detector.pixel2),
+                  ('max_shape', detector.max_shape)]
+    return (detector.name, repr(config),
+            getattr(detector, '_mask_crc', None))
+
+
+def integrator_key(poni_dict=None, gi=False, poni=None, ai_args={},
+                   mask=None, gi_angles=None):
+    """Hashes the geometry used to build an integrator.
+
+    args:
+        see IntegratorCache.get
+
+    returns:
+        key: str, hex digest identifying the geometry
+    """
+    items = [('gi', bool(gi))]
+    if gi and gi_angles is not None:
+        items.append(('gi_angles', repr(tuple(gi_angles))))
+    if poni_dict is not None:
+        for k in sorted(poni_dict):
+            v = poni_dict[k]
+            if k == 'detector':
+                items.append((k, _detector_key(v)))
+            else:
+                items.append((k, repr(v)))
+    elif poni is not None:
+        for k in ['dist', 'poni1', 'poni2', 'rot1', 'rot2', 'rot3',
+                  'wavelength']:
+            items.append((k, repr(getattr(poni, k))))
+        items.append(('detector', _detector_key(poni.detector)))
+        items.append(('ai_args', repr(sorted(ai_args.items()))))
+
+    digest = hashlib.sha1(repr(items).encode())
+    if mask is not None:
+        mask = np.ascontiguousarray(mask)
+        digest.update(repr(mask.shape).encode())
+        digest.update(mask.tobytes())
+    return digest.hexdigest()
+
+
+# attributes of an integrator which set its geometry
+GEOMETRY_ATTRS = ('dist', 'poni1', 'poni2', 'rot1', 'rot2', 'rot3',
+                  'wavelength', 'incident_angle', 'tilt_angle')
+
+# integrator -> (detector, params, key), see geometry_key
+_geometry_keys = weakref.WeakKeyDictionary()
+
+
+def geometry_key(integrator):
+    """Hashes the geometry of an integrator, poni, wavelength,
+    detector and detector mask, and the angles of gi transforms.
+    Integrators with the same geometry give the same key, wherever
+    they were built. The detector part is kept for each integrator
+    while its parameters do not change.
+
+    args:
+        integrator: AzimuthalIntegrator or pygix Transform
+
+    returns:
+        key: str, hex digest identifying the geometry
+    """
+    detector = getattr(integrator, 'detector', None)
+    params = (type(integrator).__name__,
+              getattr(detector, '_mask_crc', None)) + tuple(
+        repr(getattr(integrator, k, None)) for k in GEOMETRY_ATTRS
+    )
+    try:
+        cached = _geometry_keys.get(integrator)
+    except TypeError:
+        cached = None
+    if cached is not None and cached[0] is detector and cached[1] == params:
+        return cached[2]
+    items = [('type', params[0]), ('detector', _detector_key(detector))]
+    items.extend(zip(GEOMETRY_ATTRS, params[2:]))
+    key = hashlib.sha1(repr(items).encode()).hexdigest()
+    try:
+        _geometry_keys[integrator] = (detector, params, key)
+    except TypeError:
+        pass
+    return key
+
+
+integrator_cache = IntegratorCache()
+
+
+def get_integrator(poni_dict=None, gi=False, poni=None, ai_args={},
+                   mask=None, gi_angles=None):
+    """Returns integrator for the geometry from the process wide
+    registry. See IntegratorCache.get.
+    """
+    return integrator_cache.get(poni_dict, gi, poni, ai_args, mask,
+                                gi_angles)
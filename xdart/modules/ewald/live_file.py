@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+import os
+from threading import Condition
+
+# Other imports
+import h5py
+import numpy as np
+
+# This module imports
+from xdart.utils.containers import int_1d_data_static
+from .arch import EwaldArch
+
+
+# int_1d_data_static attributes written for every frame
+LIVE_FIELDS = ('norm', 'ttheta', 'q', 'i_qz', 'qz', 'i_qxy', 'qxy')
+
+
+def live_file_name(data_file):
+    """Name of the live file kept next to data_file.
+
+    args:
+        data_file: str, path to the scan hdf5 file
+
+    returns:
+        fname: str, path to the live file
+    """
+    return os.path.splitext(data_file)[0] + '_live.hdf5'
+
+
+def remove_live_file(data_file):
+    """Removes the live file of data_file, so viewers read the scan
+    file. If it can not be removed, for example while a reader holds
+    it open on Windows, it is marked complete, which LiveReader treats
+    as no live file.
+
+    args:
+        data_file: str, path to the scan hdf5 file
+    """
+    fname = live_file_name(data_file)
+    if not os.path.exists(fname):
+        return
+    try:
+        os.remove(fname)
+        return
+    except OSError:
+        pass
+    try:
+        with h5py.File(fname, 'r+') as f:
+            f.attrs['complete'] = True
+    except OSError:
+        print(f'Could not remove live file {fname}')
+
+
+class LiveWriter():
+    """Writes the 1d results and scan info of each frame of a static
+    scan to a companion file in HDF5 single writer multiple reader
+    (SWMR) mode. All datasets are created, chunked and appendable,
+    before the file is switched to SWMR mode with the first frame, and
+    the handle stays open until close. Readers in any process can then
+    poll the file without file_lock while the scan file is written.
+
+    Only frames with the same 1d shapes as the first one are written.
+    If a frame does not fit, the live file is closed and the scan file
+    is the only copy of the data. The live file is removed when it is
+    closed, once the scan is finished the scan file holds all frames.
+
+    attributes:
+        chunk_frames: int, frames per chunk of each dataset
+        columns: list, scan info keys written to meta
+        fname: str, path to the live file
+        valid: bool, False once the live file was closed
+
+    methods:
+        append: appends the int_1d and scan_info of an arch
+        close: closes and removes the live file
+    """
+    def __init__(self, data_file, chunk_frames=64):
+        """data_file: str, path to the scan hdf5 file
+        chunk_frames: int, frames per chunk of each dataset
+        """
+        self.data_file = data_file
+        self.fname = live_file_name(data_file)
+        self.chunk_frames = chunk_frames
+        self.columns = []
+        self.valid = True
+        self.lock = Condition()
+        self._file = None
+
+    def append(self, arch):
+        """Appends the int_1d and scan_info of arch to the live file,
+        creating the file with the first frame.
+
+        args:
+            arch: EwaldArch, integrated arch
+        """
+        with self.lock:
+            if not self.valid:
+                return
+            if self._file is None:
+                self._create(arch)
+                if not self.valid:
+                    return
+            f = self._file
+            rows = {key: _field(arch.int_1d, key) for key in f['int_1d']}
+            if any(row is None or row.shape != f['int_1d'][key].shape[1:]
+                   for key, row in rows.items()):
+                print('Live file shape mismatch, live display stopped')
+                self.close()
+                return
+
+            # data rows are flushed before idx, so a reader that sees
+            # the idx always finds the complete frame
+            n = f['idx'].shape[0]
+            datasets = [f['meta']] + [f['int_1d'][key] for key in rows]
+            for dset in datasets:
+                dset.resize(n + 1, axis=0)
+            f['meta'][n] = [_number(arch.scan_info.get(c)) for c in self.columns]
+            for key, row in rows.items():
+                f['int_1d'][key][n] = row
+            for dset in datasets:
+                dset.flush()
+            f['idx'].resize(n + 1, axis=0)
+            f['idx'][n] = arch.idx
+            f['idx'].flush()
+
+    def _create(self, arch):
+        """Creates the live file and its datasets from the first frame,
+        then switches it to SWMR mode.
+        """
+        try:
+            if os.path.exists(self.fname):
+                os.remove(self.fname)
+            f = h5py.File(self.fname, 'w', libver='latest')
+        except OSError:
+            print('Could not create live file, live display stopped')
+            self.valid = False
+            return
+        c = self.chunk_frames
+        f.create_dataset('idx', (0,), maxshape=(None,), dtype=np.int64,
+                         chunks=(c,))
+        self.columns = [k for k, v in arch.scan_info.items()
+                        if not np.isnan(_number(v))]
+        meta = f.create_dataset('meta', (0, len(self.columns)),
+                                maxshape=(None, len(self.columns)),
+                                chunks=(c, max(1, len(self.columns))))
+        meta.attrs['columns'] = [str(col) for col in self.columns]
+        grp = f.create_group('int_1d')
+        for key in LIVE_FIELDS:
+            row = _field(arch.int_1d, key)
+            if row is not None:
+                grp.create_dataset(key, (0,) + row.shape,
+                                   maxshape=(None,) + row.shape,
+                                   dtype=row.dtype, chunks=(c,) + row.shape)
+        f.swmr_mode = True
+        self._file = f
+
+    def close(self):
+        """Closes and removes the live file, see remove_live_file.
+        Nothing more is written to it.
+        """
+        with self.lock:
+            self.valid = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            remove_live_file(self.data_file)
+
+
+class LiveReader():
+    """Reads the live file of a scan without file_lock. The file is
+    opened in SWMR read mode once and refreshed on every poll. If the
+    live file is replaced by a new scan it is opened again. Files
+    marked complete, see remove_live_file, are not read.
+
+    attributes:
+        fname: str, path to the live file
+        index: numpy array, idx of the frames read so far
+
+    methods:
+        refresh: reads the number of frames written so far
+        load: returns arches with int_1d and scan_info for idxs
+        close: closes the live file
+    """
+    def __init__(self, data_file):
+        """data_file: str, path to the scan hdf5 file
+        """
+        self.fname = live_file_name(data_file)
+        self.index = np.array([], dtype=np.int64)
+        self._file = None
+        self._inode = None
+
+    def _open(self):
+        try:
+            inode = os.stat(self.fname).st_ino
+        except OSError:
+            self.close()
+            return False
+        if self._file is not None and inode == self._inode:
+            return True
+        self.close()
+        try:
+            self._file = h5py.File(self.fname, 'r', libver='latest', swmr=True)
+        except OSError:
+            # not in SWMR mode yet, or being replaced
+            return False
+        if self._file.attrs.get('complete', False):
+            self.close()
+            return False
+        self._inode = inode
+        return True
+
+    def refresh(self):
+        """Refreshes the datasets to see frames written since the last
+        call.
+
+        returns:
+            index: numpy array, idx of frames in the live file
+        """
+        if not self._open():
+            self.index = np.array([], dtype=np.int64)
+            return self.index
+        f = self._file
+        f['idx'].refresh()
+        self.index = f['idx'][()]
+        return self.index
+
+    def load(self, idxs, **arch_kwargs):
+        """Returns arches holding the int_1d and scan_info of idxs.
+        Call refresh first, idxs not in the live file are skipped.
+
+        args:
+            idxs: list, arch idx to load
+            arch_kwargs: passed to EwaldArch, for example gi
+
+        returns:
+            arches: list of EwaldArch
+        """
+        if self._file is None:
+            return []
+        f = self._file
+        rows = {int(idx): i for i, idx in enumerate(self.index)}
+        found = [(idx, rows[idx]) for idx in idxs
+                 if isinstance(idx, (int, np.integer)) and idx in rows]
+        if not found:
+            return []
+        for dset in [f['meta']] + list(f['int_1d'].values()):
+            dset.refresh()
+        columns = [str(c) for c in f['meta'].attrs['columns']]
+        arches = []
+        for idx, i in found:
+            arch = EwaldArch(int(idx), static=True, **arch_kwargs)
+            arch.scan_info = dict(zip(columns, map(float, f['meta'][i])))
+            int_1d = int_1d_data_static()
+            for key in f['int_1d']:
+                setattr(int_1d, key, f['int_1d'][key][i])
+            arch.int_1d = int_1d
+            arches.append(arch)
+        return arches
+
+    def close(self):
+        """Closes the live file.
+        """
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._inode = None
+
+
+def _field(int_1d, key):
+    """1d numpy array of int_1d attribute key, None if it is not set.
+    """
+    val = getattr(int_1d, key, None)
+    if val is None or np.ndim(val) != 1:
+        return None
+    return np.asarray(val)
+
+
+def _number(val):
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return np.nan
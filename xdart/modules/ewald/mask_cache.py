@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+from collections import OrderedDict
+import hashlib
+from threading import Condition
+
+# Other imports
+import numpy as np
+
+# This module imports
+
+
+class MaskCache():
+    """Process wide registry of integration masks, keyed by a hash of
+    the mask indices. Each mask of indices is stored once as a packed
+    boolean bitmap. The union of an arch mask and the global mask is
+    built by or-ing bitmaps and kept as an int8 array. Callers get a
+    read-only view of it, and frames with the same masks get back the
+    same view. pyFAI needs a writeable mask to take its crc, so the
+    array itself is kept for it, see writeable and pyfai_mask.
+
+    attributes:
+        lock: Condition, lock around the registry
+        maxsize: int, number of union masks kept before the least
+            recently used one is evicted. Bitmaps are kept for up to
+            4 * maxsize masks.
+        hits, misses: int, counters for union lookups
+
+    methods:
+        get: return union mask array, building it if needed
+        writeable: return the writeable array of a union mask
+        bitmap: return packed bitmap of a mask
+        clear: remove all masks
+    """
+    def __init__(self, maxsize=8):
+        """maxsize: int, number of union masks to keep.
+        """
+        self.maxsize = maxsize
+        self.lock = Condition()
+        self.hits = 0
+        self.misses = 0
+        self._bitmaps = OrderedDict()
+        self._masks = OrderedDict()
+        # id of read-only union -> (union, writeable array)
+        self._writeable = {}
+
+    def __len__(self):
+        return len(self._masks)
+
+    def get(self, shape, *masks):
+        """Returns the union of masks as an array of shape, with 1 for
+        masked pixels.
+
+        args:
+            shape: tuple, shape of the image
+            masks: numpy arrays or None, flat indices of masked pixels
+
+        returns:
+            mask: numpy int8 array, read only, it is shared with
+                every caller using the same masks.
+        """
+        shape = tuple(shape)
+        keys = [mask_key(m) for m in masks if m is not None]
+        key = (shape, tuple(sorted(set(keys))))
+        with self.lock:
+            if key in self._masks:
+                self._masks.move_to_end(key)
+                self.hits += 1
+                return self._masks[key]
+            self.misses += 1
+
+        size = int(np.prod(shape))
+        packed = np.zeros((size + 7) // 8, dtype=np.uint8)
+        for m, k in zip([m for m in masks if m is not None], keys):
+            np.bitwise_or(packed, self._bitmap(m, k, size), out=packed)
+        array = np.unpackbits(packed, count=size).view(np.int8).reshape(shape)
+        mask = array.view()
+        mask.flags.writeable = False
+
+        with self.lock:
+            if key in self._masks:
+                self._masks.move_to_end(key)
+                return self._masks[key]
+            self._masks[key] = mask
+            self._writeable[id(mask)] = (mask, array)
+            while self.maxsize > 0 and len(self._masks) > self.maxsize:
+                _, old = self._masks.popitem(last=False)
+                self._writeable.pop(id(old), None)
+        return mask
+
+    def writeable(self, mask):
+        """Returns the writeable array of a union mask returned by get,
+        the same array for every frame using the union. It must not be
+        changed, it is only for libraries such as pyFAI which need a
+        writeable buffer.
+
+        args:
+            mask: numpy array, union mask from get
+
+        returns:
+            array: numpy array or None, None if mask is not held in
+                the registry
+        """
+        with self.lock:
+            entry = self._writeable.get(id(mask))
+        if entry is None or entry[0] is not mask:
+            return None
+        return entry[1]
+
+    def bitmap(self, mask, size):
+        """Returns mask as a packed bitmap.
+
+        args:
+            mask: numpy array, flat indices of masked pixels
+            size: int, number of pixels in the image
+
+        returns:
+            bitmap: numpy uint8 array, output of np.packbits, read only
+        """
+        return self._bitmap(mask, mask_key(mask), size)
+
+    def _bitmap(self, mask, key, size):
+        key = (size, key)
+        with self.lock:
+            if key in self._bitmaps:
+                self._bitmaps.move_to_end(key)
+                return self._bitmaps[key]
+        full = np.zeros(size, dtype=bool)
+        full[np.asarray(mask, dtype=np.int64)] = True
+        bitmap = np.packbits(full)
+        bitmap.flags.writeable = False
+        with self.lock:
+            self._bitmaps[key] = bitmap
+            while self.maxsize > 0 and len(self._bitmaps) > 4 * self.maxsize:
+                self._bitmaps.popitem(last=False)
+        return bitmap
+
+    def clear(self):
+        """Removes all masks from the registry.
+        """
+        with self.lock:
+            self._bitmaps.clear()
+            self._masks.clear()
+            self._writeable.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def mask_key(mask):
+    """Hashes the indices of a mask. Masks with the same indices in
+    the same order give the same key.
+
+    args:
+        mask: numpy array, flat indices of masked pixels
+
+    returns:
+        key: str, hex digest of the indices
+    """
+    mask = np.ascontiguousarray(mask, dtype=np.int64)
+    return hashlib.blake2b(mask.tobytes(), digest_size=16).hexdigest()
+
+
+def pyfai_mask(mask):
+    """Returns a mask pyFAI can use. pyFAI takes a crc of the mask
+    buffer, which fails for read-only arrays. Union masks of the
+    registry are passed as their writeable array, so pyFAI gets the
+    same array for every frame, other read-only masks are copied.
+
+    args:
+        mask: numpy array or None
+
+    returns:
+        mask: numpy array or None, writeable
+    """
+    if not isinstance(mask, np.ndarray) or mask.flags.writeable:
+        return mask
+    array = mask_cache.writeable(mask)
+    if array is None:
+        return mask.copy()
+    return array
+
+
+def negative_pixels(map_raw):
+    """Flat indices of pixels below 0, the default mask of an arch.
+
+    args:
+        map_raw: numpy array, raw image
+
+    returns:
+        mask: numpy array, flat indices
+    """
+    return np.flatnonzero(np.asarray(map_raw) < 0)
+
+
+mask_cache = MaskCache()
+
+
+def get_mask(shape, *masks):
+    """Returns union of masks from the process wide registry. See
+    MaskCache.get.
+    """
+    return mask_cache.get(shape, *masks)
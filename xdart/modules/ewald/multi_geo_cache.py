@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+from collections import OrderedDict
+from threading import Condition
+
+# Other imports
+import numpy as np
+from pyFAI.containers import Integrate1dResult, Integrate2dResult
+from pyFAI.multi_geometry import MultiGeometry
+
+# This module imports
+from .integrator_cache import geometry_key
+
+
+class MultiGeometryCache():
+    """Registry of pyFAI MultiGeometry objects keyed on the
+    geometries of the integrators they combine, see geometry_key, and
+    the MultiGeometry arguments. The same set of geometries gives back
+    the same MultiGeometry, along with its thread pool and any arrays
+    pyFAI stored on it, even if the integrators were rebuilt after
+    being evicted from the integrator cache.
+
+    attributes:
+        lock: Condition, lock around the registry
+        maxsize: int, number of MultiGeometry kept before the least
+            recently used one is evicted
+        hits, misses: int, counters for cache lookups
+
+    methods:
+        get: return cached MultiGeometry, creating it if needed
+        clear: remove all MultiGeometry
+    """
+    def __init__(self, maxsize=4):
+        """maxsize: int, number of MultiGeometry to keep. Each one
+            holds a thread pool, so keep this small.
+        """
+        self.maxsize = maxsize
+        self.lock = Condition()
+        self.hits = 0
+        self.misses = 0
+        self._multi_geos = OrderedDict()
+
+    def __len__(self):
+        return len(self._multi_geos)
+
+    def get(self, integrators, mg_args={}):
+        """Returns MultiGeometry combining integrators.
+
+        args:
+            integrators: list of AzimuthalIntegrator
+            mg_args: dict, arguments for the MultiGeometry constructor
+
+        returns:
+            multi_geo: MultiGeometry
+        """
+        key = (tuple(geometry_key(ai) for ai in integrators),
+               repr(sorted(mg_args.items())))
+        with self.lock:
+            if key in self._multi_geos:
+                self._multi_geos.move_to_end(key)
+                self.hits += 1
+                return self._multi_geos[key]
+            self.misses += 1
+            multi_geo = MultiGeometry(list(integrators), **mg_args)
+            self._multi_geos[key] = multi_geo
+            while self.maxsize > 0 and len(self._multi_geos) > self.maxsize:
+                self._multi_geos.popitem(last=False)
+        return multi_geo
+
+    def clear(self):
+        """Removes all MultiGeometry from the registry.
+        """
+        with self.lock:
+            self._multi_geos.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def combine_results(results, empty=0.0):
+    """Combines MultiGeometry results of chunks of frames the same way
+    MultiGeometry combines the results of single frames.
+
+    args:
+        results: list of Integrate1dResult or Integrate2dResult from
+            MultiGeometry.integrate1d or integrate2d
+        empty: float, value for bins with no pixels
+
+    returns:
+        result: Integrate1dResult or Integrate2dResult
+    """
+    if len(results) == 1:
+        return results[0]
+    last = results[-1]
+    signal = sum(r.sum_signal for r in results)
+    normalization = sum(r.sum_normalization for r in results)
+    count = sum(r.count for r in results)
+    variance = None
+    if all(r.sum_variance is not None for r in results):
+        variance = sum(r.sum_variance for r in results)
+
+    norm = np.maximum(normalization, np.finfo("float32").tiny)
+    invalid = count <= 0.0
+    intensity = signal / norm
+    intensity[invalid] = empty
+    sigma = None
+    if variance is not None:
+        sigma = np.sqrt(variance) / norm
+        sigma[invalid] = empty
+
+    if isinstance(last, Integrate2dResult):
+        result = Integrate2dResult(intensity, last.radial, last.azimuthal,
+                                   sigma)
+        result._set_sum(signal)
+    else:
+        result = Integrate1dResult(last.radial, intensity, sigma)
+    result._set_compute_engine(last.compute_engine)
+    result._set_unit(last.unit)
+    result._set_sum_signal(signal)
+    result._set_sum_normalization(normalization)
+    result._set_sum_variance(variance)
+    result._set_count(count)
+    return result
+
+
+multi_geo_cache = MultiGeometryCache()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+from threading import Condition
+
+# Other imports
+import numpy as np
+import pandas as pd
+
+# This module imports
+
+
+class ScanData():
+    """Column store for the scan metadata of a sphere. Each counter or
+    motor is one column of a float64 array kept in Fortran order, so
+    every column is contiguous, with a matching int64 array of arch
+    idx. Both are preallocated and doubled when full, so adding a row
+    is O(1) instead of the O(n) copy of growing a DataFrame. Rows are
+    kept sorted by idx, a row added before the last one or replacing
+    one copies the arrays, so frames handed out earlier never change.
+
+    Columns are set by the first row. Like DataFrame.loc, later rows
+    have nan for missing columns and extra keys are dropped.
+
+    attributes:
+        columns: list, names of the columns
+        index: numpy array, arch idx of the rows, a view
+        lock: Condition, lock around the arrays
+        values: numpy array, (rows, columns) data, a view
+
+    methods:
+        append: adds or replaces the row of an arch
+        frame: DataFrame sharing memory with the store
+        from_frame: replaces the contents with a DataFrame
+        clear: removes all rows and columns
+    """
+    def __init__(self, data=None, capacity=64):
+        """data: DataFrame or None, initial rows
+        capacity: int, rows allocated at first
+        """
+        self.lock = Condition()
+        self._capacity = max(1, int(capacity))
+        self.clear()
+        if data is not None:
+            self.from_frame(data)
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def index(self):
+        return self._index[:self._n]
+
+    @property
+    def values(self):
+        return self._data[:self._n]
+
+    def clear(self):
+        """Removes all rows and columns.
+        """
+        with self.lock:
+            self.columns = []
+            self._n = 0
+            self._index = np.zeros(self._capacity, dtype=np.int64)
+            self._data = np.zeros((self._capacity, 0), order='F')
+            self._frame = None
+
+    def from_frame(self, data):
+        """Replaces the contents with data.
+
+        args:
+            data: DataFrame, numeric columns indexed by arch idx
+        """
+        with self.lock:
+            data = data.sort_index()
+            n = len(data)
+            capacity = max(self._capacity, n)
+            self.columns = list(data.columns)
+            self._index = np.zeros(capacity, dtype=np.int64)
+            self._index[:n] = np.asarray(data.index, dtype=np.int64)
+            self._data = np.zeros((capacity, len(self.columns)), order='F')
+            self._data[:n] = np.asarray(
+                data.apply(pd.to_numeric, errors='coerce'), dtype=np.float64
+            )
+            self._n = n
+            self._frame = None
+
+    def append(self, idx, info):
+        """Adds the row of arch idx, or replaces it if idx is already in
+        the store.
+
+        args:
+            idx: int, arch idx
+            info: dict, scan_info of the arch
+
+        returns:
+            at_end: bool, True if the row was added after all others
+        """
+        with self.lock:
+            if not self.columns and self._n == 0:
+                self.columns = list(info.keys())
+                self._data = np.zeros((self._capacity, len(self.columns)),
+                                      order='F')
+            row = np.array([_number(info.get(c, np.nan)) for c in self.columns])
+            n = self._n
+            capacity = self._index.shape[0]
+            if n == 0 or idx > self._index[n - 1]:
+                if n == capacity:
+                    self._grow(2 * n)
+                self._index[n] = idx
+                self._data[n] = row
+                self._n = n + 1
+                self._frame = None
+                return True
+
+            pos = int(np.searchsorted(self._index[:n], idx))
+            self._grow(2 * capacity if n == capacity else capacity)
+            if self._index[pos] == idx:
+                self._data[pos] = row
+                self._frame = None
+                return False
+            self._index[pos + 1:n + 1] = self._index[pos:n]
+            self._data[pos + 1:n + 1] = self._data[pos:n]
+            self._index[pos] = idx
+            self._data[pos] = row
+            self._n = n + 1
+            self._frame = None
+            return False
+
+    def _grow(self, capacity):
+        """Copies the rows to new arrays with room for capacity rows.
+        """
+        index = np.zeros(capacity, dtype=np.int64)
+        index[:self._n] = self._index[:self._n]
+        data = np.zeros((capacity, self._data.shape[1]), order='F')
+        data[:self._n] = self._data[:self._n]
+        self._index = index
+        self._data = data
+
+    def frame(self):
+        """Returns the rows as a DataFrame without copying. The frame
+        is rebuilt only after the store changed, and does not see rows
+        added later.
+
+        returns:
+            data: DataFrame, indexed by arch idx
+        """
+        with self.lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame(
+                    self._data[:self._n], index=self._index[:self._n],
+                    columns=self.columns, copy=False
+                )
+            return self._frame
+
+
+def _number(val):
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return np.nan
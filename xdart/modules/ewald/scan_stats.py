@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+from threading import Condition
+
+# Other imports
+import numpy as np
+
+# This module imports
+from xdart import utils
+
+
+class StreamStats():
+    """Per element count, mean, variance, min and max of a stream of
+    arrays with the same shape. Updated in place with Welford's
+    algorithm, so the variance stays accurate over long scans without
+    keeping the arrays. Elements can be left out of an update, so each
+    element has its own count.
+
+    attributes:
+        count: numpy array, number of values seen by each element
+        m2: numpy array, summed squared deviations from the mean
+        max: numpy array, largest value, -inf if none seen
+        mean: numpy array, running mean
+        min: numpy array, smallest value, inf if none seen
+
+    methods:
+        update: adds an array to the statistics
+        variance: variance of each element
+        reset: drops the statistics
+    """
+    keys = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Drops the statistics, the next array starts new ones.
+        """
+        for key in self.keys:
+            setattr(self, key, None)
+
+    def update(self, arr, valid=None):
+        """Adds arr to the statistics. If the shape of arr changed the
+        statistics are started again.
+
+        args:
+            arr: numpy array, new values
+            valid: numpy bool array or None, elements to update. Non
+                finite values are always left out.
+        """
+        arr = np.asarray(arr, dtype=float)
+        if valid is None:
+            valid = np.isfinite(arr)
+        else:
+            valid = valid & np.isfinite(arr)
+        if self.mean is None or self.mean.shape != arr.shape:
+            self._start(arr.shape)
+        x = np.where(valid, arr, 0.)
+        self.count += valid
+        delta = x - self.mean
+        delta *= valid
+        self.mean += np.divide(delta, self.count, out=np.zeros_like(delta),
+                               where=self.count > 0)
+        x -= self.mean
+        x *= delta
+        self.m2 += x
+        np.fmin(self.min, np.where(valid, arr, np.inf), out=self.min)
+        np.fmax(self.max, np.where(valid, arr, -np.inf), out=self.max)
+
+    def _start(self, shape):
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+
+    def variance(self, ddof=1):
+        """Variance of each element, nan where count is not more than
+        ddof.
+
+        args:
+            ddof: int, delta degrees of freedom, 1 for sample variance
+
+        returns:
+            var: numpy array or None if nothing was added
+        """
+        if self.mean is None:
+            return None
+        return np.divide(self.m2, self.count - ddof,
+                         out=np.full(self.m2.shape, np.nan),
+                         where=self.count > ddof)
+
+
+class ScanStats():
+    """Streaming statistics of a scan. Keeps per pixel statistics of
+    the background subtracted frames and per bin statistics of the 1d
+    integration, plus a short summary of every frame. Hot pixels and
+    outlier frames can then be found without reading the frames again.
+
+    attributes:
+        bins: StreamStats, per bin statistics of int_1d norm
+        frame_idx: list, idx of each arch added
+        frame_score: list, rms deviation of each 1d pattern from the
+            bins seen before it, in standard deviations. nan until
+            min_count patterns have been seen.
+        frame_total: list, summed unmasked intensity of each frame
+        lock: Condition, lock around the statistics
+        min_count: int, patterns a bin needs before it is scored
+        pixels: StreamStats, per pixel statistics of map_raw - bg_raw
+
+    methods:
+        add_arch: adds the frame and 1d pattern of an arch
+        hot_pixels: flat indices of pixels with an outlying mean
+        outlier_frames: idx of frames with outlying intensity or 1d
+            pattern
+        from_hdf5: loads statistics from an hdf5 file
+        to_hdf5: saves statistics to an hdf5 file
+        reset: drops all statistics
+    """
+    def __init__(self, min_count=5):
+        """min_count: int, patterns a bin needs before frame_score
+            uses it.
+        """
+        self.lock = Condition()
+        self.min_count = min_count
+        self.pixels = StreamStats()
+        self.bins = StreamStats()
+        self.reset()
+
+    def reset(self):
+        """Drops all statistics.
+        """
+        with self.lock:
+            self.pixels.reset()
+            self.bins.reset()
+            self.frame_idx = []
+            self.frame_total = []
+            self.frame_score = []
+
+    def add_arch(self, arch, global_mask=None):
+        """Adds map_raw - bg_raw and the int_1d norm of arch.
+
+        args:
+            arch: EwaldArch, integrated arch
+            global_mask: numpy array or None, flat indices of pixels
+                masked for the whole scan
+        """
+        frame = np.asarray(arch.map_raw - arch.bg_raw, dtype=float)
+        valid = None
+        if arch.mask is not None:
+            valid = arch.get_mask(global_mask) == 0
+
+        norm, covered = None, None
+        int_1d = arch.int_1d
+        if hasattr(int_1d, 'pcount'):
+            norm = int_1d.norm.full()
+            covered = int_1d.pcount.full() > 0
+        elif int_1d.norm is not None and np.ndim(int_1d.norm) > 0:
+            norm = np.asarray(int_1d.norm, dtype=float)
+
+        with self.lock:
+            self.pixels.update(frame, valid)
+            score = np.nan
+            if norm is not None:
+                score = self._score(norm, covered)
+                self.bins.update(norm, covered)
+            self.frame_idx.append(arch.idx)
+            if valid is None:
+                self.frame_total.append(float(np.nansum(frame)))
+            else:
+                self.frame_total.append(float(np.nansum(frame[valid])))
+            self.frame_score.append(score)
+
+    def _score(self, norm, covered):
+        """rms deviation of norm from the current bin statistics.
+        """
+        var = self.bins.variance()
+        if var is None or var.shape != norm.shape:
+            return np.nan
+        use = np.isfinite(norm) & (var > 0) & (self.bins.count >= self.min_count)
+        if covered is not None:
+            use &= covered
+        if not use.any():
+            return np.nan
+        z2 = (norm[use] - self.bins.mean[use]) ** 2 / var[use]
+        return float(np.sqrt(np.mean(z2)))
+
+    def hot_pixels(self, nsigma=5):
+        """Finds pixels whose mean is far above the mean of the other
+        pixels, using the median and median absolute deviation.
+
+        args:
+            nsigma: float, threshold in robust standard deviations
+
+        returns:
+            idx: numpy array, flat indices of hot pixels, the same form
+                as EwaldArch.mask
+        """
+        with self.lock:
+            if self.pixels.mean is None:
+                return np.array([], dtype=int)
+            seen = self.pixels.count > 0
+            mean = self.pixels.mean
+            med, sigma = _robust_center(mean[seen])
+            hot = seen & (mean - med > nsigma * sigma)
+            return np.flatnonzero(hot)
+
+    def outlier_frames(self, nsigma=5):
+        """Finds frames whose total intensity is far from the others,
+        or whose 1d pattern deviated from the scan by more than nsigma.
+
+        args:
+            nsigma: float, threshold in robust standard deviations
+
+        returns:
+            idxs: list, arch idx of outlier frames
+        """
+        with self.lock:
+            if not self.frame_idx:
+                return []
+            total = np.asarray(self.frame_total, dtype=float)
+            score = np.asarray(self.frame_score, dtype=float)
+            med, sigma = _robust_center(total)
+            out = np.abs(total - med) > nsigma * sigma
+            out |= np.nan_to_num(score) > nsigma
+            return [idx for idx, o in zip(self.frame_idx, out) if o]
+
+    def to_hdf5(self, grp, compression=None):
+        """Saves the statistics to hdf5 file.
+
+        args:
+            grp: h5py Group or File, where the data will be saved
+            compression: str, compression algorithm to use. See h5py
+                documentation.
+        """
+        with self.lock:
+            for key in ('pixels', 'bins'):
+                if key not in grp:
+                    grp.create_group(key)
+                utils.attributes_to_h5(getattr(self, key), grp[key],
+                                       StreamStats.keys,
+                                       compression=compression)
+            utils.attributes_to_h5(
+                self, grp, ['frame_idx', 'frame_total', 'frame_score'],
+                compression=compression
+            )
+
+    def from_hdf5(self, grp):
+        """Loads the statistics from hdf5 file.
+
+        args:
+            grp: h5py Group or File, object to load data from.
+        """
+        with self.lock:
+            for key in ('pixels', 'bins'):
+                if key in grp:
+                    utils.h5_to_attributes(getattr(self, key), grp[key],
+                                           StreamStats.keys)
+            utils.h5_to_attributes(
+                self, grp, ['frame_idx', 'frame_total', 'frame_score']
+            )
+            self.frame_idx = list(self.frame_idx)
+            self.frame_total = list(self.frame_total)
+            self.frame_score = list(self.frame_score)
+
+
+def _robust_center(arr):
+    """Median and standard deviation estimated from the median absolute
+    deviation, falling back to the standard deviation if that is 0.
+    """
+    if arr.size == 0:
+        return 0., np.inf
+    med = np.median(arr)
+    sigma = 1.4826 * np.median(np.abs(arr - med))
+    if sigma == 0:
+        sigma = np.std(arr)
+    if sigma == 0:
+        sigma = np.inf
+    return med, sigma
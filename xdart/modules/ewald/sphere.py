@@ -3,10 +3,17 @@ import os
 from pathlib import Path
 import pandas as pd
 import numpy as np
-from pyFAI.multi_geometry import MultiGeometry
+from pyFAI import units
 
 from .arch import EwaldArch
 from .arch_series import ArchSeries
+from .batch_integrator import BatchIntegrator
+from .bai_accumulator import BaiAccumulator
+from .scan_stats import ScanStats
+from .scan_data import ScanData
+from .multi_geo_cache import multi_geo_cache, combine_results
+from .mask_cache import negative_pixels
+from .live_file import LiveWriter, LiveReader, live_file_name, remove_live_file
 from xdart.utils.containers import int_1d_data, int_2d_data
 from xdart.utils.containers import int_1d_data_static, int_2d_data_static
 from xdart import utils
@@ -19,15 +26,24 @@ class EwaldSphere:
     integrator from pyFAI.
 
     Attributes:
+        arch_cache_size: float, bytes of arches kept in memory by arches
+        arch_flush_interval: float or None, seconds between background
+            writes of cached arches
         arches: ArchSeries, list of arches indexed by their idx value
         bai_1d: int_1d_data object, stores result of 1d integration
         bai_1d_args: dict, arguments for invidivual arch integrate1d
             method
+        bai_1d_sum: BaiAccumulator, running sums behind bai_1d, also
+            sets how often bai_1d is saved
         bai_2d: int_2d_data object, stores result of 2d integration
         bai_2d_args: dict, arguments for invidivual arch integrate2d
             method
+        bai_2d_sum: BaiAccumulator, running sums behind bai_2d, also
+            sets how often bai_2d is saved
         data_file: str, file to save data to
         file_lock: lock for ensuring one writer to hdf5 file
+        live: LiveWriter or None, writes the 1d results of added
+            arches to a SWMR live file for the viewer
         mg_args: arguments for MultiGeometry constructor
         mgi_1d: int_1d_data object, stores result from multigeometry
             integrate1d method
@@ -35,8 +51,12 @@ class EwaldSphere:
             integrate2d method
         multi_geo: MultiGeometry instance
         name: str, name of the sphere
-        scan_data: DataFrame, stores all scan metadata
+        scan_data: DataFrame, stores all scan metadata, a view of
+            scan_store
+        scan_store: ScanData, column store holding the scan metadata
         sphere_lock: lock for modifying data in sphere
+        stats: ScanStats or None, streaming per pixel, per bin and per
+            frame statistics of added arches, saved with bai_1d
 
     Methods:
         add_arch: adds new arch and optionally updates other data
@@ -44,6 +64,10 @@ class EwaldSphere:
             arch individually and sums the result, stored in bai_1d
         by_arch_integrate_2d: Runs 2 dimensional integration of each
             arch individually and sums the result, stored in bai_2d
+        close_live: closes the live file
+        drop_live: removes the live file when int_1d is rewritten
+        live_arches: reads arches from the live file without file_lock
+        flush_bai: Saves bai_1d and bai_2d if they have unsaved frames
         load_from_h5: loads data from hdf5 file
         set_multi_geo: sets the MultiGeometry instance
         multigeometry_integrate_1d: wrapper for MultiGeometry
@@ -62,7 +86,10 @@ class EwaldSphere:
                  bai_1d_args={}, bai_2d_args={},
                  static=False, gi=False, th_mtr='th', series_average=False,
                  overall_raw=0, single_img=False,
-                 global_mask=None, poni_dict={}
+                 global_mask=None, poni_dict={},
+                 arch_cache_size=0, arch_flush_interval=None,
+                 bai_save_frames=1, bai_save_interval=None,
+                 scan_stats=False, live=False
                  ):
         """name: string, name of sphere object.
         arches: list of EwaldArch object, data to intialize with
@@ -74,6 +101,20 @@ class EwaldSphere:
             AzimuthalIntegrator
         bai_2d_args: dict, arguments for the integrate2d method of pyFAI
             AzimuthalIntegrator
+        arch_cache_size: float, bytes of arches kept in memory by the
+            ArchSeries, 0 to read and write every arch from file
+        arch_flush_interval: float or None, seconds between background
+            writes of cached arches, see ArchSeries
+        bai_save_frames: int or None, frames added between saves of
+            bai_1d and bai_2d, 1 to save after every frame
+        bai_save_interval: float or None, seconds between saves of
+            bai_1d and bai_2d
+        scan_stats: bool, if True keeps ScanStats of the arches added
+            with add_arch. Adds a full frame of work and storage per
+            save, so best used with a bai_save_interval.
+        live: bool, if True and static, the int_1d and scan_info of
+            arches added with add_arch are also written to a live file
+            readers can poll without file_lock, see LiveWriter
         """
         super().__init__()
         self.file_lock = Condition()
@@ -91,21 +132,22 @@ class EwaldSphere:
         self.th_mtr = th_mtr
         self.single_img = single_img
         self.series_average = series_average
+        self.arch_cache_size = arch_cache_size
+        self.arch_flush_interval = arch_flush_interval
 
-        if arches:
-            self.arches = ArchSeries(self.data_file, self.file_lock, arches,
-                                     static=self.static, gi=self.gi)
-        else:
-            self.arches = ArchSeries(self.data_file, self.file_lock,
-                                     static=self.static, gi=self.gi)
+        self.arches = self._new_arch_series(arches)
         self.scan_data = scan_data
 
         self.mg_args = mg_args
         if len(arches) > 0:
-            self.multi_geo = MultiGeometry([a.integrator for a in arches], **mg_args)
+            self.multi_geo = multi_geo_cache.get(
+                [a.integrator for a in arches], mg_args
+            )
 
         self.bai_1d_args = bai_1d_args
         self.bai_2d_args = bai_2d_args
+        self.bai_1d_sum = BaiAccumulator(bai_save_frames, bai_save_interval)
+        self.bai_2d_sum = BaiAccumulator(bai_save_frames, bai_save_interval)
         self.mgi_1d = int_1d_data()
         self.mgi_2d = int_2d_data()
         self.sphere_lock = Condition(_PyRLock())
@@ -120,6 +162,48 @@ class EwaldSphere:
         self.overall_raw = overall_raw
         self.global_mask = global_mask
         self.poni_dict = poni_dict
+        self.stats = None
+        if scan_stats:
+            self.stats = ScanStats()
+        self.live = None
+        if live and static:
+            self.live = LiveWriter(self.data_file)
+        self._live_reader = None
+
+    @property
+    def bai_1d(self):
+        """Overall 1d result. For scanning spheres the sums are held
+        by bai_1d_sum and are copied in when bai_1d is read.
+        """
+        return self.bai_1d_sum.result(self._bai_1d)
+
+    @bai_1d.setter
+    def bai_1d(self, value):
+        self._bai_1d = value
+        self.bai_1d_sum.reset()
+
+    @property
+    def bai_2d(self):
+        """Overall 2d result. For scanning spheres the sums are held
+        by bai_2d_sum and are copied in when bai_2d is read.
+        """
+        return self.bai_2d_sum.result(self._bai_2d)
+
+    @bai_2d.setter
+    def bai_2d(self, value):
+        self._bai_2d = value
+        self.bai_2d_sum.reset()
+
+    @property
+    def scan_data(self):
+        """Scan metadata as a DataFrame indexed by arch idx. The rows
+        are held by scan_store and the frame shares its memory.
+        """
+        return self.scan_store.frame()
+
+    @scan_data.setter
+    def scan_data(self, value):
+        self.scan_store = ScanData(value)
 
     def reset(self):
         """Resets all held data objects to blank state, called when all
@@ -130,9 +214,11 @@ class EwaldSphere:
             self.scan_data = pd.DataFrame()
             self.mgi_1d = int_1d_data()
             self.mgi_2d = int_2d_data()
-            self.arches = ArchSeries(self.data_file, self.file_lock,
-                                     static=self.static, gi=self.gi)
+            self.arches.close()
+            self.arches = self._new_arch_series()
             self.global_mask = None
+            if self.stats is not None:
+                self.stats.reset()
             if self.static:
                 self.bai_1d = int_1d_data_static()
                 self.bai_2d = int_2d_data_static()
@@ -141,6 +227,14 @@ class EwaldSphere:
                 self.bai_2d = int_2d_data()
             self.overall_raw = 0
 
+    def _new_arch_series(self, arches=[]):
+        """Creates empty ArchSeries using the sphere settings.
+        """
+        return ArchSeries(self.data_file, self.file_lock, arches,
+                          static=self.static, gi=self.gi,
+                          cache_size=self.arch_cache_size,
+                          flush_interval=self.arch_flush_interval)
+
     def add_arch(self, arch=None, calculate=True, update=True, get_sd=True,
                  set_mg=True, **kwargs):
         """Adds new arch to sphere.
@@ -170,41 +264,105 @@ class EwaldSphere:
                 arch.integrate_1d(global_mask=self.global_mask, **self.bai_1d_args)
                 arch.integrate_2d(global_mask=self.global_mask, **self.bai_2d_args)
             arch.file_lock = self.file_lock
-            self.arches = self.arches.append(pd.Series(arch, index=[arch.idx]))
-            self.arches.sort_index(inplace=True)
 
+            if self.stats is not None:
+                self.stats.add_arch(arch, self.global_mask)
+
+            at_end = None
             if arch.scan_info and get_sd:
-                ser = pd.Series(arch.scan_info, dtype='float64')
-                if list(self.scan_data.columns):
-                    try:
-                        self.scan_data.loc[arch.idx] = ser
-                    except ValueError:
-                        print('Mismatched columns')
-                else:
-                    self.scan_data = pd.DataFrame(
-                        arch.scan_info, index=[arch.idx], dtype='float64'
-                    )
-                self.scan_data.sort_index(inplace=True)
-                with self.file_lock:
+                at_end = self._add_scan_data(arch)
+            save_1d = save_2d = False
+            if update:
+                self._update_bai_1d(arch, save=False)
+                self._update_bai_2d(arch, save=False)
+                save_1d = self.bai_1d_sum.save_due()
+                save_2d = self.bai_2d_sum.save_due()
+            # one open of the data file for all writes of this arch
+            with self.file_lock, utils.h5pool.hold(self.data_file):
+                self.arches[arch.idx] = arch
+                if save_1d or save_2d or at_end is not None:
                     with utils.catch_h5py_file(self.data_file, 'a') as file:
                         compression = 'lzf'
                         if self.static:
                             compression = None
-                        utils.dataframe_to_h5(self.scan_data, file,
-                                              'scan_data', compression)
-            if update:
-                self._update_bai_1d(arch)
-                self._update_bai_2d(arch)
+                        if at_end:
+                            utils.dataframe_append_h5(self.scan_data, file,
+                                                      'scan_data', compression)
+                        elif at_end is not None:
+                            utils.dataframe_to_h5(self.scan_data, file,
+                                                  'scan_data', compression)
+                        if save_1d:
+                            self.bai_1d.to_hdf5(file['bai_1d'])
+                            self._save_stats(file)
+                            self.bai_1d_sum.saved()
+                        if save_2d:
+                            self.bai_2d.to_hdf5(file['bai_2d'])
+                            self.bai_2d_sum.saved()
+            if self.live is not None:
+                self.live.append(arch)
             if set_mg:
-                self.multi_geo = MultiGeometry(
-                    [a.integrator for a in self.arches], **self.mg_args
+                self.multi_geo = multi_geo_cache.get(
+                    [a.integrator for a in self.arches], self.mg_args
                 )
 
             self.overall_raw += (arch.map_raw - arch.bg_raw)
 
+    def close_live(self):
+        """Closes the live file, called when the scan is finished.
+        """
+        if self.live is not None:
+            self.live.close()
+
+    def drop_live(self):
+        """Removes the live file of data_file, called before int_1d of
+        the arches is rewritten so viewers read the new results from
+        the scan file instead of the live copy.
+        """
+        if self.live is not None:
+            self.live.close()
+        else:
+            remove_live_file(self.data_file)
+        if self._live_reader is not None:
+            self._live_reader.close()
+
+    def live_arches(self, idxs):
+        """Returns arches with the int_1d and scan_info of idxs, read
+        from the live file of data_file without file_lock. Used by
+        viewers to poll a scan while it is written, the live file is
+        removed once the scan is finished, see LiveWriter.
+
+        args:
+            idxs: list, arch idx to read
+
+        returns:
+            arches: list of EwaldArch, only for idxs already in the
+                live file
+        """
+        reader = self._live_reader
+        if reader is None or reader.fname != live_file_name(self.data_file):
+            if reader is not None:
+                reader.close()
+            reader = self._live_reader = LiveReader(self.data_file)
+        reader.refresh()
+        return reader.load(idxs, gi=self.gi)
+
+    def _add_scan_data(self, arch):
+        """Adds the scan_info of arch to scan_data.
+
+        args:
+            arch: EwaldArch, arch with scan_info
+
+        returns:
+            at_end: bool or None, True if a row was added after all
+                other rows so the saved scan_data can be grown in
+                place, False if scan_data has to be saved in full
+        """
+        return self.scan_store.append(arch.idx, arch.scan_info)
+
     def by_arch_integrate_1d(self, **args):
         """Integrates all arches individually, then sums the results for
-        the overall integration result.
+        the overall integration result. Static, non grazing incidence
+        spheres use batch_integrate_1d.
 
         args: see EwaldArch.integrate_1d. If any args are passed, the
             bai_1d_args dictionary is also updated with the new args.
@@ -214,20 +372,27 @@ class EwaldSphere:
             args = self.bai_1d_args
         else:
             self.bai_1d_args = args.copy()
+        if self.static and not self.gi:
+            self.batch_integrate_1d(**args)
+            return
+        self.drop_live()
         with self.sphere_lock:
             if self.static:
                 self.bai_1d = int_1d_data_static()
             else:
                 self.bai_1d = int_1d_data()
 
-            for arch in self.arches:
-                arch.integrate_1d(global_mask=self.global_mask, **args)
-                self.arches[arch.idx] = arch
-                self._update_bai_1d(arch)
+            with self.file_lock, utils.h5pool.hold(self.data_file):
+                for arch in self.arches:
+                    arch.integrate_1d(global_mask=self.global_mask, **args)
+                    self.arches[arch.idx] = arch
+                    self._update_bai_1d(arch)
+                self.flush_bai()
 
     def by_arch_integrate_2d(self, **args):
         """Integrates all arches individually, then sums the results for
-        the overall integration result.
+        the overall integration result. Static, non grazing incidence
+        spheres use batch_integrate_2d.
 
         args: see EwaldArch.integrate_2d. If any args are passed, the
             bai_2d_args dictionary is also updated with the new args.
@@ -237,74 +402,216 @@ class EwaldSphere:
             args = self.bai_2d_args
         else:
             self.bai_2d_args = args.copy()
+        if self.static and not self.gi:
+            self.batch_integrate_2d(**args)
+            return
         with self.sphere_lock:
             if self.static:
                 self.bai_2d = int_2d_data_static()
             else:
                 self.bai_2d = int_2d_data()
 
-            for arch in self.arches:
-                arch.integrate_2d(global_mask=self.global_mask, **args)
-                self.arches[arch.idx] = arch
-                self._update_bai_2d(arch)
+            with self.file_lock, utils.h5pool.hold(self.data_file):
+                for arch in self.arches:
+                    arch.integrate_2d(global_mask=self.global_mask, **args)
+                    self.arches[arch.idx] = arch
+                    self._update_bai_2d(arch)
+                self.flush_bai()
 
-    def _update_bai_1d(self, arch):
-        """helper function to update overall bai variables.
+    def batch_integrate_1d(self, max_memory=1e9, **args):
+        """Integrates all arches of a static scan with the
+        BatchIntegrator, a chunk of frames at a time, then sums the
+        results for the overall integration result. Only the int_1d
+        group of each arch is rewritten.
+
+        args:
+            max_memory: float, approximate number of bytes of frame
+                data to integrate in one chunk
+            args: see EwaldArch.integrate_1d. If no args are passed,
+                uses bai_1d_args attribute.
+        """
+        if not args:
+            args = self.bai_1d_args
+        args = args.copy()
+        monitor = args.pop('monitor', None)
+        self.drop_live()
+        with self.sphere_lock:
+            self.arches.flush()
+            self.bai_1d = int_1d_data_static()
+            with self.file_lock, utils.h5pool.hold(self.data_file):
+                for arches in self._batch_chunks(max_memory):
+                    stack, masks, norms = self._batch_stack(arches, monitor, dim=1)
+                    engine = BatchIntegrator(arches[0].integrator)
+                    results = engine.integrate_1d(stack, masks=masks, norms=norms,
+                                                  **args)
+                    for arch, result, norm in zip(arches, results, norms):
+                        arch.map_norm = norm
+                        arch.int_1d.from_result(result, arch.integrator.wavelength,
+                                                unit=args.get('unit', units.TTH_DEG))
+                        self._update_bai_1d(arch, save=False)
+                    self._save_arch_results(arches, 'int_1d')
+                self.save_bai_1d()
+
+    def batch_integrate_2d(self, max_memory=1e9, **args):
+        """Integrates all arches of a static scan with the
+        BatchIntegrator, a chunk of frames at a time, then sums the
+        results for the overall integration result. Only the int_2d
+        group of each arch is rewritten.
+
+        args:
+            max_memory: float, approximate number of bytes of frame
+                data to integrate in one chunk
+            args: see EwaldArch.integrate_2d. If no args are passed,
+                uses bai_2d_args attribute.
+        """
+        if not args:
+            args = self.bai_2d_args
+        args = args.copy()
+        monitor = args.pop('monitor', None)
+        unit = args.get('unit', units.TTH_DEG)
+        with self.sphere_lock:
+            self.arches.flush()
+            self.bai_2d = int_2d_data_static()
+            with self.file_lock, utils.h5pool.hold(self.data_file):
+                for arches in self._batch_chunks(max_memory):
+                    stack, masks, norms = self._batch_stack(arches, monitor, dim=2)
+                    if args.get('npt_rad') is None:
+                        args['npt_rad'] = stack.shape[1]
+                    if args.get('npt_azim') is None:
+                        args['npt_azim'] = stack.shape[2]
+                    engine = BatchIntegrator(arches[0].integrator)
+                    results = engine.integrate_2d(stack, masks=masks, norms=norms,
+                                                  **args)
+                    for arch, result in zip(arches, results):
+                        arch.int_2d.from_result(result, arch.integrator.wavelength,
+                                                unit=unit)
+                        self._update_bai_2d(arch, save=False)
+                    self._save_arch_results(arches, 'int_2d')
+                self.save_bai_2d()
+
+    def _batch_chunks(self, max_memory):
+        """Yields lists of arches whose frames fit in max_memory.
+        """
+        chunk = []
+        chunk_size = None
+        for arch in self.arches:
+            if chunk_size is None:
+                frame_bytes = np.asarray(arch.map_raw, dtype=float).nbytes
+                # stack, valid mask and masked copy are held at once
+                chunk_size = max(1, int(max_memory // (3 * frame_bytes)))
+            chunk.append(arch)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _batch_stack(self, arches, monitor, dim=1):
+        """Builds background subtracted frame stack, masks and
+        normalization factors for a list of arches. Normalization
+        follows EwaldArch.integrate_1d and integrate_2d.
+        """
+        stack = np.empty((len(arches),) + arches[0].map_raw.shape)
+        masks = []
+        norms = np.ones(len(arches))
+        for i, arch in enumerate(arches):
+            stack[i] = arch.map_raw - arch.bg_raw
+            if arch.mask is None:
+                arch.mask = negative_pixels(arch.map_raw)
+            masks.append(arch.get_mask(self.global_mask))
+            if dim == 2:
+                if monitor is None:
+                    norms[i] = arch.map_norm
+            elif monitor is not None:
+                if monitor.upper() in arch.scan_info.keys():
+                    norms[i] = arch.scan_info[monitor.upper()]
+                elif monitor.lower() in arch.scan_info.keys():
+                    norms[i] = arch.scan_info[monitor.lower()]
+        return stack, masks, norms
+
+    def _save_arch_results(self, arches, key, compression=None):
+        """Saves only map_norm and the int_1d or int_2d group of each
+        arch.
+        """
+        with self.file_lock:
+            with utils.catch_h5py_file(self.data_file, 'a') as file:
+                for arch in arches:
+                    grp = file['arches'][str(arch.idx)]
+                    utils.attributes_to_h5(arch, grp, ['map_norm'])
+                    if key not in grp:
+                        grp.create_group(key)
+                    getattr(arch, key).to_hdf5(grp[key], compression)
+
+    def _update_bai_1d(self, arch, save=True):
+        """helper function to update overall bai variables. Scanning
+        spheres add into bai_1d_sum in place. If save is True, bai_1d
+        is saved when bai_1d_sum says a save is due.
         """
         with self.sphere_lock:
-            try:
-                assert list(self.bai_1d.raw.shape) == list(arch.int_1d.raw.shape)
-            except (AssertionError, AttributeError):
-                if not self.static:
-                    self.bai_1d.raw = np.zeros(arch.int_1d.raw.shape)
-                    self.bai_1d.pcount = np.zeros(arch.int_1d.pcount.shape)
-                self.bai_1d.norm = np.zeros(arch.int_1d.norm.shape)
-                self.bai_1d.sigma = np.zeros(arch.int_1d.norm.shape)
-                self.bai_1d.sigma_raw = np.zeros(arch.int_1d.norm.shape)
-            try:
-                self.bai_1d += arch.int_1d
-                self.bai_1d.ttheta = arch.int_1d.ttheta
-                self.bai_1d.q = arch.int_1d.q
-            except AttributeError:
-                pass
-            self.save_bai_1d()
-
-    def _update_bai_2d(self, arch):
-        """helper function to update overall bai variables.
+            if self.static:
+                try:
+                    assert list(self.bai_1d.raw.shape) == list(arch.int_1d.raw.shape)
+                except (AssertionError, AttributeError):
+                    self.bai_1d.norm = np.zeros(arch.int_1d.norm.shape)
+                    self.bai_1d.sigma = np.zeros(arch.int_1d.norm.shape)
+                    self.bai_1d.sigma_raw = np.zeros(arch.int_1d.norm.shape)
+                try:
+                    self.bai_1d.norm += arch.int_1d.norm
+                    self.bai_1d.ttheta = arch.int_1d.ttheta
+                    self.bai_1d.q = arch.int_1d.q
+                except AttributeError:
+                    pass
+                self.bai_1d_sum.tick()
+            else:
+                try:
+                    self.bai_1d_sum.add(arch.int_1d, self._bai_1d)
+                except AttributeError:
+                    pass
+            if save and self.bai_1d_sum.save_due():
+                self.save_bai_1d()
+
+    def _update_bai_2d(self, arch, save=True):
+        """helper function to update overall bai variables. Scanning
+        spheres add into bai_2d_sum in place. If save is True, bai_2d
+        is saved when bai_2d_sum says a save is due.
         """
         with self.sphere_lock:
-            try:
-                # assert self.bai_2d.raw.shape == arch.int_2d.raw.shape
-                if self.static:
+            if self.static:
+                try:
                     assert self.bai_2d.i_qChi.shape == arch.int_2d.i_qChi.shape
-                else:
-                    assert self.bai_2d.norm.shape == arch.int_2d.norm.shape
-            except (AssertionError, AttributeError):
-                if self.static:
+                except (AssertionError, AttributeError):
                     self.bai_2d.i_qChi = np.zeros(arch.int_2d.i_qChi.shape)
                     self.bai_2d.i_tthChi = np.zeros(arch.int_2d.i_tthChi.shape)
                     self.bai_2d.i_QxyQz = np.zeros(arch.int_2d.i_QxyQz.shape)
-                else:
-                    self.bai_2d.norm = np.zeros(arch.int_2d.norm.shape)
-                    self.bai_2d.raw = np.zeros(arch.int_2d.raw.shape)
-                    self.bai_2d.pcount = np.zeros(arch.int_2d.pcount.shape)
-                    self.bai_2d.sigma = np.zeros(arch.int_2d.norm.shape)
-                    self.bai_2d.sigma_raw = np.zeros(arch.int_2d.norm.shape)
-            try:
-                self.bai_2d.ttheta = arch.int_2d.ttheta
-                self.bai_2d.q = arch.int_2d.q
-                self.bai_2d.chi = arch.int_2d.chi
-                if not self.static:
-                    self.bai_2d += arch.int_2d
-                else:
+                try:
+                    self.bai_2d.ttheta = arch.int_2d.ttheta
+                    self.bai_2d.q = arch.int_2d.q
+                    self.bai_2d.chi = arch.int_2d.chi
                     self.bai_2d.i_qChi += arch.int_2d.i_qChi
                     self.bai_2d.i_tthChi += arch.int_2d.i_tthChi
                     self.bai_2d.i_QxyQz += arch.int_2d.i_QxyQz
                     self.bai_2d.qz = arch.int_2d.qz
                     self.bai_2d.qxy = arch.int_2d.qxy
-            except AttributeError:
-                pass
-            self.save_bai_2d()
+                except AttributeError:
+                    pass
+                self.bai_2d_sum.tick()
+            else:
+                try:
+                    self.bai_2d_sum.add(arch.int_2d, self._bai_2d)
+                except AttributeError:
+                    pass
+            if save and self.bai_2d_sum.save_due():
+                self.save_bai_2d()
+
+    def flush_bai(self):
+        """Saves bai_1d and bai_2d if frames were added to them since
+        they were last saved.
+        """
+        with self.sphere_lock:
+            if self.bai_1d_sum.unsaved:
+                self.save_bai_1d()
+            if self.bai_2d_sum.unsaved:
+                self.save_bai_2d()
 
     def set_multi_geo(self, **args):
         """Sets the MultiGeometry instance stored in the arch.
@@ -315,82 +622,125 @@ class EwaldSphere:
         """
         self.mg_args.update(args)
         with self.sphere_lock:
-            self.multi_geo = MultiGeometry(
-                [a.integrator for a in self.arches], **self.mg_args
+            self.multi_geo = multi_geo_cache.get(
+                [a.integrator for a in self.arches], self.mg_args
             )
 
-    def multigeometry_integrate_1d(self, monitor=None, **kwargs):
-        """Wrapper for integrate1d method of MultiGeometry.
+    def multigeometry_integrate_1d(self, monitor=None, max_memory=1e9,
+                                   **kwargs):
+        """Wrapper for integrate1d method of MultiGeometry. Frames are
+        read once into a stack, max_memory bytes at a time, and the
+        results of the chunks are combined.
 
         args:
             monitor: channel with normalization value
+            max_memory: float, approximate number of bytes of frames
+                and masks held at once
             kwargs: see MultiGeometry.integrate1d
 
         returns:
             result: result from MultiGeometry.integrate1d
         """
         with self.sphere_lock:
-            lst_mask = [a.get_mask() for a in self.arches]
-            if monitor is None:
-                try:
-                    result = self.multi_geo.integrate1d(
-                        [a.map_norm for a in self.arches], lst_mask=lst_mask,
-                        **kwargs
-                    )
-                except Exception as e:
-                    print(e)
-                    print('Exception 1')
-                    result = self.multi_geo.integrate1d(
-                        [a.map_raw for a in self.arches], lst_mask=lst_mask,
-                        **kwargs
-                    )
-            else:
-                result = self.multi_geo.integrate1d(
-                    [a.map_raw for a in self.arches], lst_mask=lst_mask,
-                    normalization_factor=list(self.scan_data[monitor]),
-                    **kwargs
-                )
-
-            self.mgi_1d.from_result(result, self.multi_geo.wavelength)
+            result, wavelength = self._multigeometry_integrate(
+                1, monitor, max_memory, **kwargs
+            )
+            self.mgi_1d.from_result(result, wavelength)
         return result
 
-    def multigeometry_integrate_2d(self, monitor=None, **kwargs):
-        """Wrapper for integrate1d method of MultiGeometry.
+    def multigeometry_integrate_2d(self, monitor=None, max_memory=1e9,
+                                   **kwargs):
+        """Wrapper for integrate2d method of MultiGeometry. Frames are
+        read once into a stack, max_memory bytes at a time, and the
+        results of the chunks are combined.
 
         args:
             monitor: channel with normalization value
-            kwargs: see MultiGeometry.integrate1d
+            max_memory: float, approximate number of bytes of frames
+                and masks held at once
+            kwargs: see MultiGeometry.integrate2d
 
         returns:
-            result: result from MultiGeometry.integrate1d
+            result: result from MultiGeometry.integrate2d
         """
         with self.sphere_lock:
-            lst_mask = [a.get_mask() for a in self.arches]
-            if monitor is None:
-                try:
-                    result = self.multi_geo.integrate2d(
-                        [a.map_raw / a.map_norm for a in self.arches], lst_mask=lst_mask,
-                        **kwargs
-                    )
-                except Exception as e:
-                    print(e)
-                    print('Exception 2')
-                    result = self.multi_geo.integrate2d(
-                        [a.map_raw for a in self.arches], lst_mask=lst_mask,
-                        **kwargs
-                    )
-            else:
-                result = self.multi_geo.integrate2d(
-                    [a.map_raw for a in self.arches], lst_mask=lst_mask,
-                    normalization_factor=list(self.scan_data[monitor]),
-                    **kwargs
+            result, wavelength = self._multigeometry_integrate(
+                2, monitor, max_memory, **kwargs
+            )
+            self.mgi_2d.from_result(result, wavelength)
+        return result
+
+    def _multigeometry_integrate(self, dim, monitor, max_memory, **kwargs):
+        """Integrates all arches with MultiGeometry, a chunk of frames
+        at a time. 1d uses map_raw, 2d uses map_raw / map_norm, and
+        with a monitor the scan_data channel is passed as the
+        normalization factor.
+
+        returns:
+            result: combined MultiGeometry result
+            wavelength: float, wavelength of the MultiGeometry
+        """
+        results = []
+        multi_geo = None
+        for arches, stack, masks in self._mg_chunks(dim, max_memory):
+            multi_geo = multi_geo_cache.get(
+                [a.integrator for a in arches], self.mg_args
+            )
+            if monitor is not None:
+                kwargs['normalization_factor'] = list(
+                    self.scan_data.loc[[a.idx for a in arches], monitor]
                 )
+            if dim == 1:
+                results.append(multi_geo.integrate1d(
+                    list(stack), lst_mask=list(masks), **kwargs
+                ))
+            else:
+                results.append(multi_geo.integrate2d(
+                    list(stack), lst_mask=list(masks), **kwargs
+                ))
+        if multi_geo is None:
+            raise RuntimeError("List of images cannot be empty")
+        self.multi_geo = multi_geo
+        return combine_results(results, multi_geo.empty), multi_geo.wavelength
+
+    def _mg_chunks(self, dim, max_memory):
+        """Reads frames and masks of all arches once, in one file open
+        per chunk, into contiguous stacks that fit in max_memory.
+
+        yields:
+            arches: list of arches in the chunk
+            stack: numpy array, frames of the chunk
+            masks: numpy array, int8 masks of the chunk
+        """
+        chunk_size = None
+        arches = []
+        for arch in self.arches.iter_fields(['raw', 'mask', 'meta']):
+            if chunk_size is None:
+                # float64 frame and int8 mask per arch
+                frame_bytes = arch.map_raw.size * 9
+                chunk_size = max(1, int(max_memory // frame_bytes))
+            arches.append(arch)
+            if len(arches) >= chunk_size:
+                yield self._mg_stack(arches, dim)
+                arches = []
+        if arches:
+            yield self._mg_stack(arches, dim)
 
-            self.mgi_2d.from_result(result, self.multi_geo.wavelength)
-        return result
+    def _mg_stack(self, arches, dim):
+        """Builds frame and mask stacks for _mg_chunks.
+        """
+        shape = (len(arches),) + arches[0].map_raw.shape
+        stack = np.empty(shape)
+        masks = np.empty(shape, dtype=np.int8)
+        for i, arch in enumerate(arches):
+            stack[i] = arch.map_raw
+            if dim == 2:
+                stack[i] /= arch.map_norm
+            masks[i] = arch.get_mask()
+        return arches, stack, masks
 
     def save_to_h5(self, replace=False, *args, **kwargs):
-        """Saves data to hdf5 file.
+        """Saves data to hdf5 file. Cached arches are flushed first.
 
         args:
             replace: bool, if True file is truncated prior to writing
@@ -407,6 +757,7 @@ class EwaldSphere:
         else:
             mode = 'a'
         with self.file_lock:
+            self.arches.flush()
             with utils.catch_h5py_file(self.data_file, mode) as file:
                 self._save_to_h5(file, *args, **kwargs)
 
@@ -442,6 +793,10 @@ class EwaldSphere:
                     grp.create_group(key)
             self.bai_1d.to_hdf5(grp['bai_1d'], compression)
             self.bai_2d.to_hdf5(grp['bai_2d'], compression)
+            if not data_only:
+                self._save_stats(grp)
+            self.bai_1d_sum.saved()
+            self.bai_2d_sum.saved()
             if not self.static:
                 self.mgi_1d.to_hdf5(grp['mgi_1d'], compression)
                 self.mgi_2d.to_hdf5(grp['mgi_2d'], compression)
@@ -468,20 +823,20 @@ class EwaldSphere:
         with self.sphere_lock:
             if 'type' in grp.attrs:
                 if grp.attrs['type'] == 'EwaldSphere':
-                    for arch in grp['arches']:
-                        if int(arch) not in self.arches.index:
-                            self.arches.index.append(int(arch))
-
-                    self.arches.sort_index(inplace=True)
+                    idxs = set(self.arches.index)
+                    idxs.update(int(arch) for arch in grp['arches'])
+                    self.arches.index = sorted(idxs)
 
+                    if "scan_data" in grp:
+                        self.scan_data = utils.h5_to_data(grp["scan_data"])
                     if data_only:
                         lst_attr = [
-                            "scan_data", "overall_raw",
+                            "overall_raw",
                         ]
                         utils.h5_to_attributes(self, grp, lst_attr)
                     else:
                         lst_attr = [
-                            "scan_data", "mg_args", "bai_1d_args",
+                            "mg_args", "bai_1d_args",
                             "bai_2d_args", "overall_raw",
                             "static", "gi", "th_mtr", "single_img", "poni_dict",
                             "series_average"
@@ -499,6 +854,8 @@ class EwaldSphere:
 
                     self.bai_1d.from_hdf5(grp['bai_1d'])
                     self.bai_2d.from_hdf5(grp['bai_2d'])
+                    if self.stats is not None and 'scan_stats' in grp:
+                        self.stats.from_hdf5(grp['scan_stats'])
                     if not self.static:
                         self.mgi_1d.from_hdf5(grp['mgi_1d'])
                         self.mgi_2d.from_hdf5(grp['mgi_2d'])
@@ -550,6 +907,17 @@ class EwaldSphere:
         with self.file_lock:
             with utils.catch_h5py_file(self.data_file, 'a') as file:
                 self.bai_1d.to_hdf5(file['bai_1d'], compression=compression)
+                self._save_stats(file)
+        self.bai_1d_sum.saved()
+
+    def _save_stats(self, grp):
+        """Saves stats to the scan_stats group, if stats are kept.
+        """
+        if self.stats is None:
+            return
+        if 'scan_stats' not in grp:
+            grp.create_group('scan_stats')
+        self.stats.to_hdf5(grp['scan_stats'])
 
     def save_bai_2d(self, compression='lzf'):
         """Function to save only the bai_2d object.
@@ -565,6 +933,7 @@ class EwaldSphere:
         with self.file_lock:
             with utils.catch_h5py_file(self.data_file, 'a') as file:
                 self.bai_2d.to_hdf5(file['bai_2d'], compression=compression)
+        self.bai_2d_sum.saved()
 
     def _set_args(self, args):
         """Ensures any range args are lists.
@@ -592,35 +961,17 @@ def get_1D_data(h5_file, arch_ids=None, static=True):
     sphere.load_from_h5(replace=False, mode='r')
 
     df1 = pd.DataFrame(columns=('idx', 'intensity', 'tth', 'q'))
-    with utils.catch_h5py_file(sphere.data_file, 'r') as file:
-        if arch_ids is None:
-            arch_ids = sphere.arches.index
-
-        for idx in arch_ids:
-            try:
-                arch = EwaldArch(idx=idx, static=sphere.static, gi=sphere.gi)
-                if str(idx) not in file['arches']:
-                    print("No data can be found")
-                    continue
-                grp = file['arches'][str(idx)]
-                if 'type' in grp.attrs:
-                    if grp.attrs['type'] == 'EwaldArch':
-                        lst_attr = [
-                            "scan_info", "ai_args",
-                            "gi", "static", "poni_dict"
-                        ]
-                        utils.h5_to_attributes(arch, grp, lst_attr)
-                        arch.int_1d.from_hdf5(grp['int_1d'])
-
-                df1 = df1.append({
-                    'idx': idx,
-                    'intensity': list(arch.int_1d.norm),
-                    'tth': list(arch.int_1d.ttheta),
-                    'q': list(arch.int_1d.q)},
-                    ignore_index=True
-                )
-            except KeyError:
-                pass
+    if arch_ids is None:
+        arch_ids = sphere.arches.index
+
+    for arch in sphere.arches.iter_fields(['int_1d'], idxs=list(arch_ids)):
+        df1 = df1.append({
+            'idx': arch.idx,
+            'intensity': list(arch.int_1d.norm),
+            'tth': list(arch.int_1d.ttheta),
+            'q': list(arch.int_1d.q)},
+            ignore_index=True
+        )
 
     df1.set_index(df1['idx'], inplace=True)
     df2 = sphere.scan_data
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+import copy
+import os
+
+# Other imports
+import h5py
+import numpy as np
+import pandas as pd
+
+# This module imports
+from xdart import utils
+from xdart.utils.containers import PONI, int_1d_data, int_2d_data
+from xdart.utils.containers import int_1d_data_static, int_2d_data_static
+from xdart.utils.containers.nzarrays import nzarray1d
+from .arch import EwaldArch
+from .mask_cache import mask_cache
+
+
+# geometry saved per frame, detector is saved once
+PONI_KEYS = ('dist', 'poni1', 'poni2', 'rot1', 'rot2', 'rot3', 'wavelength')
+
+# arch attributes saved once per scan, taken from the first frame
+CONSTANT_KEYS = ['ai_args', 'gi', 'static', 'poni_dict']
+
+# bytes aimed for in one chunk of the small per frame datasets
+CHUNK_BYTES = 2**20
+
+
+class StackedWriter():
+    """Writes the arches of a scan in the stacked layout. Each field is
+    one dataset with the frame as first axis:
+
+        idx: (N,) arch idx, in the order written
+        map_raw: (N, ny, nx) frames, one frame per chunk
+        bg_raw: (N, ny, nx), or (N,) if the background is a number
+        map_norm: (N,)
+        mask: (N, ceil(ny * nx / 8)) packed bitmaps of the masks
+        scan_info/<key>: (N,) float64 for numbers and bools, or
+            strings for text values
+        poni/<key>: (N,) geometry of each frame
+        int_1d/<attr>, int_2d/<attr>: (N, ...) attributes of the
+            integration results, nzarrays saved full size
+
+    The detector, poni_dict, ai_args, gi and static are saved once in
+    the constants group. Rows of a key missing from a frame are nan
+    for floats, 0 for integers and empty for text. A frame whose rows
+    do not fit the datasets already written raises ValueError before
+    anything is written.
+
+    Datasets are chunked and compressed by the storage policy of their
+    class, map_raw and bg_raw are 'raw', int_1d and int_2d attributes
+    are 'int_1d' and 'int_2d', everything else is 'meta'.
+
+    attributes:
+        chunk_frames: int, upper limit of frames per chunk for the
+            small per frame datasets
+        grp: h5py Group, group holding the layout
+        policies: dict, StoragePolicy of each dataset class, classes
+            missing use utils.storage_policies
+
+    methods:
+        append: adds an arch as the next frame
+        extend: adds arches
+    """
+    def __init__(self, grp, policies=None, chunk_frames=256):
+        """grp: h5py Group or File, written to, usually the stack
+            group of a scan file
+        policies: dict or None, StoragePolicy of dataset classes
+        chunk_frames: int, upper limit of frames per chunk
+        """
+        self.grp = grp
+        self.policies = {} if policies is None else dict(policies)
+        self.chunk_frames = chunk_frames
+        grp.attrs['type'] = 'StackedArches'
+        if 'idx' not in grp:
+            self._create(grp, 'idx', np.zeros((), dtype=np.int64), 0)
+
+    def __len__(self):
+        return self.grp['idx'].shape[0]
+
+    def extend(self, arches):
+        """Adds arches in order.
+
+        args:
+            arches: iterable of EwaldArch
+        """
+        for arch in arches:
+            self.append(arch)
+
+    def append(self, arch):
+        """Adds arch as the next frame.
+
+        args:
+            arch: EwaldArch, arch to add
+        """
+        grp = self.grp
+        n = len(self)
+        if n == 0:
+            self._save_constants(arch)
+
+        rows = {'map_raw': arch.map_raw, 'bg_raw': arch.bg_raw,
+                'map_norm': arch.map_norm}
+        if arch.mask is not None and arch.map_raw is not None:
+            rows['mask'] = mask_cache.bitmap(arch.mask, np.size(arch.map_raw))
+        for key, val in arch.scan_info.items():
+            rows['scan_info/' + str(key)] = val
+        for key in PONI_KEYS:
+            rows['poni/' + key] = getattr(arch.poni, key)
+        for name in ('int_1d', 'int_2d'):
+            for key, val in vars(getattr(arch, name)).items():
+                if isinstance(val, nzarray1d):
+                    val = val.full()
+                rows[name + '/' + key] = val
+
+        # check every row first so a bad frame leaves no partial write
+        values = {}
+        for key, val in rows.items():
+            val = _row(val)
+            if val is None:
+                continue
+            if key.startswith('scan_info/') and val.dtype.kind in 'biuf':
+                # float so missing rows are nan
+                val = val.astype(np.float64)
+            val = self._policy(key).cast(val)
+            if key in grp:
+                dset = grp[key]
+                if dset.shape[1:] != val.shape:
+                    raise ValueError(
+                        f'{key} of arch {arch.idx} has shape {val.shape}, '
+                        f'frames in the scan have {dset.shape[1:]}'
+                    )
+                val = _convert(val, dset.dtype, key, arch.idx)
+            values[key] = val
+
+        for key, val in values.items():
+            if key not in grp:
+                self._create(grp, key, val, n)
+            dset = grp[key]
+            dset.resize(n + 1, axis=0)
+            dset[n] = val
+        for dset in _datasets(grp):
+            if dset.shape[0] < n + 1:
+                dset.resize(n + 1, axis=0)
+        grp['idx'][n] = arch.idx
+
+    def _create(self, grp, key, val, n):
+        """Creates the dataset for key, with n empty rows.
+        """
+        if val.dtype.kind in 'USO':
+            dtype = h5py.string_dtype()
+            fill = ''
+        else:
+            dtype = val.dtype
+            fill = np.nan if val.dtype.kind == 'f' else 0
+        row_bytes = max(1, int(np.prod(val.shape)) * np.dtype(dtype).itemsize)
+        frames = max(1, min(self.chunk_frames, CHUNK_BYTES // row_bytes))
+        if dtype == h5py.string_dtype():
+            kwargs = {'chunks': (frames,) + val.shape}
+        else:
+            kwargs = self._policy(key).stacked_kwargs(val.shape, frames)
+        grp.create_dataset(
+            key, (n,) + val.shape, maxshape=(None,) + val.shape,
+            dtype=dtype, fillvalue=fill, **kwargs
+        )
+
+    def _policy(self, key):
+        """StoragePolicy of the dataset key.
+        """
+        if key in utils.RAW_KEYS:
+            name = 'raw'
+        elif key.split('/')[0] in ('int_1d', 'int_2d'):
+            name = key.split('/')[0]
+        else:
+            name = 'meta'
+        return self.policies.get(name, utils.storage_policies[name])
+
+    def _save_constants(self, arch):
+        if 'constants' not in self.grp:
+            self.grp.create_group('constants')
+        const = self.grp['constants']
+        utils.attributes_to_h5(arch, const, CONSTANT_KEYS)
+        if arch.poni is not None and arch.poni.detector is not None:
+            utils.dict_to_h5(arch.poni.to_dict(), const, 'poni')
+        const.attrs['int_1d'] = type(arch.int_1d).__name__
+        const.attrs['int_2d'] = type(arch.int_2d).__name__
+
+
+class StackedReader():
+    """Reads a scan saved by StackedWriter. Opening reads only the idx
+    dataset and the constants, every read after that is a slice of one
+    dataset, so the number of metadata operations does not grow with
+    the number of frames.
+
+    attributes:
+        grp: h5py Group or File holding the layout
+        index: numpy array, arch idx of each frame
+
+    methods:
+        position: row of an arch idx
+        read: slice of one stacked dataset
+        scan_info: all scan_info columns as a DataFrame
+        arch: EwaldArch rebuilt from one frame
+        keys: names of the stacked datasets
+    """
+    def __init__(self, grp):
+        """grp: h5py Group or File holding the layout
+        """
+        self.grp = grp
+        self.index = grp['idx'][()]
+        self._rows = {int(idx): i for i, idx in enumerate(self.index)}
+        self._constants = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, idx):
+        return idx in self._rows
+
+    def __iter__(self):
+        for idx in self.index:
+            yield self.arch(int(idx))
+
+    def keys(self):
+        """Names of the stacked datasets, for example map_raw or
+        int_1d/norm.
+        """
+        return [name for name in _dataset_names(self.grp)
+                if not name.startswith('constants/')]
+
+    def position(self, idx):
+        """Returns the row of arch idx.
+
+        args:
+            idx: int, arch idx
+
+        returns:
+            row: int
+        """
+        try:
+            return self._rows[int(idx)]
+        except KeyError:
+            raise KeyError(f'arch {idx} not in scan') from None
+
+    def read(self, key, rows=slice(None)):
+        """Reads rows of one stacked dataset.
+
+        args:
+            key: str, dataset name, for example 'map_raw' or
+                'int_1d/norm'
+            rows: int, slice or sorted list of rows
+
+        returns:
+            data: numpy array, rows of the dataset, masks are returned
+                as flat indices for a single row
+        """
+        data = self.grp[key][rows]
+        if key == 'mask' and np.ndim(data) == 1:
+            return self._unpack_mask(data)
+        return data
+
+    def scan_info(self):
+        """Returns all scan_info columns, indexed by arch idx.
+
+        returns:
+            scan_info: DataFrame
+        """
+        data = {}
+        if 'scan_info' in self.grp:
+            for key, dset in self.grp['scan_info'].items():
+                data[key] = _decode(dset[()])
+        return pd.DataFrame(data, index=pd.Index(self.index, name='idx'))
+
+    def arch(self, idx, load_2d=True):
+        """Rebuilds the arch of idx.
+
+        args:
+            idx: int, arch idx
+            load_2d: bool, if False map_raw, bg_raw, mask and int_2d
+                are not read
+
+        returns:
+            arch: EwaldArch
+        """
+        i = self.position(idx)
+        const = self._load_constants()
+        grp = self.grp
+
+        poni = copy.copy(const['poni'])
+        for key in PONI_KEYS:
+            if 'poni/' + key in grp:
+                setattr(poni, key, float(grp['poni/' + key][i]))
+        scan_info = {}
+        if 'scan_info' in grp:
+            for key, dset in grp['scan_info'].items():
+                scan_info[key] = _decode(dset[i])
+
+        arch = EwaldArch(
+            int(idx), poni=poni, scan_info=scan_info,
+            ai_args=const['ai_args'], static=const['static'],
+            poni_dict=const['poni_dict'], gi=const['gi']
+        )
+        arch.int_1d = self._container('int_1d', i)
+        if load_2d:
+            arch.map_raw = grp['map_raw'][i] if 'map_raw' in grp else None
+            if 'bg_raw' in grp:
+                arch.bg_raw = grp['bg_raw'][i]
+            if 'mask' in grp:
+                arch.mask = self._unpack_mask(grp['mask'][i])
+            arch.int_2d = self._container('int_2d', i)
+        if 'map_norm' in grp:
+            arch.map_norm = grp['map_norm'][i]
+        return arch
+
+    def _container(self, name, i):
+        const = self._load_constants()
+        cls = _containers[const[name]]
+        out = cls()
+        if name in self.grp:
+            for key, dset in self.grp[name].items():
+                setattr(out, key, dset[i])
+        return out
+
+    def _unpack_mask(self, bits):
+        size = None
+        if 'map_raw' in self.grp:
+            size = int(np.prod(self.grp['map_raw'].shape[1:]))
+        return np.flatnonzero(np.unpackbits(bits, count=size))
+
+    def _load_constants(self):
+        if self._constants is None:
+            const = {'ai_args': {}, 'gi': False, 'static': False,
+                     'poni_dict': None, 'poni': PONI(),
+                     'int_1d': 'int_1d_data', 'int_2d': 'int_2d_data'}
+            if 'constants' in self.grp:
+                grp = self.grp['constants']
+                holder = _Holder()
+                utils.h5_to_attributes(holder, grp,
+                                       [k for k in CONSTANT_KEYS if k in grp])
+                const.update(vars(holder))
+                if 'poni' in grp:
+                    const['poni'] = PONI.from_yamdict(utils.h5_to_dict(grp['poni']))
+                for key in ('int_1d', 'int_2d'):
+                    if key in grp.attrs:
+                        const[key] = str(grp.attrs[key])
+            self._constants = const
+        return self._constants
+
+
+def convert_to_stacked(src, dst, policies=None, chunk_frames=256):
+    """Converts a scan file with one group per arch to the stacked
+    layout. The arches are written to the stack group of dst, all
+    other groups and the attributes of src are copied as they are.
+
+    args:
+        src: str, path of the scan file to convert
+        dst: str, path of the new file, must be different from src
+        policies: dict or None, StoragePolicy of dataset classes, see
+            StackedWriter
+        chunk_frames: int, see StackedWriter
+
+    returns:
+        n: int, number of arches converted
+    """
+    if os.path.abspath(src) == os.path.abspath(dst):
+        raise ValueError('dst must be a different file from src')
+    with utils.catch_h5py_file(src, 'r') as fin:
+        with utils.catch_h5py_file(dst, 'w') as fout:
+            for key in fin:
+                if key != 'arches':
+                    fin.copy(key, fout)
+            for key, val in fin.attrs.items():
+                fout.attrs[key] = val
+            writer = StackedWriter(fout.create_group('stack'), policies,
+                                   chunk_frames)
+            if 'arches' not in fin:
+                return 0
+            idxs = sorted(int(k) for k in fin['arches'].keys())
+            for idx in idxs:
+                grp = fin['arches'][str(idx)]
+                static = False
+                if 'static' in grp:
+                    static = bool(utils.h5_to_data(grp['static']))
+                arch = EwaldArch(idx, static=static)
+                arch.load_from_h5(fin['arches'])
+                writer.append(arch)
+            return len(writer)
+
+
+class _Holder():
+    """Plain object to load constants onto with h5_to_attributes.
+    """
+
+
+_containers = {
+    'int_1d_data': int_1d_data,
+    'int_2d_data': int_2d_data,
+    'int_1d_data_static': int_1d_data_static,
+    'int_2d_data_static': int_2d_data_static,
+}
+
+
+def _row(val):
+    """Numpy array of one frame of a field, None if it can not be
+    stacked.
+    """
+    if val is None:
+        return None
+    arr = np.asarray(val)
+    if arr.dtype.kind in 'US':
+        return arr.astype(object)
+    if arr.dtype.kind == 'O':
+        if arr.ndim == 0 and isinstance(arr.item(), str):
+            return arr
+        return None
+    return arr
+
+
+def _convert(val, dtype, key, idx):
+    """Converts the row val of arch idx to the dtype of dataset key,
+    raises ValueError if it can not be stored there.
+    """
+    if h5py.check_string_dtype(dtype) is not None:
+        if val.dtype.kind != 'O':
+            raise ValueError(
+                f'{key} of arch {idx} is {val.dtype}, frames in the scan '
+                f'are text'
+            )
+        return val
+    try:
+        if val.dtype.kind == 'O':
+            raise TypeError
+        return val.astype(dtype)
+    except (TypeError, ValueError):
+        raise ValueError(
+            f'{key} of arch {idx} can not be stored as {dtype}'
+        ) from None
+
+
+def _decode(val):
+    if isinstance(val, bytes):
+        return val.decode()
+    if isinstance(val, np.ndarray) and val.dtype.kind == 'O':
+        return np.array([v.decode() if isinstance(v, bytes) else v
+                         for v in val], dtype=object)
+    return val
+
+
+def _datasets(grp):
+    """All datasets in grp and its subgroups, constants excluded.
+    """
+    for key, item in grp.items():
+        if key == 'constants':
+            continue
+        if isinstance(item, h5py.Group):
+            yield from _datasets(item)
+        else:
+            yield item
+
+
+def _dataset_names(grp, prefix=''):
+    for key, item in grp.items():
+        if isinstance(item, h5py.Group):
+            yield from _dataset_names(item, prefix + key + '/')
+        else:
+            yield prefix + key
@@ -1,2 +1,4 @@
 from ._utils import *
+from ._axes import AXIS_KEYS, AxisRegistry, axis_registry, axes_to_h5
+from ._repack import repack
 from . import containers
\ No newline at end of file
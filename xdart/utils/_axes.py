@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+import hashlib
+from threading import Condition
+import weakref
+
+# Other imports
+import numpy as np
+
+# This module imports
+from ._utils import attributes_to_h5, data_to_h5, write_digests
+
+# attributes of the integration containers which hold axes
+AXIS_KEYS = ('ttheta', 'q', 'chi', 'qz', 'qxy')
+
+# group of a scan file holding the axes shared by its arches
+AXES_GROUP = 'shared_axes'
+
+
+class AxisRegistry():
+    """Process wide table of the axis arrays of integration results,
+    by content, so the ttheta, q and chi of frames integrated with
+    the same geometry are one array in memory. Arrays given to intern
+    are copied once, the copy is made read-only and handed out for
+    every array with the same content. Axes no longer used by any
+    container are dropped.
+
+    attributes:
+        hits: int, arrays found in the table
+        lock: Condition, lock around the table
+        min_size: int, smaller arrays are not interned
+        misses: int, arrays added to the table
+
+    methods:
+        intern: returns the shared array with the content of an array
+        clear: empties the table and resets the counters
+    """
+    def __init__(self, min_size=2):
+        """min_size: int, arrays with fewer values are not interned
+        """
+        self.min_size = min_size
+        self.lock = Condition()
+        self._axes = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._axes)
+
+    def intern(self, arr):
+        """Returns the shared read-only array with the content of arr.
+        Values which are not numeric arrays of at least min_size
+        values are returned as they are.
+
+        args:
+            arr: object, axis to intern
+
+        returns:
+            arr: numpy array, shared, or the value given
+        """
+        if not _is_axis(arr, self.min_size):
+            return arr
+        key = axis_digest(arr)
+        with self.lock:
+            shared = self._axes.get(key)
+            if shared is not None:
+                self.hits += 1
+                return shared
+            shared = np.array(arr)
+            shared.flags.writeable = False
+            self._axes[key] = shared
+            self.misses += 1
+        return shared
+
+    def clear(self):
+        """Empties the table and resets the counters.
+        """
+        with self.lock:
+            self._axes.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def axis_digest(arr):
+    """Hex digest of the type, shape and values of a numpy array.
+    """
+    arr = np.ascontiguousarray(arr)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{arr.dtype.str}{arr.shape}'.encode())
+    h.update(arr.view(np.uint8).reshape(-1) if arr.size else b'')
+    return h.hexdigest()
+
+
+def axes_to_h5(obj, grp, lst_attr, **kwargs):
+    """Saves the axes lst_attr of obj to grp. Numeric arrays are
+    written once per file, in the shared_axes group by digest, and
+    grp holds a hard link to them, so they are read as any other
+    dataset. Links already pointing at the right array are not
+    rewritten. Other values are saved with attributes_to_h5.
+
+    args:
+        obj: object holding the axes
+        grp: h5py File or Group, where the links are made
+        lst_attr: list of str, attributes to save
+        kwargs: passed to data_to_h5
+    """
+    rest = []
+    for attr in lst_attr:
+        data = getattr(obj, attr)
+        if not _is_axis(data, axis_registry.min_size):
+            rest.append(attr)
+            continue
+        digest = axis_digest(data)
+        shared = grp.file.require_group(AXES_GROUP)
+        if digest not in shared:
+            data_to_h5(np.asarray(data), shared, digest, **kwargs)
+            shared[digest].attrs['shared'] = True
+        target = shared[digest]
+        if attr in grp:
+            if grp[attr].id == target.id:
+                continue
+            del grp[attr]
+        write_digests.forget(grp, attr)
+        grp[attr] = target
+    if rest:
+        attributes_to_h5(obj, grp, rest, **kwargs)
+
+
+def _is_axis(arr, min_size):
+    return (isinstance(arr, np.ndarray) and arr.ndim > 0 and
+            arr.size >= min_size and arr.dtype.kind in 'biufc')
+
+
+# axes of all integration containers
+axis_registry = AxisRegistry()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+import hashlib
+import pickle
+from threading import Condition
+
+# Other imports
+import numpy as np
+import pandas as pd
+
+# This module imports
+
+
+# attribute holding the digest of what attributes_to_h5 last wrote
+DIGEST_ATTR = 'write_digest'
+
+
+class _TooLarge(Exception):
+    pass
+
+
+class WriteDigests():
+    """Skips writes of attributes_to_h5 which would not change the
+    file, for example the arguments of a sphere saved after every
+    frame. The digest of the content written is kept in the
+    write_digest attribute of the dataset or group, so it is read
+    back by any process and goes with the file if it is copied or
+    replaced. Attributes whose digest matches the one in the file are
+    not written again.
+
+    Data is only hashed when it replaces something already in the file,
+    so data written once, such as the frames of each arch, is never
+    hashed. Data larger than max_bytes, or which can not be
+    hashed, is always written. Every *_to_h5 writer calls forget before
+    writing, so writes made without attributes_to_h5 drop the digest
+    and are not skipped by mistake.
+
+    attributes:
+        lock: Condition, lock around the counters
+        max_bytes: int, data larger than this is not hashed
+        skipped_ops: int, writes avoided
+        skipped_bytes: int, bytes of data in the writes avoided
+        written_ops: int, writes made by attributes_to_h5
+
+    methods:
+        check: whether data is unchanged since the last write
+        update: records the digest of a write in the file
+        forget: drops the digest of a dataset or group
+        clear: resets the counters
+    """
+    def __init__(self, max_bytes=2**20):
+        """max_bytes: int, data larger than this is always written
+        """
+        self.max_bytes = max_bytes
+        self.lock = Condition()
+        self.skipped_ops = 0
+        self.skipped_bytes = 0
+        self.written_ops = 0
+
+    def check(self, grp, key, data, tag=''):
+        """Returns whether data is what was last written to grp[key]
+        by attributes_to_h5, and the digest to pass to update after
+        writing it.
+
+        args:
+            grp: h5py Group or File, parent of the dataset or group
+            key: str, name of the dataset or group
+            data: object to be written
+            tag: str, added to the digest, for example the arguments
+                data is written with
+
+        returns:
+            unchanged: bool, True if the write can be skipped
+            digest: tuple or None, see update
+        """
+        if key not in grp:
+            # new data, nothing to compare with
+            return False, None
+        digest, size = data_digest(data, self.max_bytes, tag)
+        if digest is None:
+            return False, None
+        digest = digest.hex()
+        if _stored(grp[key]) == digest:
+            with self.lock:
+                self.skipped_ops += 1
+                self.skipped_bytes += size
+            return True, None
+        return False, (grp, key, digest)
+
+    def update(self, digest):
+        """Records the digest returned by check in the file, after the
+        write.
+
+        args:
+            digest: tuple or None, from check
+        """
+        with self.lock:
+            self.written_ops += 1
+        if digest is not None:
+            grp, key, value = digest
+            if key in grp:
+                grp[key].attrs[DIGEST_ATTR] = value
+
+    def forget(self, grp, key):
+        """Drops the digest of grp[key], called before it is written.
+
+        args:
+            grp: h5py Group or File, parent of the dataset or group
+            key: str, name of the dataset or group
+        """
+        if key not in grp:
+            return
+        attrs = grp[key].attrs
+        if DIGEST_ATTR in attrs:
+            del attrs[DIGEST_ATTR]
+
+    def clear(self):
+        """Resets the counters.
+        """
+        with self.lock:
+            self.skipped_ops = 0
+            self.skipped_bytes = 0
+            self.written_ops = 0
+
+
+def _stored(obj):
+    """Digest kept in the attributes of obj, None if there is none.
+    """
+    value = obj.attrs.get(DIGEST_ATTR)
+    if isinstance(value, bytes):
+        value = value.decode()
+    return value
+
+
+def data_digest(data, max_bytes=None, tag=''):
+    """Hashes the content of data, with the types of its parts, so
+    data saved differently gives a different digest.
+
+    args:
+        data: object to hash, numbers, strings, numpy arrays, pandas
+            objects, dicts, lists and tuples are hashed by content,
+            other objects by their pickle
+        max_bytes: int or None, gives up once more bytes are hashed
+        tag: str, added to the digest
+
+    returns:
+        digest: bytes or None, None if data is too large or can not
+            be hashed
+        size: int, bytes hashed
+    """
+    h = hashlib.blake2b(tag.encode(), digest_size=16)
+    budget = [0, max_bytes]
+    try:
+        _feed(h, data, budget)
+    except (_TooLarge, pickle.PicklingError, TypeError, AttributeError,
+            ValueError):
+        return None, budget[0]
+    return h.digest(), budget[0]
+
+
+def _add(h, b, budget):
+    budget[0] += len(b)
+    if budget[1] is not None and budget[0] > budget[1]:
+        raise _TooLarge
+    h.update(b)
+
+
+def _feed(h, data, budget):
+    _add(h, type(data).__name__.encode() + b':', budget)
+    if data is None:
+        return
+    if isinstance(data, (str, bool, int, float, complex)):
+        _add(h, repr(data).encode(), budget)
+    elif isinstance(data, bytes):
+        _add(h, data, budget)
+    elif isinstance(data, (np.ndarray, np.generic)):
+        arr = np.asarray(data)
+        _add(h, f'{arr.dtype.str}{arr.shape}'.encode(), budget)
+        if arr.dtype.hasobject:
+            for item in arr.flat:
+                _feed(h, item, budget)
+        else:
+            if budget[1] is not None and budget[0] + arr.nbytes > budget[1]:
+                raise _TooLarge
+            _add(h, arr.tobytes(), budget)
+    elif isinstance(data, dict):
+        _add(h, str(len(data)).encode(), budget)
+        for key, val in data.items():
+            _feed(h, key, budget)
+            _feed(h, val, budget)
+    elif isinstance(data, (list, tuple)):
+        _add(h, str(len(data)).encode(), budget)
+        for item in data:
+            _feed(h, item, budget)
+    elif isinstance(data, pd.Series):
+        _feed(h, data.name, budget)
+        _feed(h, data.index.to_numpy(), budget)
+        _feed(h, data.to_numpy(), budget)
+    elif isinstance(data, pd.DataFrame):
+        _feed(h, data.columns.to_numpy(), budget)
+        _feed(h, data.index.to_numpy(), budget)
+        _feed(h, data.to_numpy(), budget)
+    else:
+        _add(h, pickle.dumps(data, protocol=4), budget)
+
+
+# counters of the writes of attributes_to_h5, shared by all files
+write_digests = WriteDigests()
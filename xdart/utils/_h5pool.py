@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+from contextlib import contextmanager
+import os
+from threading import Condition
+import time
+
+# Other imports
+import h5py
+
+# This module imports
+
+
+class H5Pool():
+    """Per process registry of open hdf5 files. While a file is held,
+    catch_h5py_file hands out the one pooled handle instead of opening
+    and closing the file for every operation. The handle is opened in
+    append mode the first time it is needed, flushed every flush_writes
+    uses or flush_interval seconds, and closed when the last hold is
+    released. A handle in use in a with block is held too, so it is
+    not closed under it by a release in another thread.
+
+    Only one process can keep a file open for writing, so hold a file
+    only while this process owns it, for example inside file_lock.
+
+    attributes:
+        flush_interval: float or None, seconds between flushes
+        flush_writes: int or None, uses of the handle between flushes
+        lock: Condition, lock around the registry
+        opens: int, number of times a pooled file was opened
+
+    methods:
+        hold: context manager holding a file open
+        acquire: hold a file open until release is called
+        release: drop one hold on a file
+        get: return pooled handle for a file, None if not held
+        flush: flush pooled handles
+        close_all: close all pooled handles
+    """
+    def __init__(self, flush_writes=50, flush_interval=5.0):
+        """flush_writes: int or None, uses between flushes
+        flush_interval: float or None, seconds between flushes
+        """
+        self.flush_writes = flush_writes
+        self.flush_interval = flush_interval
+        self.lock = Condition()
+        self.opens = 0
+        self._entries = {}
+
+    def __contains__(self, filename):
+        return _key(filename) in self._entries
+
+    @contextmanager
+    def hold(self, filename):
+        """Keeps filename open in the pool inside the with block.
+        Holds can be nested.
+
+        args:
+            filename: str, path to hdf5 file
+        """
+        self.acquire(filename)
+        try:
+            yield
+        finally:
+            self.release(filename)
+
+    def acquire(self, filename):
+        """Holds filename open until release is called. The file is
+        only opened when it is first used.
+
+        args:
+            filename: str, path to hdf5 file
+        """
+        with self.lock:
+            entry = self._entries.setdefault(_key(filename), _entry())
+            entry['holds'] += 1
+
+    def release(self, filename):
+        """Drops one hold on filename, closing it if it was the last.
+
+        args:
+            filename: str, path to hdf5 file
+        """
+        key = _key(filename)
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._drop(key, entry)
+
+    def _drop(self, key, entry):
+        """Drops one hold on entry, closing it if it was the last. Call
+        with lock held.
+        """
+        entry['holds'] -= 1
+        if entry['holds'] > 0:
+            return
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        _close(entry)
+
+    def get(self, filename, mode='a', *args, **kwargs):
+        """Returns the pooled handle of filename if it is held, opening
+        it if needed. Modes that truncate or create the file reopen it
+        with that mode.
+
+        args:
+            filename: str, path to hdf5 file
+            mode: str, mode asked for, see h5py docs
+            args, kwargs: passed to h5py.File when the file is opened
+
+        returns:
+            handle: _PooledFile or None if filename is not held
+        """
+        with self.lock:
+            entry = self._entries.get(_key(filename))
+            if entry is None:
+                return None
+            if mode in ('w', 'w-', 'x'):
+                _close(entry)
+                entry['file'] = h5py.File(filename, mode, *args, **kwargs)
+                self.opens += 1
+            elif not entry['file']:
+                if mode == 'r' and not os.path.exists(filename):
+                    return None
+                entry['file'] = h5py.File(filename, 'a', *args, **kwargs)
+                self.opens += 1
+            return _PooledFile(self, entry, filename, mode, args, kwargs)
+
+    def _enter(self, entry, filename):
+        """Holds entry while its handle is used, returns the handle or
+        None if entry was closed since get.
+        """
+        with self.lock:
+            if self._entries.get(_key(filename)) is not entry or \
+                    not entry['file']:
+                return None
+            entry['holds'] += 1
+            return entry['file']
+
+    def _exit(self, entry, filename):
+        """Counts a use of entry and drops the hold taken by _enter.
+        """
+        self._used(entry)
+        with self.lock:
+            self._drop(_key(filename), entry)
+
+    def _used(self, entry):
+        """Counts a use of a pooled handle and flushes it if due.
+        """
+        with self.lock:
+            entry['uses'] += 1
+            now = time.time()
+            due = ((self.flush_writes is not None and
+                    entry['uses'] >= self.flush_writes) or
+                   (self.flush_interval is not None and
+                    now - entry['flushed_at'] >= self.flush_interval))
+            if due and entry['file']:
+                entry['file'].flush()
+                entry['uses'] = 0
+                entry['flushed_at'] = now
+
+    def flush(self, filename=None):
+        """Flushes the pooled handle of filename, or all handles.
+
+        args:
+            filename: str or None, file to flush
+        """
+        with self.lock:
+            if filename is None:
+                entries = list(self._entries.values())
+            else:
+                entries = [self._entries.get(_key(filename))]
+            for entry in entries:
+                if entry is not None and entry['file']:
+                    entry['file'].flush()
+                    entry['uses'] = 0
+                    entry['flushed_at'] = time.time()
+
+    def close_all(self):
+        """Closes all pooled handles and drops all holds.
+        """
+        with self.lock:
+            for entry in self._entries.values():
+                _close(entry)
+            self._entries.clear()
+
+
+class _PooledFile():
+    """Context manager for a pooled handle. Returns the h5py File on
+    enter and holds it until exit, when the use is counted and the
+    hold dropped, the file stays open while other holds remain. If the
+    file was released since get, it is opened just for the with block.
+    """
+    def __init__(self, pool, entry, filename, mode='a', args=(),
+                 kwargs=None):
+        self.pool = pool
+        self.entry = entry
+        self.filename = filename
+        self.mode = mode
+        self.args = args
+        self.kwargs = {} if kwargs is None else kwargs
+        self._own = None
+
+    def __enter__(self):
+        handle = self.pool._enter(self.entry, self.filename)
+        if handle is None:
+            mode = 'r' if self.mode == 'r' else 'a'
+            self._own = h5py.File(self.filename, mode, *self.args,
+                                  **self.kwargs)
+            return self._own
+        return handle
+
+    def __exit__(self, *exc):
+        if self._own is not None:
+            self._own.close()
+            self._own = None
+        else:
+            self.pool._exit(self.entry, self.filename)
+        return False
+
+
+def _entry():
+    return {'holds': 0, 'file': None, 'uses': 0, 'flushed_at': time.time()}
+
+
+def _close(entry):
+    if entry['file']:
+        entry['file'].close()
+    entry['file'] = None
+    entry['uses'] = 0
+
+
+def _key(filename):
+    return os.path.abspath(os.fspath(filename))
+
+
+h5pool = H5Pool()
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+import argparse
+import os
+import sys
+import time
+
+# Other imports
+import h5py
+import numpy as np
+
+# This module imports
+from ._h5pool import h5pool
+from ._storage import POLICY_PRESETS, storage_policies, dataset_class
+from ._utils import catch_h5py_file
+
+# bytes copied or compared at once for large datasets
+BLOCK_BYTES = 2**26
+
+
+def repack(src, dst=None, policies=None, verify=True):
+    """Rewrites a scan file without the free space left by deleted and
+    recreated datasets. Arrays are chunked and compressed by the
+    storage policy of their class, see set_storage_policy, datasets of
+    the stacked layout keep their chunks along the frames. Data types,
+    resizability and attributes are kept, so the content is the same
+    bit for bit, the dtype of a policy is not applied.
+
+    args:
+        src: str, path of the scan file
+        dst: str or None, path of the new file. If None src is
+            replaced once the new file is written and verified.
+        policies: dict or None, StoragePolicy or preset name of
+            dataset classes, classes missing use storage_policies
+        verify: bool, if True every dataset and attribute of the new
+            file is compared with src
+
+    returns:
+        report: dict, size in bytes and time in seconds to read all
+            datasets, before and after, and number of datasets
+
+    raises:
+        ValueError: if the new file differs from src, src is then
+            left as it was
+    """
+    policies = {} if policies is None else dict(policies)
+    for key, policy in policies.items():
+        if isinstance(policy, str):
+            policies[key] = POLICY_PRESETS[policy]
+    in_place = dst is None
+    if in_place:
+        if src in h5pool:
+            raise ValueError(f'{src} is held open in h5pool')
+        dst = src + '.repack'
+    elif os.path.abspath(src) == os.path.abspath(dst):
+        raise ValueError('dst must be a different file from src')
+
+    report = {'size_before': os.path.getsize(src)}
+    report['read_before'], report['datasets'] = _time_read(src)
+    try:
+        with catch_h5py_file(src, 'r') as fin:
+            with catch_h5py_file(dst, 'w') as fout:
+                _copy_attrs(fin, fout)
+                _copy_group(fin, fout, policies, {}, False)
+        if verify:
+            with catch_h5py_file(src, 'r') as fin:
+                with catch_h5py_file(dst, 'r') as fout:
+                    _compare_group(fin, fout)
+    except Exception:
+        if in_place and os.path.exists(dst):
+            os.remove(dst)
+        raise
+    if in_place:
+        os.replace(dst, src)
+        dst = src
+    report['size_after'] = os.path.getsize(dst)
+    report['read_after'], _ = _time_read(dst)
+    return report
+
+
+def _copy_group(sgrp, dgrp, policies, seen, stacked):
+    """Copies the members of sgrp to dgrp. Objects linked more than
+    once are copied once and linked again, seen maps their id to the
+    path of the copy.
+    """
+    stacked = stacked or sgrp.attrs.get('type') == 'StackedArches'
+    for key in sgrp:
+        link = sgrp.get(key, getlink=True)
+        if isinstance(link, (h5py.SoftLink, h5py.ExternalLink)):
+            dgrp[key] = link
+            continue
+        obj = sgrp[key]
+        if obj.id in seen:
+            dgrp[key] = dgrp.file[seen[obj.id]]
+            continue
+        if isinstance(obj, h5py.Group):
+            sub = dgrp.create_group(key)
+            _copy_attrs(obj, sub)
+            _copy_group(obj, sub, policies, seen, stacked)
+        elif isinstance(obj, h5py.Dataset):
+            _copy_dataset(obj, dgrp, key, policies, stacked)
+            _copy_attrs(obj, dgrp[key])
+        else:
+            sgrp.copy(obj, dgrp, key)
+        seen[obj.id] = dgrp[key].name
+
+
+def _copy_dataset(dset, dgrp, key, policies, stacked):
+    """Copies dataset dset to dgrp[key] with the storage policy of its
+    class.
+    """
+    if dset.shape is None:
+        dgrp.create_dataset(key, data=h5py.Empty(dset.dtype))
+        return
+    kwargs = {}
+    resizable = dset.maxshape != dset.shape
+    if len(dset.shape) > 0 and dset.dtype.kind in 'biufc':
+        cls = dataset_class(dgrp, key)
+        policy = policies.get(cls, storage_policies[cls])
+        kwargs = policy.dataset_kwargs(dset.shape)
+        if stacked and dset.chunks is not None:
+            kwargs['chunks'] = dset.chunks
+        if not resizable and kwargs.get('chunks') is True and \
+                len(kwargs) == 1:
+            # fixed size and not compressed, stored contiguous
+            kwargs = {}
+    elif resizable:
+        kwargs = {'chunks': dset.chunks}
+    if resizable:
+        kwargs['maxshape'] = dset.maxshape
+    if dset.nbytes <= BLOCK_BYTES or len(dset.shape) == 0:
+        dgrp.create_dataset(key, data=dset[()], dtype=dset.dtype, **kwargs)
+        return
+    out = dgrp.create_dataset(key, shape=dset.shape, dtype=dset.dtype,
+                              **kwargs)
+    for sl in _blocks(dset):
+        out[sl] = dset[sl]
+
+
+def _copy_attrs(sobj, dobj):
+    for key, val in sobj.attrs.items():
+        dobj.attrs[key] = val
+
+
+def _blocks(dset):
+    """Slices of the first axis of dset, each about BLOCK_BYTES.
+    """
+    rows = dset.shape[0]
+    row_bytes = max(1, dset.nbytes // max(1, rows))
+    step = max(1, BLOCK_BYTES // row_bytes)
+    for start in range(0, rows, step):
+        yield np.s_[start:start + step]
+
+
+def _compare_group(sgrp, dgrp):
+    """Raises ValueError if any member or attribute of dgrp differs
+    from sgrp.
+    """
+    _compare_attrs(sgrp, dgrp)
+    if set(sgrp.keys()) != set(dgrp.keys()):
+        raise ValueError(f'members of {sgrp.name} differ')
+    for key in sgrp:
+        link = sgrp.get(key, getlink=True)
+        if isinstance(link, (h5py.SoftLink, h5py.ExternalLink)):
+            if type(dgrp.get(key, getlink=True)) is not type(link):
+                raise ValueError(f'link {sgrp.name}/{key} differs')
+            continue
+        sobj, dobj = sgrp[key], dgrp[key]
+        if isinstance(sobj, h5py.Group):
+            _compare_group(sobj, dobj)
+        elif isinstance(sobj, h5py.Dataset):
+            _compare_attrs(sobj, dobj)
+            _compare_dataset(sobj, dobj)
+
+
+def _compare_dataset(sdset, ddset):
+    name = sdset.name
+    if (sdset.shape != ddset.shape or sdset.dtype != ddset.dtype or
+            sdset.maxshape != ddset.maxshape):
+        raise ValueError(f'dataset {name} differs')
+    if sdset.shape is None:
+        return
+    if sdset.nbytes <= BLOCK_BYTES or len(sdset.shape) == 0:
+        blocks = [()]
+    else:
+        blocks = _blocks(sdset)
+    for sl in blocks:
+        if not _same(sdset[sl], ddset[sl]):
+            raise ValueError(f'dataset {name} differs')
+
+
+def _compare_attrs(sobj, dobj):
+    if set(sobj.attrs.keys()) != set(dobj.attrs.keys()):
+        raise ValueError(f'attributes of {sobj.name} differ')
+    for key, val in sobj.attrs.items():
+        if not _same(val, dobj.attrs[key]):
+            raise ValueError(f'attribute {key} of {sobj.name} differs')
+
+
+def _same(a, b):
+    """True if a and b hold the same values, nan included.
+    """
+    a, b = np.asarray(a), np.asarray(b)
+    if a.dtype != b.dtype or a.shape != b.shape:
+        return False
+    if a.dtype.hasobject:
+        return a.tolist() == b.tolist()
+    return a.tobytes() == b.tobytes()
+
+
+def _time_read(fname):
+    """Seconds to read every dataset of fname and the number of
+    datasets.
+    """
+    dsets = []
+    with catch_h5py_file(fname, 'r') as f:
+        start = time.perf_counter()
+
+        def read(name, obj):
+            if isinstance(obj, h5py.Dataset) and obj.shape is not None:
+                if obj.nbytes <= BLOCK_BYTES or len(obj.shape) == 0:
+                    obj[()]
+                else:
+                    for sl in _blocks(obj):
+                        obj[sl]
+                dsets.append(name)
+
+        f.visititems(read)
+        return time.perf_counter() - start, len(dsets)
+
+
+def main(argv=None):
+    """Command line entry point, see xdart-repack -h.
+    """
+    parser = argparse.ArgumentParser(
+        prog='xdart-repack',
+        description='Rewrites xdart scan files without free space, with '
+                    'the chunks and compression of the storage policies.'
+    )
+    parser.add_argument('src', help='scan file to repack')
+    parser.add_argument('dst', nargs='?', default=None,
+                        help='new file, src is replaced if not given')
+    parser.add_argument('--policy', action='append', default=[],
+                        metavar='CLASS=PRESET',
+                        help='storage preset of a dataset class, for '
+                             'example raw=gzip-1. Classes: raw, int_2d, '
+                             'int_1d, meta. Presets: '
+                             + ', '.join(POLICY_PRESETS))
+    parser.add_argument('--no-verify', action='store_true',
+                        help='do not compare the new file with src')
+    args = parser.parse_args(argv)
+
+    policies = {}
+    for item in args.policy:
+        cls, _, preset = item.partition('=')
+        if cls not in storage_policies or preset not in POLICY_PRESETS:
+            parser.error(f'invalid policy {item}')
+        policies[cls] = preset
+
+    try:
+        report = repack(args.src, args.dst, policies,
+                        verify=not args.no_verify)
+    except (OSError, ValueError) as e:
+        print(f'xdart-repack: {e}', file=sys.stderr)
+        return 1
+    mb = 2**20
+    print(f"{report['datasets']} datasets"
+          f"{'' if args.no_verify else ', verified'}")
+    print(f"size: {report['size_before'] / mb:.2f} MB -> "
+          f"{report['size_after'] / mb:.2f} MB")
+    print(f"read: {report['read_before']:.3f} s -> "
+          f"{report['read_after']:.3f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
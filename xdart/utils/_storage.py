@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+@author: walroth
+"""
+
+# Standard library imports
+import copy
+
+# Other imports
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+# This module imports
+
+
+CODECS = (None, 'lzf', 'gzip', 'blosc', 'bitshuffle')
+
+DATASET_CLASSES = ('raw', 'int_2d', 'int_1d', 'meta')
+
+# keys saved as raw frames and as 2d integrations wherever they are
+RAW_KEYS = ('map_raw', 'bg_raw')
+INT_2D_KEYS = ('i_tthChi', 'i_qChi', 'i_QxyQz')
+
+
+class StoragePolicy():
+    """How one class of datasets is stored in hdf5 files.
+
+    attributes:
+        codec: str or None, None, 'lzf', 'gzip', or 'blosc' and
+            'bitshuffle' which need hdf5plugin. Without hdf5plugin
+            those fall back to lzf with shuffle.
+        level: int or None, compression level for gzip and blosc
+        chunks: True, None or tuple, chunk shape of one array or frame,
+            True lets h5py choose. Resizable datasets are always
+            chunked.
+        dtype: str or None, float arrays are cast to this type before
+            saving, for example 'float32'. Other types are kept.
+        shuffle: bool, byte shuffle before lzf, gzip or blosc, bit
+            shuffle for blosc
+
+    methods:
+        available: whether the codec can be used
+        cast: casts an array to the stored type
+        dataset_kwargs: create_dataset arguments for an array
+        stacked_kwargs: create_dataset arguments for frames stacked
+            along a first axis
+    """
+    def __init__(self, codec=None, level=None, chunks=True, dtype=None,
+                 shuffle=False):
+        if codec not in CODECS:
+            raise ValueError(f'codec must be one of {CODECS}')
+        self.codec = codec
+        self.level = level
+        self.chunks = chunks
+        self.dtype = dtype
+        self.shuffle = shuffle
+
+    def __repr__(self):
+        return (f'StoragePolicy(codec={self.codec!r}, level={self.level!r}, '
+                f'chunks={self.chunks!r}, dtype={self.dtype!r}, '
+                f'shuffle={self.shuffle!r})')
+
+    def available(self):
+        """True if the codec can be used, blosc and bitshuffle need
+        hdf5plugin.
+        """
+        return self.codec not in ('blosc', 'bitshuffle') or hdf5plugin is not None
+
+    def cast(self, arr):
+        """Casts float arrays to dtype.
+
+        args:
+            arr: numpy array
+
+        returns:
+            arr: numpy array, arr itself if nothing changed
+        """
+        if self.dtype is None or arr.dtype.kind != 'f':
+            return arr
+        return arr.astype(self.dtype, copy=False)
+
+    def dataset_kwargs(self, shape):
+        """Returns create_dataset arguments for a resizable dataset.
+
+        args:
+            shape: tuple, shape of the array
+
+        returns:
+            kwargs: dict, chunks and compression arguments
+        """
+        if len(shape) == 0:
+            return {}
+        chunks = True
+        if isinstance(self.chunks, tuple):
+            chunks = _fit_chunks(self.chunks, shape)
+        kwargs = {'chunks': chunks}
+        kwargs.update(self._compression())
+        return kwargs
+
+    def stacked_kwargs(self, row_shape, frames=1):
+        """Returns create_dataset arguments for frames of row_shape
+        stacked along a first, resizable axis.
+
+        args:
+            row_shape: tuple, shape of one frame
+            frames: int, frames per chunk
+
+        returns:
+            kwargs: dict, chunks and compression arguments
+        """
+        row_chunks = tuple(row_shape)
+        if isinstance(self.chunks, tuple):
+            row_chunks = _fit_chunks(self.chunks, row_shape)
+        kwargs = {'chunks': (max(1, int(frames)),) + row_chunks}
+        kwargs.update(self._compression())
+        return kwargs
+
+    def _compression(self):
+        codec = self.codec
+        if codec is None:
+            return {}
+        if not self.available():
+            return {'compression': 'lzf', 'shuffle': True}
+        if codec == 'lzf':
+            return {'compression': 'lzf', 'shuffle': self.shuffle}
+        if codec == 'gzip':
+            level = 4 if self.level is None else self.level
+            return {'compression': 'gzip', 'compression_opts': level,
+                    'shuffle': self.shuffle}
+        if codec == 'blosc':
+            shuffle = hdf5plugin.Blosc.BITSHUFFLE if self.shuffle else \
+                hdf5plugin.Blosc.SHUFFLE
+            level = 5 if self.level is None else self.level
+            return dict(hdf5plugin.Blosc(cname='lz4', clevel=level,
+                                         shuffle=shuffle))
+        return dict(hdf5plugin.Bitshuffle(nelems=0, cname='lz4'))
+
+
+def _fit_chunks(chunks, shape):
+    """Chunk tuple for shape, using the last entries of chunks and no
+    larger than shape.
+    """
+    chunks = tuple(chunks)[-len(shape):] if shape else ()
+    chunks = (None,) * (len(shape) - len(chunks)) + chunks
+    out = []
+    for c, s in zip(chunks, shape):
+        if c is None:
+            c = s
+        if s > 0:
+            c = min(c, s)
+        out.append(max(1, int(c)))
+    return tuple(out)
+
+
+# policies matching how xdart always saved data, no compression and
+# chunks chosen by h5py
+storage_policies = {key: StoragePolicy() for key in DATASET_CLASSES}
+
+# ready made policies, used by the storage benchmark
+POLICY_PRESETS = {
+    'none': StoragePolicy(),
+    'lzf': StoragePolicy('lzf'),
+    'gzip-1': StoragePolicy('gzip', level=1, shuffle=True),
+    'gzip-6': StoragePolicy('gzip', level=6, shuffle=True),
+    'blosc-lz4': StoragePolicy('blosc', level=5, shuffle=True),
+    'bitshuffle-lz4': StoragePolicy('bitshuffle'),
+    'float32-blosc': StoragePolicy('blosc', level=5, shuffle=True,
+                                   dtype='float32'),
+}
+
+
+def get_storage_policy(dataset_class):
+    """Returns the policy of a class of datasets.
+
+    args:
+        dataset_class: str, one of 'raw', 'int_2d', 'int_1d', 'meta'
+
+    returns:
+        policy: StoragePolicy
+    """
+    return storage_policies[dataset_class]
+
+
+def set_storage_policy(dataset_class, policy=None, **kwargs):
+    """Sets the policy of a class of datasets, used for datasets
+    created after the call.
+
+    args:
+        dataset_class: str, one of 'raw', 'int_2d', 'int_1d', 'meta'
+        policy: StoragePolicy or str, a policy or the name of one in
+            POLICY_PRESETS. If None a new policy is made from kwargs.
+        kwargs: passed to StoragePolicy
+    """
+    if dataset_class not in DATASET_CLASSES:
+        raise KeyError(f'dataset_class must be one of {DATASET_CLASSES}')
+    if isinstance(policy, str):
+        policy = copy.copy(POLICY_PRESETS[policy])
+    elif policy is None:
+        policy = StoragePolicy(**kwargs)
+    storage_policies[dataset_class] = policy
+
+
+def dataset_class(grp, key):
+    """Class of the dataset key in grp, found from the key and the
+    names of the groups it is in.
+
+    args:
+        grp: h5py Group, parent group
+        key: str, name of the dataset
+
+    returns:
+        dataset_class: str, one of 'raw', 'int_2d', 'int_1d', 'meta'
+    """
+    if key in RAW_KEYS:
+        return 'raw'
+    if key in INT_2D_KEYS:
+        return 'int_2d'
+    parts = grp.name.split('/')
+    for part in reversed(parts):
+        if part in ('int_2d', 'bai_2d', 'mgi_2d'):
+            return 'int_2d'
+        if part in ('int_1d', 'bai_1d', 'mgi_1d'):
+            return 'int_1d'
+    return 'meta'
+
+
+def storage_args(grp, key, arr, compression=None):
+    """Applies the storage policy of a new dataset to arr.
+
+    args:
+        grp: h5py Group, parent group
+        key: str, name of the dataset
+        arr: numpy array, data to save
+        compression: str or None, used if the policy has no codec
+
+    returns:
+        arr: numpy array, cast by the policy
+        kwargs: dict, chunks and compression arguments for
+            create_dataset
+    """
+    policy = storage_policies[dataset_class(grp, key)]
+    arr = policy.cast(arr)
+    kwargs = policy.dataset_kwargs(arr.shape)
+    if compression is not None and kwargs and 'compression' not in kwargs:
+        kwargs['compression'] = compression
+    return arr, kwargs
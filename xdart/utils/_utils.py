@@ -4,6 +4,9 @@
 """
 
 # Standard library imports
+import ast
+from contextlib import contextmanager
+import threading
 import time
 import os
 import subprocess
@@ -31,6 +34,12 @@ import h5py
 import fabio
 
 # This module imports
+from ._h5pool import H5Pool, h5pool
+from ._digests import WriteDigests, write_digests, data_digest
+from ._storage import (
+    StoragePolicy, POLICY_PRESETS, storage_policies, get_storage_policy,
+    set_storage_policy, dataset_class, storage_args, RAW_KEYS
+)
 from .lmfit_models import PlaneModel, Gaussian2DModel, LorentzianSquared2DModel, Pvoigt2DModel, update_param_hints
 
 from icecream import ic; ic.configureOutput(prefix='', includeContext=True)
@@ -790,11 +799,15 @@ def data_to_h5(data, grp, key, encoder='yaml', compression='lzf'):
             types.
         compression: str, compression algorithm to use. See h5py docs.
     """
+    write_digests.forget(grp, key)
     if data is None:
         none_to_h5(grp, key)
 
     elif type(data) == dict:
-        dict_to_h5(data, grp, key, compression=compression)
+        if record_dtype(data) is not None:
+            record_to_h5(data, grp, key)
+        else:
+            dict_to_h5(data, grp, key, compression=compression)
     
     elif type(data) == str:
         str_to_h5(data, grp, key)
@@ -833,6 +846,7 @@ def data_to_h5(data, grp, key, encoder='yaml', compression='lzf'):
 
 
 def none_to_h5(grp, key):
+    write_digests.forget(grp, key)
     if key in grp:
         del(grp[key])
     grp.create_dataset(key, data=h5py.Empty("f"))
@@ -849,6 +863,7 @@ def dict_to_h5(data, grp, key, **kwargs):
         key: str, name of new group
         **kwargs: passed on to data_to_h5.
     """
+    write_digests.forget(grp, key)
     if key in grp:
         if not check_encoded(grp[key], "dict"):
             del(grp[key])
@@ -858,12 +873,148 @@ def dict_to_h5(data, grp, key, **kwargs):
             new_grp = grp[key]
     else:
         new_grp = grp.create_group(key)
+        new_grp.attrs["encoded"] = "dict"
     
     for jey in data:
         s_key = str(jey)
         sub_data = data[jey]
         data_to_h5(sub_data, new_grp, s_key, **kwargs)
 
+    # types of the keys, so they are read back without eval
+    kinds = key_kinds(new_grp) or {}
+    kinds.update((str(jey), key_kind(jey)) for jey in data)
+    if kinds:
+        new_grp.attrs['keys'] = list(kinds.keys())
+        new_grp.attrs['key_kinds'] = ''.join(kinds.values())
+
+
+def record_dtype(data):
+    """Returns the compound dtype to save dict data as a record, None
+    if data is not a flat dict of numbers, bools and strings.
+
+    args:
+        data: dict, data to check
+
+    returns:
+        dtype: numpy dtype or None
+    """
+    if len(data) == 0:
+        return None
+    fields = []
+    for key, val in data.items():
+        if isinstance(val, str):
+            dtype = f'S{max(1, len(val.encode()))}'
+        elif isinstance(val, (bool, int, float, np.number, np.bool_)):
+            dtype = np.asarray(val).dtype
+            if dtype.kind not in 'biuf':
+                return None
+        else:
+            return None
+        fields.append((str(key), dtype))
+    if len(set(f[0] for f in fields)) < len(fields):
+        return None
+    return np.dtype(fields)
+
+
+def record_to_h5(data, grp, key):
+    """Saves a flat dict of numbers, bools and strings, such as the
+    scan_info of an arch, as one compound dataset. Strings are saved
+    fixed length. The types of the keys are kept in the key_kinds
+    attribute.
+
+    args:
+        data: dict, object to be saved, see record_dtype
+        grp: h5py File or Group, where data will be saved.
+        key: str, name of new Dataset
+    """
+    write_digests.forget(grp, key)
+    dtype = record_dtype(data)
+    rec = np.array(
+        tuple(v.encode() if isinstance(v, str) else v for v in data.values()),
+        dtype=dtype
+    )
+    kinds = ''.join(key_kind(k) for k in data)
+    if key in grp:
+        if (check_encoded(grp[key], 'record') and grp[key].dtype == dtype
+                and grp[key].attrs.get('key_kinds') == kinds):
+            grp[key][()] = rec
+            return
+        del(grp[key])
+    grp.create_dataset(key, data=rec)
+    grp[key].attrs['encoded'] = 'record'
+    grp[key].attrs['key_kinds'] = kinds
+
+
+def h5_to_record(grp):
+    """Reads a dict saved by record_to_h5.
+
+    args:
+        grp: h5py Dataset, where the data is stored
+
+    returns:
+        data: dict
+    """
+    rec = grp[()]
+    kinds = grp.attrs['key_kinds']
+    data = {}
+    for name, kind in zip(rec.dtype.names, kinds):
+        val = rec[name]
+        if isinstance(val, bytes):
+            val = val.decode()
+        data[typed_key(name, kind)] = val
+    return data
+
+
+def key_kind(key):
+    """One letter code for the type of a dict key or index label, used
+    to read it back without eval. 's' str, 'b' bool, 'i' int, 'f'
+    float, 'r' anything else, read back with ast.literal_eval.
+    """
+    if isinstance(key, str):
+        return 's'
+    if isinstance(key, (bool, np.bool_)):
+        return 'b'
+    if isinstance(key, (int, np.integer)):
+        return 'i'
+    if isinstance(key, (float, np.floating)):
+        return 'f'
+    return 'r'
+
+
+def typed_key(name, kind):
+    """Converts the string name of a key back to its type, see
+    key_kind.
+    """
+    if kind == 's':
+        return name
+    if kind == 'i':
+        return int(name)
+    if kind == 'f':
+        return float(name)
+    if kind == 'b':
+        return name == 'True'
+    try:
+        return ast.literal_eval(name)
+    except (ValueError, SyntaxError):
+        return name
+
+
+def key_kinds(grp):
+    """Returns the key types of a dict saved with dict_to_h5, None for
+    files saved before the types were kept.
+
+    args:
+        grp: h5py Group
+
+    returns:
+        kinds: dict or None, key_kind of each name in grp
+    """
+    if 'key_kinds' not in grp.attrs:
+        return None
+    names = [n.decode() if isinstance(n, bytes) else str(n)
+             for n in grp.attrs['keys']]
+    return dict(zip(names, grp.attrs['key_kinds']))
+
 
 def str_to_h5(data, grp, key):
     """Saves string to hdf5 file. Saved as h5py.string_dtype, if
@@ -875,6 +1026,7 @@ def str_to_h5(data, grp, key):
             Group or Dataset in grp.
         key: str, name of new Group or Dataset
     """
+    write_digests.forget(grp, key)
     if key in grp:
         if check_encoded(grp[key], "str"):
             grp[key][()] = data
@@ -895,6 +1047,7 @@ def series_to_h5(data, grp, key, compression):
         key: str, name of new Group or Dataset
         compression: str, compression algorithm to use. See h5py docs.
     """
+    write_digests.forget(grp, key)
     if key in grp:
         if check_encoded(grp[key], "Series"):
             new_grp = grp[key]
@@ -923,6 +1076,7 @@ def dataframe_to_h5(data, grp, key, compression):
         key: str, name of new Group or Dataset
         compression: str, compression algorithm to use. See h5py docs.
     """
+    write_digests.forget(grp, key)
     if key in grp:
         if check_encoded(grp[key], "DataFrame"):
             new_grp = grp[key]
@@ -943,6 +1097,45 @@ def dataframe_to_h5(data, grp, key, compression):
                                 chunks=True, maxshape=(None,None))
 
 
+def dataframe_append_h5(data, grp, key, compression):
+    """Saves pandas DataFrame to hdf5 file by growing a DataFrame saved
+    with dataframe_to_h5 in place. Rows of data past the saved rows are
+    appended and the saved rows are not written again, so data must
+    only have had rows added at the end since it was last saved. Falls
+    back to dataframe_to_h5 if the saved DataFrame can not be grown.
+
+    args:
+        data: DataFrame, object to be saved
+        grp: h5py File or Group, where data will be saved.
+        key: str, name of the Group holding the DataFrame
+        compression: str, compression algorithm to use if the
+            DataFrame is written in full. See h5py docs.
+    """
+    write_digests.forget(grp, key)
+    if key not in grp or not check_encoded(grp[key], "DataFrame"):
+        return dataframe_to_h5(data, grp, key, compression)
+    df_grp = grp[key]
+    if not all(k in df_grp for k in ('index', 'columns', 'data')):
+        return dataframe_to_h5(data, grp, key, compression)
+    dset = df_grp['data']
+    iset = df_grp['index']
+    nrows = iset.shape[0]
+    columns = [c.decode() if isinstance(c, bytes) else str(c)
+               for c in df_grp['columns'][()]]
+    if (dset.ndim != 2 or dset.shape != (nrows, data.shape[1]) or
+            dset.maxshape != (None, None) or iset.maxshape != (None,) or
+            not np.issubdtype(iset.dtype, np.number) or
+            nrows > len(data) or
+            columns != [str(c) for c in data.columns] or
+            (nrows > 0 and iset[nrows - 1] != data.index[nrows - 1])):
+        return dataframe_to_h5(data, grp, key, compression)
+    if len(data) > nrows:
+        dset.resize((len(data), dset.shape[1]))
+        dset[nrows:] = np.array(data.iloc[nrows:])
+        iset.resize((len(data),))
+        iset[nrows:] = np.array(data.index[nrows:])
+
+
 def index_to_h5(index, key, grp, compression):
     """Saves index from Series or DataFrame to hdf5 file. If not a
     scalar index, saves data as strings.
@@ -954,21 +1147,32 @@ def index_to_h5(index, key, grp, compression):
             Group or Dataset in grp.
         compression: str, compression algorithm to use. See h5py docs.
     """
+    write_digests.forget(grp, key)
     if key in grp:
         if grp[key].shape == (0,):
             del(grp[key])
         
     if index.dtype == 'object':
         if len(index) > 0:
-            strindex = np.array([np.string_(str(x)) for x in index])
+            # fixed length strings, with the type of each label kept in
+            # the labels attribute
+            strindex = np.array([str(x).encode() for x in index])
+            kinds = ''.join(key_kind(x) for x in index)
+            if kinds == 's' * len(kinds):
+                kinds = 's'
+            if key in grp:
+                dset = grp[key]
+                if (dset.dtype.kind != 'S' or
+                        dset.dtype.itemsize < strindex.dtype.itemsize):
+                    del(grp[key])
             if key in grp:
                 grp[key].resize(strindex.shape)
-                grp[key][()] = strindex[()]
+                grp[key][()] = strindex.astype(grp[key].dtype)
             else:
                 grp.create_dataset(
-                    key, data=strindex, dtype=h5py.string_dtype(),
-                    chunks=True, maxshape=(None,)
+                    key, data=strindex, chunks=True, maxshape=(None,)
                 )
+            grp[key].attrs['labels'] = kinds
         else:
             if key in grp:
                 del(grp[key])
@@ -994,6 +1198,7 @@ def scalar_to_h5(data, grp, key):
             Group or Dataset in grp.
         key: str, name of new Group or Dataset
     """
+    write_digests.forget(grp, key)
     if key in grp:
         if check_encoded(grp[key], 'scalar'):
             if grp[key].dtype == np.array(data).dtype:
@@ -1013,25 +1218,29 @@ def arr_to_h5(data, grp, key, compression):
         grp: h5py File or Group, where data will be saved. Creates new
             Group or Dataset in grp.
         key: str, name of new Group or Dataset
-        compression: str, compression algorithm to use. See h5py docs.
+        compression: str, not used, new datasets are chunked and
+            compressed by the storage policy of their class. See
+            set_storage_policy.
     """
+    write_digests.forget(grp, key)
     if key in ['map_raw', 'bg_raw']:
         arr = np.array(data, dtype='int32')
     elif key in ['i_tthChi', 'i_qChi', 'i_QxyQz']:
         arr = np.array(data, dtype='float32')
     else:
         arr = np.array(data)
+    arr, kwargs = storage_args(grp, key, arr)
 
     if key in grp:
-        if check_encoded(grp[key], 'arr'):
+        # axes shared by several arches are replaced, not overwritten
+        if check_encoded(grp[key], 'arr') and 'shared' not in grp[key].attrs:
             if grp[key].dtype == arr.dtype:
                 grp[key].resize(arr.shape)
                 grp[key][()] = arr[()]
                 return
         del(grp[key])
-    # grp.create_dataset(key, data=arr, compression=compression, chunks=True,
-    #                    maxshape=tuple(None for x in arr.shape))
-    grp.create_dataset(key, data=arr, maxshape=tuple(None for x in arr.shape))
+    grp.create_dataset(key, data=arr, maxshape=tuple(None for x in arr.shape),
+                       **kwargs)
     grp[key].attrs['encoded'] = 'arr'
 
 
@@ -1046,6 +1255,7 @@ def encoded_h5(data, grp, key, encoder):
         encoder: str, 'yaml' or 'json', how to encode stubborn data
             types.
     """
+    write_digests.forget(grp, key)
     if encoder == 'yaml':
         string = np.string_(yaml.dump(data))
     elif encoder == 'json':
@@ -1064,7 +1274,8 @@ def attributes_to_h5(obj, grp, lst_attr=None, priv=False, dpriv=False,
                      **kwargs):
     """Function which takes a list of class attributes and stores them
     in a provided h5py group. See data_to_h5 for how datatypes are
-    handled.
+    handled. Attributes unchanged since they were last written are
+    skipped, see WriteDigests.
     
     args:
         obj: object to store
@@ -1085,9 +1296,14 @@ def attributes_to_h5(obj, grp, lst_attr=None, priv=False, dpriv=False,
             lst_attr = [x for x in obj.__dict__.keys() if '__' not in x]
         else:
             lst_attr = [x for x in obj.__dict__.keys() if '_' not in x]
+    tag = repr(sorted(kwargs.items()))
     for attr in lst_attr:
         data = getattr(obj, attr)
+        unchanged, digest = write_digests.check(grp, attr, data, tag)
+        if unchanged:
+            continue
         data_to_h5(data, grp, attr, **kwargs)
+        write_digests.update(digest)
 
 
 def h5_to_data(grp, encoder=True, Loader=yaml.UnsafeLoader):
@@ -1133,8 +1349,11 @@ def h5_to_data(grp, encoder=True, Loader=yaml.UnsafeLoader):
         elif encoded in ['data', 'arr', 'scalar']:
             data = grp[()]
 
+        elif encoded == 'record':
+            data = h5_to_record(grp)
+
         elif encoded == 'yaml':
-            data = yaml.load(grp[...].item(), Loader=Loader)
+            data = _load_yaml(grp[...].item(), Loader)
 
         elif encoded == 'json':
             data = json.loads(grp[...].item())
@@ -1169,9 +1388,41 @@ def h5_to_data(grp, encoder=True, Loader=yaml.UnsafeLoader):
     return data
 
 
+# yaml payloads decoded inside shared_yaml_loads, per thread
+_yaml_memo = threading.local()
+
+
+@contextmanager
+def shared_yaml_loads():
+    """Inside the block, yaml encoded data with the same text is
+    decoded once by h5_to_data and the object is shared, for example
+    the detector saved with every arch of a scan. Only use it when the
+    loaded objects are not modified.
+    """
+    outer = getattr(_yaml_memo, 'memo', None)
+    if outer is None:
+        _yaml_memo.memo = {}
+    try:
+        yield
+    finally:
+        if outer is None:
+            _yaml_memo.memo = None
+
+
+def _load_yaml(text, Loader):
+    memo = getattr(_yaml_memo, 'memo', None)
+    if memo is None:
+        return yaml.load(text, Loader=Loader)
+    key = (text, Loader)
+    if key not in memo:
+        memo[key] = yaml.load(text, Loader=Loader)
+    return memo[key]
+
+
 def h5_to_index(grp):
-    """Gets index from grp for Series or DataFrame. Uses soft_list_eval
-    to handle object index types.
+    """Gets index from grp for Series or DataFrame. Labels are
+    converted with the types in the labels attribute, files saved
+    before the types were kept use soft_list_eval.
     
     args:
         grp: h5py File or Group, where the data is stored
@@ -1181,8 +1432,13 @@ def h5_to_index(grp):
     """
     if np.issubdtype(grp.dtype, np.number):
         return grp[()]
-    else:
+    kinds = grp.attrs.get('labels')
+    if kinds is None:
         return soft_list_eval(grp)
+    names = np.char.decode(grp[()], 'utf-8')
+    if kinds == 's':
+        return names.astype(object)
+    return [typed_key(n, k) for n, k in zip(names, kinds)]
 
 
 def h5_to_dict(grp, **kwargs):
@@ -1196,17 +1452,28 @@ def h5_to_dict(grp, **kwargs):
         data: dictionary of data from h5py group
     """
     data = {}
+    kinds = key_kinds(grp)
     for key in grp.keys():
-        try:
-            e_key = eval(key, {})
-        except:
-            e_key = key
+        if kinds is not None and key in kinds:
+            e_key = typed_key(key, kinds[key])
+        else:
+            e_key = legacy_key(key)
 
         data[e_key] = h5_to_data(grp[key], **kwargs)
 
     return data
 
 
+def legacy_key(key):
+    """Reads a dict key saved before key types were kept, evaluating
+    the name.
+    """
+    try:
+        return eval(key, {})
+    except:
+        return key
+
+
 def h5_to_attributes(obj, grp, lst_attr=None, **kwargs):
     """Sets attributes of obj using data in an hdf5 file. See h5_to_data
     for how data types are handled.
@@ -1264,7 +1531,9 @@ def soft_list_eval(data, scope={}):
 
 def catch_h5py_file(filename, mode='r', tries=100, *args, **kwargs):
     """Forces an h5py object to be opened. Catches OSErrors which can
-    be thrown. Will try a set number of times before giving up.
+    be thrown. Will try a set number of times before giving up. If the
+    file is held in h5pool the pooled handle is returned instead, and
+    is left open when the with block exits.
     
     args:
         filename: str, path to file
@@ -1272,20 +1541,23 @@ def catch_h5py_file(filename, mode='r', tries=100, *args, **kwargs):
         tries: int, how many times to try opening the file
         args, kwargs: passed to h5py.File
     """
-    failed = True
+    pooled = h5pool.get(filename, mode, *args, **kwargs)
+    if pooled is not None:
+        return pooled
+    delay = 0.001
     for i in range(tries):
         if i % 10 == 0 and i > 0:
             print(f"Tried catching {i} times.")
         try:
-            hdf5_file = h5py.File(filename, mode, *args, **kwargs)
-            failed = False
-            break  # Success!
+            return h5py.File(filename, mode, *args, **kwargs)
+        except FileNotFoundError:
+            # missing file, waiting will not help
+            raise
         except OSError:
-            time.sleep(0.05)
-            pass
-    if failed:
-        hdf5_file = h5py.File(filename, mode, *args, **kwargs)
-    return hdf5_file
+            # file is locked by another writer, back off
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+    return h5py.File(filename, mode, *args, **kwargs)
 
 
 def query_yes_no(question, default="no"):
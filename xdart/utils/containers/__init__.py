@@ -1,6 +1,7 @@
 from .poni import PONI, get_poni_dict, create_ai_from_dict
-from .nzarrays import nzarray1d, nzarray2d
+from .nzarrays import nzarray1d, nzarray2d, nzcsr2d
 from .int_data import int_1d_data, int_2d_data
 from .int_data_static import int_1d_data_static, int_2d_data_static
+from .int_data_static import int_1d_record
 
 from ._containers import *
@@ -9,6 +9,7 @@ import h5py
 
 from .nzarrays import nzarray1d, nzarray2d
 from .. import _utils as utils
+from .._axes import AXIS_KEYS, axis_registry, axes_to_h5
 
 
 def parse_unit(result, wavelength):
@@ -163,7 +164,7 @@ class int_1d_data:
                 sgrp = grp.create_group(key)
             attr.to_hdf5(sgrp, compression)
 
-        utils.attributes_to_h5(self, grp, ['ttheta', 'q'], compression=compression)
+        axes_to_h5(self, grp, ['ttheta', 'q'], compression=compression)
     
     def from_hdf5(self, grp):
         """Loads in data from hdf5 file.
@@ -187,12 +188,29 @@ class int_1d_data:
         utils.h5_to_attributes(self, grp, ['ttheta', 'q'])
     
     def __setattr__(self, name, value):
-        """Ensures raw, norm, and pcount are nzarray1d objects.
+        """Ensures raw, norm, and pcount are nzarray1d objects. Results
+        of arithmetic are kept without a copy, and assigning the result
+        of an in place operator keeps the same object. Axes are
+        interned, see AxisRegistry.
         """
         if name in ['raw', 'norm', 'pcount', 'sigma', 'sigma_raw']:
-            self.__dict__[name] = nzarray1d(value)
+            if name not in self.__dict__ or value is not self.__dict__[name]:
+                self.__dict__[name] = nzarray1d.wrap(value)
+        elif name in AXIS_KEYS:
+            self.__dict__[name] = axis_registry.intern(value)
         else:
             super().__setattr__(name, value)
+
+    def __deepcopy__(self, memo):
+        """Copies the data, axes are shared as they are read-only.
+        """
+        out = self.__class__.__new__(self.__class__)
+        memo[id(self)] = out
+        for name, value in self.__dict__.items():
+            if name not in AXIS_KEYS:
+                value = copy.deepcopy(value, memo)
+            out.__dict__[name] = value
+        return out
     
     def __add__(self, other):
         out = self.__class__()
@@ -207,16 +225,19 @@ class int_1d_data:
         out.sigma = out.sigma/out.pcount
 
         out.norm = out.raw/out.pcount
-        out.ttheta = copy.deepcopy(self.ttheta)
-        out.q = copy.deepcopy(self.q)
+        # axes are read-only, shared with self
+        out.ttheta = self.ttheta
+        out.q = self.q
         try:
-            out.chi = copy.deepcopy(self.chi)
+            out.chi = self.chi
         except AttributeError:
             pass
         return out
 
 class int_2d_data(int_1d_data):
     """Container for 2-dimensional integration data returned by pyFAI.
+    Arrays with few non-zero values, such as the rings of a scanning
+    detector, are held as nzcsr2d, see nzarray2d.wrap.
     
     attributes:
         raw: nzarray2d, raw integrated signal
@@ -270,6 +291,8 @@ class int_2d_data(int_1d_data):
             grp: h5py Group or File, object to load data from.
         """
         super().from_hdf5(grp)
+        for key in ['raw', 'pcount', 'norm', 'sigma', 'sigma_raw']:
+            self.__dict__[key] = self.__dict__[key].compact()
         utils.h5_to_attributes(self, grp, ['chi'])
 
     def to_hdf5(self, grp, compression=None):
@@ -281,12 +304,16 @@ class int_2d_data(int_1d_data):
                 documentation.
         """
         super().to_hdf5(grp, compression)
-        utils.attributes_to_h5(self, grp, ['chi'], compression=compression)
+        axes_to_h5(self, grp, ['chi'], compression=compression)
 
     def __setattr__(self, name, value):
-        """Ensures raw, norm, and pcount are nzarray2d objects.
+        """Ensures raw, norm, and pcount are nzarray2d or nzcsr2d
+        objects. Results of arithmetic are kept without a copy, and
+        assigning the result of an in place operator keeps the same
+        object.
         """
         if name in ['raw', 'norm', 'pcount', 'sigma', 'sigma_raw']:
-            self.__dict__[name] = nzarray2d(value)
+            if name not in self.__dict__ or value is not self.__dict__[name]:
+                self.__dict__[name] = nzarray2d.wrap(value)
         else:
             super().__setattr__(name, value)
@@ -1,10 +1,13 @@
+from collections import OrderedDict
 import copy
+from threading import Condition
 
 import numpy as np
 from pyFAI import units
-from scipy.interpolate import RectBivariateSpline
+import scipy.sparse as sp
 
 from .. import _utils as utils
+from .._axes import AXIS_KEYS, axis_digest, axis_registry, axes_to_h5
 
 # from icecream import ic; ic.configureOutput(prefix='', includeContext=True)
 
@@ -94,11 +97,13 @@ class int_1d_data_static:
             compression: str, compression algorithm to use. See h5py
                 documentation.
         """
-        keys = self.__dict__.keys()
+        keys = [key for key in self.__dict__ if key not in AXIS_KEYS]
         for key in keys:
             if key in grp:
                 del grp[key]
         utils.attributes_to_h5(self, grp, keys, compression=compression)
+        axes_to_h5(self, grp, [key for key in self.__dict__ if key in AXIS_KEYS],
+                   compression=compression)
 
     def from_hdf5(self, grp):
         """Loads in data from hdf5 file.
@@ -110,18 +115,88 @@ class int_1d_data_static:
         utils.h5_to_attributes(self, grp, keys)
 
     def __setattr__(self, name, value):
-        """Ensures raw, norm, and pcount are nzarray1d objects.
+        """Ensures all saved objects are np.ndarray objects, axes are
+        interned, see AxisRegistry.
+        """
+        value = np.asarray(value)
+        if name in AXIS_KEYS:
+            value = axis_registry.intern(value)
+        self.__dict__[name] = value
+
+    def __deepcopy__(self, memo):
+        """Copies the data, axes are shared as they are read-only.
         """
-        self.__dict__[name] = np.asarray(value)
+        out = self.__class__.__new__(self.__class__)
+        memo[id(self)] = out
+        for name, value in self.__dict__.items():
+            if name not in AXIS_KEYS:
+                value = copy.deepcopy(value, memo)
+            out.__dict__[name] = value
+        return out
 
     def __add__(self, other):
         out = self.__class__()
         out.norm = self.norm + other.norm
-        out.ttheta = copy.deepcopy(self.ttheta)
-        out.q = copy.deepcopy(self.q)
+        out.ttheta = self.ttheta
+        out.q = self.q
         return out
 
 
+class int_1d_record:
+    """Compact read-only view of the 1D integration of one frame, for
+    viewers holding many frames. Has the attributes of
+    int_1d_data_static in __slots__, so a record has no __dict__, and
+    keeps the arrays it is given without copying, so axes equal across
+    frames can be shared by reference.
+
+    attributes:
+        norm: numpy array, integrated signal
+        ttheta: numpy array, two-theta angle
+        q: numpy array, q values
+        i_qz, qz, i_qxy, qxy: numpy arrays, grazing incidence data
+
+    methods:
+        from_data: makes a record from an int_1d_data_static or
+            int_1d_data
+    """
+    __slots__ = ('norm', 'ttheta', 'q', 'i_qz', 'qz', 'i_qxy', 'qxy')
+    # 1D arrays with one value per bin, the others are axes
+    values = ('norm', 'i_qz', 'i_qxy')
+    axes = ('ttheta', 'q', 'qz', 'qxy')
+
+    def __init__(self, norm=None, ttheta=0, q=0, i_qz=None, qz=0, i_qxy=0,
+                 qxy=0):
+        """See int_1d_data_static.
+        """
+        self.norm = norm
+        self.ttheta = ttheta
+        self.q = q
+        self.i_qz = i_qz
+        self.qz = qz
+        self.i_qxy = i_qxy
+        self.qxy = qxy
+
+    @classmethod
+    def from_data(cls, int_1d):
+        """Makes a record of int_1d, sharing its arrays. nzarrays of
+        int_1d_data are stored full size.
+
+        args:
+            int_1d: int_1d_data_static, int_1d_data or int_1d_record
+
+        returns:
+            record: int_1d_record
+        """
+        kwargs = {}
+        for name in cls.__slots__:
+            val = getattr(int_1d, name, None)
+            if hasattr(val, 'full'):
+                val = val.full()
+            if val is not None:
+                kwargs[name] = val
+        return cls(**kwargs)
+
+
 class int_2d_data_static(int_1d_data_static):
     """Container for 2-dimensional integration data returned by pyFAI.
 
@@ -196,33 +271,25 @@ class int_2d_data_static(int_1d_data_static):
         if unit is None:
             unit = result.unit
 
-        self.chi = chi = result.azimuthal
+        self.chi = result.azimuthal
 
         if unit == units.TTH_DEG or str(unit) == '2th_deg':
             self.i_tthChi = result.intensity
             self.ttheta = tth = result.radial
             self.tth_from_q = False
             if self.q_from_tth:
-                tth_range = np.asarray([tth[0], tth[-1]])
-                q_range = (4 * np.pi / (wavelength * 1e10)) * np.sin(np.radians(tth_range / 2))
-                qtth = (4 * np.pi / (wavelength * 1e10)) * np.sin(np.radians(tth / 2))
-                self.q = q = np.linspace(q_range[0], q_range[1], len(tth))
-
-                spline = RectBivariateSpline(chi, qtth, result.intensity)
-                self.i_qChi = spline(chi, q)
+                self.q, resample = radial_resampler.get(tth, wavelength, 'q')
+                self.i_qChi = resample(result.intensity)
 
         elif unit == units.Q_A or str(unit) == 'q_A^-1':
             self.i_qChi = result.intensity
             self.q = q = result.radial
             self.q_from_tth = False
             if self.tth_from_q:
-                q_range = np.array([q[0], q[-1]])
-                tth_range = 2 * np.degrees(np.arcsin(q_range * (wavelength * 1e10) / (4 * np.pi)))
-                tthq = 2 * np.degrees(np.arcsin(q * (wavelength * 1e10) / (4 * np.pi)))
-                self.ttheta = tth = np.linspace(tth_range[0], tth_range[1], len(q))
-
-                spline = RectBivariateSpline(chi, tthq, result.intensity)
-                self.i_tthChi = spline(chi, tth)
+                self.ttheta, resample = radial_resampler.get(
+                    q, wavelength, 'ttheta'
+                )
+                self.i_tthChi = resample(result.intensity)
 
         # TODO: implement other unit options for unit
 
@@ -247,14 +314,10 @@ class int_2d_data_static(int_1d_data_static):
         """
         super().to_hdf5(grp, compression)
         utils.attributes_to_h5(
-            self, grp, ['chi', 'i_QxyQz', 'qz', 'qxy', 'q_from_tth', 'tth_from_q'],
+            self, grp, ['i_QxyQz', 'q_from_tth', 'tth_from_q'],
             compression=compression
         )
-
-    def __setattr__(self, name, value):
-        """Ensures all saved objects are np.ndarray objects.
-        """
-        self.__dict__[name] = np.asarray(value)
+        axes_to_h5(self, grp, ['chi', 'qz', 'qxy'], compression=compression)
 
     def __add__(self, other):
         out = self.__class__()
@@ -263,11 +326,11 @@ class int_2d_data_static(int_1d_data_static):
         out.i_tthChi = self.i_tthChi + other.i_tthChi
         out.i_QxyQz = self.i_QxyQz + other.i_QxyQz
 
-        out.ttheta = copy.deepcopy(other.ttheta)
-        out.q = copy.deepcopy(other.q)
-        out.chi = copy.deepcopy(other.chi)
-        out.qz = copy.deepcopy(other.qz)
-        out.qxy = copy.deepcopy(other.qxy)
+        out.ttheta = other.ttheta
+        out.q = other.q
+        out.chi = other.chi
+        out.qz = other.qz
+        out.qxy = other.qxy
 
         return out
 
@@ -278,10 +341,129 @@ class int_2d_data_static(int_1d_data_static):
         out.i_tthChi = self.i_tthChi - other.i_tthChi
         out.i_QxyQz = self.i_QxyQz - other.i_QxyQz
 
-        out.ttheta = copy.deepcopy(other.ttheta)
-        out.q = copy.deepcopy(other.q)
-        out.chi = copy.deepcopy(other.chi)
-        out.qz = copy.deepcopy(other.qz)
-        out.qxy = copy.deepcopy(other.qxy)
+        out.ttheta = other.ttheta
+        out.q = other.q
+        out.chi = other.chi
+        out.qz = other.qz
+        out.qxy = other.qxy
 
         return out
+
+
+class RadialResampler():
+    """Process wide cache of the operators taking a 2D integration from
+    one radial unit to the other. The radial axis is mapped to the
+    other unit, which spaces it unevenly, and each chi row is linearly
+    interpolated onto an even axis over the same range. The
+    interpolation is a sparse (radial, radial) matrix with two values
+    per column, built once per wavelength and axis and applied to all
+    rows as one product.
+
+    attributes:
+        lock: Condition, lock around the cache
+        maxsize: int, number of operators kept before the least
+            recently used one is evicted
+        hits, misses: int, counters for lookups
+
+    methods:
+        get: returns the new axis and the operator for an axis
+        clear: removes all operators
+    """
+    def __init__(self, maxsize=16):
+        """maxsize: int, number of operators to keep.
+        """
+        self.maxsize = maxsize
+        self.lock = Condition()
+        self.hits = 0
+        self.misses = 0
+        self._ops = OrderedDict()
+
+    def __len__(self):
+        return len(self._ops)
+
+    def get(self, radial, wavelength, unit):
+        """Returns the even axis in unit over the range of radial, and
+        a function resampling images integrated over radial onto it.
+
+        args:
+            radial: numpy array, radial axis of the integration, in
+                q_A^-1 if unit is 'ttheta' and in 2th_deg if unit is 'q'
+            wavelength: float, wavelength in meters
+            unit: str, 'q' or 'ttheta', unit to resample to
+
+        returns:
+            axis: numpy array, even axis in unit, read only
+            resample: function, takes a (chi, radial) array and
+                returns the (chi, axis) array
+        """
+        key = (float(wavelength), unit, axis_digest(radial))
+        with self.lock:
+            if key in self._ops:
+                self._ops.move_to_end(key)
+                self.hits += 1
+                return self._ops[key]
+            self.misses += 1
+
+        if unit == 'q':
+            mapped = ((4 * np.pi / (wavelength * 1e10)) *
+                      np.sin(np.radians(np.asarray(radial) / 2)))
+        elif unit == 'ttheta':
+            mapped = 2 * np.degrees(np.arcsin(
+                np.asarray(radial) * (wavelength * 1e10) / (4 * np.pi)))
+        else:
+            raise ValueError(f'Unknown unit {unit}')
+        axis = np.linspace(mapped[0], mapped[-1], len(mapped))
+        axis.flags.writeable = False
+        matrix = interp_matrix(mapped, axis)
+
+        def resample(data):
+            return np.asarray(data) @ matrix
+
+        with self.lock:
+            self._ops[key] = (axis, resample)
+            while self.maxsize > 0 and len(self._ops) > self.maxsize:
+                self._ops.popitem(last=False)
+        return axis, resample
+
+    def clear(self):
+        """Removes all operators.
+        """
+        with self.lock:
+            self._ops.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def interp_matrix(src, dst):
+    """Sparse matrix M such that data @ M linearly interpolates the
+    columns of data, sampled at src, onto dst. Values of dst outside
+    src take the nearest end value.
+
+    args:
+        src: numpy array, monotonic sample positions
+        dst: numpy array, positions to interpolate at
+
+    returns:
+        matrix: scipy csc_matrix, (len(src), len(dst))
+    """
+    src = np.asarray(src, dtype=np.float64)
+    dst = np.asarray(dst, dtype=np.float64)
+    order = np.argsort(src, kind='stable')
+    pos = src[order]
+    n = len(pos)
+    if n == 1:
+        return sp.csc_matrix(np.ones((1, len(dst))))
+    hi = np.clip(np.searchsorted(pos, dst), 1, n - 1)
+    lo = hi - 1
+    step = pos[hi] - pos[lo]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = np.where(step > 0, (dst - pos[lo]) / step, 0)
+    w = np.clip(w, 0, 1)
+    rows = np.stack([order[lo], order[hi]], axis=1).reshape(-1)
+    vals = np.stack([1 - w, w], axis=1).reshape(-1)
+    indptr = np.arange(0, 2 * len(dst) + 1, 2)
+    return sp.csc_matrix((vals, rows, indptr), shape=(n, len(dst)))
+
+
+# unit conversion operators of all 2D integrations
+radial_resampler = RadialResampler()
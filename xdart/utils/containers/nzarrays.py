@@ -5,9 +5,18 @@ import copy
 import numpy as np
 from pyFAI import units
 import h5py
+import scipy.sparse as sp
 
 from .. import _utils as utils
 
+# nzarray2d.wrap stores regions with less than this fraction of
+# non-zero values as nzcsr2d
+CSR_MAX_FILL = 0.25
+# regions with fewer values are always stored as a box
+CSR_MIN_SIZE = 4096
+# datasets written by nzcsr2d.to_hdf5
+CSR_KEYS = ('values', 'indices', 'indptr')
+
 
 class nzarray1d():
     """Sparse matrix like object which stores minimal box to contain
@@ -19,7 +28,13 @@ class nzarray1d():
         shape: tuple, shape of the full dataset
     
     methods:
-        Reimplements all arithmetic functions (+, -, *, /, //)
+        Reimplements all arithmetic functions (+, -, *, /, //). The
+            in place +=, -=, *= and /= update data in a buffer owned
+            by the object, grown with room to spare when the region
+            grows, so repeated sums do not allocate.
+        add, subtract, multiply, divide: arithmetic with an optional
+            out nzarray to write the result to
+        add_to: adds the values to a full size array in place
         from_hdf5: Loads data from an hdf5 file
         full: returns the full dataset
         get_corners: Finds the edges of the non-zero region
@@ -28,6 +43,8 @@ class nzarray1d():
         intersect: Finds the interesection between two nzarray1d
             objects
         to_hdf5: Saves the data to an hdf5 file
+        wrap: converts a value to an nzarray, without copying fresh
+            arithmetic results
     """
     def __init__(self, arr=None, grp=None, lazy=False):
         """arr: numpy array, full dataset
@@ -37,14 +54,17 @@ class nzarray1d():
         """
         self.none_flag = False
         if isinstance(arr, self.__class__):
-            if arr.data is None:
+            data = arr._box_data()
+            if data is None:
                 self._none_array()
                 self.none_flag = True
             else:
-                self.data = np.empty_like(arr.data)
-                self.data[()] = arr.data[()]
+                self.data = np.empty_like(data)
+                self.data[()] = data[()]
                 self.shape = copy.deepcopy(arr.shape)
                 self.corners = copy.deepcopy(arr.corners)
+        elif grp is not None and 'indptr' in grp:
+            self.from_hdf5(grp)
         elif grp is not None:
             if lazy:
                 self.shape = grp['shape'][()]
@@ -161,6 +181,9 @@ class nzarray1d():
                 docs.
         """
         grp.attrs['encoded'] = 'nzarray'
+        for name in CSR_KEYS:
+            if name in grp:
+                del grp[name]
         for name in ['shape', 'corners']:
             data = getattr(self, name)
             if name in grp:
@@ -171,11 +194,14 @@ class nzarray1d():
             grp['data'].resize(self.data.shape)
             grp['data'][()] = self.data[()]
         else:
+            data, kwargs = utils.storage_args(
+                grp, 'data', np.asarray(self.data, dtype='float64'),
+                compression
+            )
             grp.create_dataset(
-                'data', data=self.data, compression=compression, chunks=True,
-                maxshape=tuple(
+                'data', data=data, maxshape=tuple(
                     None for x in self.data.shape
-                ), dtype='float64'
+                ), **kwargs
             )
     
     def from_hdf5(self, grp):
@@ -184,6 +210,12 @@ class nzarray1d():
         args:
             grp: h5py File or Group, where to load data from.
         """
+        if 'indptr' in grp:
+            # saved by nzcsr2d
+            csr, self.__dict__['shape'], self.__dict__['corners'] = \
+                _read_csr(grp)
+            self.__dict__['data'] = csr.toarray()
+            return
         for key in ['data', 'shape', 'corners']:
             self.__dict__[key] = np.empty_like(grp[key])
             self.__dict__[key] = grp[key][()]
@@ -271,83 +303,346 @@ class nzarray1d():
             self.corners = self.get_corners(arr)
             self.data = self.get_data(arr)
     
+    def add(self, other, out=None):
+        """Returns self + other.
+
+        args:
+            other: nzarray of the same shape, numpy array or scalar
+            out: nzarray or None, if given the result is written to
+                out, reusing its buffer, and out is returned
+
+        returns:
+            out: nzarray, the sum
+        """
+        return self._binary(other, out, '__iadd__')
+
+    def subtract(self, other, out=None):
+        """Returns self - other, see add.
+        """
+        return self._binary(other, out, '__isub__')
+
+    def multiply(self, other, out=None):
+        """Returns self * other, see add.
+        """
+        return self._binary(other, out, '__imul__')
+
+    def divide(self, other, out=None):
+        """Returns self / other, zero where other is zero, see add.
+        """
+        return self._binary(other, out, '__itruediv__')
+
     def __add__(self, other):
-        if isinstance(other, self.__class__):
-            assert list(self.shape) == list(other.shape), "Cannot add arrays of different shape"
-            if other.data.size > 0 and self.data.size > 0:
-                out, temp = self.intersect(other)
-                out.data += temp
-            elif other.data.size > 0:
-                out = self.__class__(other)
-            else:
-                out = self.__class__(self)
-        elif np.isscalar(other) or type(other) == np.ndarray:
-            out = self.__class__(self.full() + other)
-        else:
-            raise TypeError(f"Cannot add object of type {type(other)}")
-        return out
-    
+        return self.add(other)
+
     def __sub__(self, other):
-        if isinstance(other, self.__class__):
-            assert list(self.shape) == list(other.shape), "Cannot subtract arrays of different shape"
-            if other.data.size > 0 and self.data.size > 0:
-                out, temp = self.intersect(other)
-                out.data -= temp
-            elif other.data.size > 0:
-                out = self.__class__(other * -1)
-            else:
-                out = self.__class__(self)
-        elif np.isscalar(other) or type(other) == np.ndarray:
-            out = self.__class__(self.full() - other)
-        return out
-    
+        return self.subtract(other)
+
     def __mul__(self, other):
-        if isinstance(other, self.__class__):
-            assert list(self.shape) == list(other.shape), "Cannot multiply arrays of different shape"
-            out, temp = self.intersect(other)
-            out.data *= temp
-            if other.data.size > 0 and self.data.size > 0:
-                out, temp = self.intersect(other)
-                out.data *= temp
-            elif other.data.size > 0:
-                out = self.__class__(self)
-            else:
-                out = self.__class__(other)
-        elif np.isscalar(other):
-            if other == 0:
-                out = self.__class__(np.zeros(self.shape))
-            else:
-                out = self.__class__(self)
-                out.data *= other
-        elif type(other) == np.ndarray:
-            out = self.__class__(self.full() * other)
-        return out
-    
+        return self.multiply(other)
+
     def __div__(self, other):
         return self.__truediv__(other)
-    
+
     def __truediv__(self, other):
-        if isinstance(other, self.__class__):
-            assert list(self.shape) == list(other.shape), "Cannot divide arrays of different shape"
-            out, temp = self.intersect(other)
-            out.data *= temp
-            if other.data.size > 0 and self.data.size > 0:
-                out, temp = self.intersect(other)
-                out.data = utils.div0(out.data, temp)
-            elif other.data.size > 0:
-                out = self.__class__(self)
-            else:
-                out = self.__class__(other)
+        return self.divide(other)
+
+    def __iadd__(self, other):
+        return self._accumulate(other, np.add)
+
+    def __isub__(self, other):
+        return self._accumulate(other, np.subtract)
+
+    def __imul__(self, other):
+        if isinstance(other, nzarray1d):
+            self._match(other)
+            if self._empty():
+                return self
+            self._reserve(self.corners, self._dtype(other._data_type()))
+            overlap = self._overlap(other)
+            if overlap is None:
+                self.data[...] = 0
+                return self
+            box, other_box = overlap
+            view = self.data[box]
+            np.multiply(view, np.asarray(other._box_data())[other_box],
+                        out=view)
+            self._zero_outside(box)
         elif np.isscalar(other):
             if other == 0:
-                out = self.__class__(np.zeros(self.shape))
-            else:
-                out = self.__class__(self)
-                out.data = utils.div0(out.data, other)
+                self._clear()
+            elif not self._empty():
+                self._reserve(self.corners, self._dtype(other))
+                np.multiply(self.data, other, out=self.data)
         elif type(other) == np.ndarray:
-            out = self.__class__(utils.div0(self.full(), other))
-        return out
-    
+            if not self._empty():
+                self._reserve(self.corners, self._dtype(other))
+                np.multiply(self.data, other[self._box(self.corners)],
+                            out=self.data)
+        else:
+            raise TypeError(f"Cannot multiply object of type {type(other)}")
+        return self
+
+    def __itruediv__(self, other):
+        if isinstance(other, nzarray1d):
+            self._match(other)
+            if self._empty():
+                return self
+            self._reserve(self.corners, self._dtype(other._data_type()))
+            overlap = self._overlap(other)
+            if overlap is None:
+                self.data[...] = 0
+                return self
+            box, other_box = overlap
+            _div0_into(self.data[box],
+                       np.asarray(other._box_data())[other_box])
+            self._zero_outside(box)
+        elif np.isscalar(other):
+            if other == 0:
+                self._clear()
+            elif not self._empty():
+                self._reserve(self.corners, self._dtype(other))
+                _div0_into(self.data, other)
+        elif type(other) == np.ndarray:
+            if not self._empty():
+                self._reserve(self.corners, self._dtype(other))
+                _div0_into(self.data, other[self._box(self.corners)])
+        else:
+            raise TypeError(f"Cannot divide by object of type {type(other)}")
+        return self
+
+    def _accumulate(self, other, ufunc):
+        """In place add or subtract, ufunc is np.add or np.subtract.
+        """
+        if isinstance(other, nzarray1d):
+            self._match(other)
+            if other._empty():
+                return self
+            self._reserve(other.corners, self._dtype(other._data_type()))
+            other._add_into(self.data[self._rel(other.corners)], ufunc)
+        elif np.isscalar(other):
+            if other != 0:
+                full = [x for n in self.shape for x in (0, n)]
+                self._reserve(full, self._dtype(other))
+                ufunc(self.data, other, out=self.data)
+        elif type(other) == np.ndarray:
+            assert list(self.shape) == list(other.shape), \
+                "Cannot add arrays of different shape"
+            if other.any():
+                self._reserve(self.get_corners(other), self._dtype(other))
+                ufunc(self.data, other[self._box(self.corners)],
+                      out=self.data)
+        else:
+            raise TypeError(f"Cannot add object of type {type(other)}")
+        return self
+
+    def _binary(self, other, out, op):
+        """Applies the in place operator op to a copy of self, or to
+        out.
+        """
+        if out is None:
+            out = self.__class__()
+            extra = None
+            if (op in ('__iadd__', '__isub__') and not self.none_flag and
+                    isinstance(other, nzarray1d) and not other._empty()):
+                extra = other.corners
+            # sized for the result, so the operator does not grow it
+            out._assign(self, slack=False, extra=extra)
+            # new object, containers can take it without a copy
+            out._fresh = True
+        elif out is other and out is not self:
+            if op in ('__iadd__', '__imul__'):
+                return getattr(out, op)(self)
+            other = self.__class__(other)
+            out._assign(self)
+        elif out is not self:
+            out._assign(self)
+        return getattr(out, op)(other)
+
+    def _assign(self, src, slack=True, extra=None):
+        """Copies src into self, reusing the buffer of self. The region
+        also covers the corners extra if given.
+        """
+        if list(self.shape) != list(src.shape):
+            self.__dict__.pop('_buf', None)
+            self.shape = copy.deepcopy(src.shape)
+        self._clear()
+        self.none_flag = src.none_flag
+        corners = None if src._empty() else src.corners
+        if extra is not None:
+            if corners is None:
+                corners = extra
+            else:
+                corners = [f(a, b) for f, a, b in zip(
+                    [min, max] * len(self.shape), corners, extra)]
+        if corners is not None:
+            self._reserve(corners, self._dtype(src._data_type()), slack)
+        if not src._empty():
+            self.data[self._rel(src.corners)] = np.asarray(src._box_data())
+
+    def _empty(self):
+        return self.data is None or np.size(self.data) == 0
+
+    def _box_data(self):
+        """Values of the region, without changing how they are held.
+        """
+        return self.data
+
+    def _data_type(self):
+        return np.asarray(self.data).dtype
+
+    def _add_into(self, view, ufunc=np.add):
+        """Applies ufunc to view, the region of self in another
+        array, and the values of self, in place.
+        """
+        ufunc(view, np.asarray(self.data), out=view)
+
+    def add_to(self, arr):
+        """Adds the values of self to a full size array in place.
+
+        args:
+            arr: numpy array, with shape self.shape
+        """
+        if not self._empty():
+            self._add_into(arr[self._box(self.corners)])
+
+    def _dtype(self, *others):
+        """Type of the buffer, float64 unless the data is complex.
+        """
+        types = [np.float64] + [np.result_type(o) for o in others]
+        if not self._empty():
+            types.append(self._data_type())
+        return np.result_type(*types)
+
+    def _match(self, other):
+        """Checks other has the same shape. An empty nzarray made
+        without data takes the shape of other.
+        """
+        if self.none_flag and self._empty():
+            self.__dict__.pop('_buf', None)
+            self.shape = copy.deepcopy(other.shape)
+            self.corners = [0] * (2 * len(other.shape))
+            self.none_flag = False
+        assert list(self.shape) == list(other.shape), \
+            "Cannot combine arrays of different shape"
+
+    def _spans(self, corners):
+        return [(int(corners[i]), int(corners[i + 1]))
+                for i in range(0, len(corners), 2)]
+
+    def _box(self, corners):
+        """Slices of the full dataset for corners.
+        """
+        return tuple(slice(lo, hi) for lo, hi in self._spans(corners))
+
+    def _rel(self, corners):
+        """Slices of data for corners inside the region of self.
+        """
+        return tuple(slice(lo - c, hi - c) for (lo, hi), (c, _) in
+                     zip(self._spans(corners), self._spans(self.corners)))
+
+    def _overlap(self, other):
+        """Slices of self.data and other.data for the region where both
+        have data, None if they do not meet.
+        """
+        box, other_box = [], []
+        for (a, b), (c, d) in zip(self._spans(self.corners),
+                                  self._spans(other.corners)):
+            lo, hi = max(a, c), min(b, d)
+            if hi <= lo:
+                return None
+            box.append(slice(lo - a, hi - a))
+            other_box.append(slice(lo - c, hi - c))
+        return tuple(box), tuple(other_box)
+
+    def _zero_outside(self, box):
+        """Zeros data outside the slices box.
+        """
+        for i, s in enumerate(box):
+            before = (slice(None),) * i
+            self.data[before + (slice(0, s.start),)] = 0
+            self.data[before + (slice(s.stop, None),)] = 0
+
+    def _buffer(self):
+        """The buffer data is a view of, None if data was set from
+        elsewhere since.
+        """
+        buf = self.__dict__.get('_buf')
+        view = self.__dict__.get('_view')
+        if buf is None or self.data is not view or view.base is not buf:
+            return None
+        spans = self._spans(self.corners)
+        if view.shape != tuple(hi - lo for lo, hi in spans):
+            return None
+        return buf
+
+    def _reserve(self, corners, dtype, slack=True):
+        """Makes data a view of a buffer owned by self, covering the
+        region of self and corners. The buffer is only replaced if it
+        is too small or of another type, and is then made larger by
+        half the region on each side, so growing regions are copied a
+        few times only. The buffer is zero outside data.
+        """
+        spans = self._spans(corners)
+        if not self._empty():
+            spans = [(min(a, c), max(b, d)) for (a, b), (c, d) in
+                     zip(self._spans(self.corners), spans)]
+        buf = self._buffer()
+        if buf is not None and buf.dtype == dtype:
+            bspans = self._spans(self._bufc)
+            if all(bl <= lo and hi <= bh
+                   for (lo, hi), (bl, bh) in zip(spans, bspans)):
+                self._set_view(buf, bspans, spans)
+                return
+        bspans = spans
+        if slack:
+            bspans = []
+            for (lo, hi), n in zip(spans, self.shape):
+                pad = (hi - lo) // 2
+                bspans.append((max(0, lo - pad), min(int(n), hi + pad)))
+        new = np.zeros(tuple(hi - lo for lo, hi in bspans), dtype=dtype)
+        if not self._empty():
+            old = tuple(slice(lo - bl, hi - bl) for (lo, hi), (bl, _) in
+                        zip(self._spans(self.corners), bspans))
+            new[old] = np.asarray(self.data)
+        self._buf = new
+        self._bufc = [x for span in bspans for x in span]
+        self._set_view(new, bspans, spans)
+
+    def _set_view(self, buf, bspans, spans):
+        view = buf[tuple(slice(lo - bl, hi - bl) for (lo, hi), (bl, _) in
+                         zip(spans, bspans))]
+        self._view = view
+        self.data = view
+        self.corners = [x for span in spans for x in span]
+
+    def _clear(self):
+        """Empties the region, keeping the buffer.
+        """
+        buf = self._buffer()
+        if buf is None:
+            self.data = np.zeros((0,) * len(self.shape))
+            self.corners = [0] * (2 * len(self.shape))
+            return
+        self.data[...] = 0
+        bspans = self._spans(self._bufc)
+        self._set_view(buf, bspans, [(bl, bl) for bl, _ in bspans])
+
+    @classmethod
+    def wrap(cls, value):
+        """Returns value as an nzarray of this class. Results of
+        arithmetic not yet taken by another object are used as they
+        are, anything else is copied or converted.
+
+        args:
+            value: nzarray, numpy array or None
+
+        returns:
+            out: nzarray of class cls
+        """
+        if type(value) is cls and value.__dict__.pop('_fresh', False):
+            return value
+        return cls(value)
+
     def __floordiv__(self, other):
         if isinstance(other, self.__class__):
             assert list(self.shape) == list(other.shape), "Cannot divide arrays of different shape"
@@ -371,6 +666,14 @@ class nzarray1d():
         return out
 
 
+def _div0_into(a, b):
+    """Divides a by b in place, zero where the result is not finite.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.true_divide(a, b, out=a)
+    a[~np.isfinite(a)] = 0
+
+
 class nzarray2d(nzarray1d):
     """Sparse matrix like object which stores minimal box to contain
     non-zero data. Only for 2D arrays.
@@ -381,7 +684,14 @@ class nzarray2d(nzarray1d):
         shape: tuple, shape of the full dataset
     
     methods:
-        Reimplements all arithmetic functions (+, -, *, /, //)
+        Reimplements all arithmetic functions (+, -, *, /, //). The
+            in place +=, -=, *= and /= update data in a buffer owned
+            by the object, grown with room to spare when the region
+            grows, so repeated sums do not allocate.
+        add, subtract, multiply, divide: arithmetic with an optional
+            out nzarray to write the result to
+        add_to: adds the values to a full size array in place
+        compact: returns the data in the layout suiting its fill
         from_hdf5: Loads data from an hdf5 file
         full: returns the full dataset
         get_corners: Finds the edges of the non-zero region
@@ -390,6 +700,8 @@ class nzarray2d(nzarray1d):
         intersect: Finds the interesection between two nzarray1d
             objects
         to_hdf5: Saves the data to an hdf5 file
+        wrap: converts a value to an nzarray, without copying fresh
+            arithmetic results, stored as nzcsr2d if sparse enough
     """
     def __init__(self, arr=None, grp=None, lazy=False):
         """arr: numpy array, full dataset
@@ -398,6 +710,48 @@ class nzarray2d(nzarray1d):
             h5py dataset called 'data' in grp
         """
         super().__init__(arr, grp, lazy)
+
+    @classmethod
+    def wrap(cls, value):
+        """Returns value as an nzarray2d or, if less than
+        CSR_MAX_FILL of its region is non-zero, an nzcsr2d. Results of
+        arithmetic not yet taken by another object are used as they
+        are, anything else is copied or converted.
+
+        args:
+            value: nzarray2d, numpy array or None
+
+        returns:
+            out: nzarray2d or nzcsr2d
+        """
+        if isinstance(value, nzcsr2d):
+            if value.__dict__.pop('_fresh', False):
+                return value.compact()
+            return nzcsr2d(value).compact()
+        return super().wrap(value).compact()
+
+    def compact(self):
+        """Returns the data as an nzcsr2d if less than CSR_MAX_FILL
+        of the region is non-zero, else as an nzarray2d. self is
+        returned if it is already stored that way, otherwise self is
+        left as it is and shares no memory with the result.
+
+        returns:
+            out: nzarray2d or nzcsr2d
+        """
+        fill = self._fill()
+        if fill is not None and fill < CSR_MAX_FILL:
+            return nzcsr2d(self)
+        return self
+
+    def _fill(self):
+        """Fraction of the region which is non-zero, None if the
+        region is smaller than CSR_MIN_SIZE or not in memory.
+        """
+        data = self.data
+        if not isinstance(data, np.ndarray) or data.size < CSR_MIN_SIZE:
+            return None
+        return np.count_nonzero(data) / data.size
     
     def _none_array(self):
         arrn = np.array([[0],[0]])
@@ -523,4 +877,296 @@ class nzarray2d(nzarray1d):
             else:
                 return self.data[tuple(slc)]
         else:
-            return self.full()[key]
\ No newline at end of file
+            return self.full()[key]
+
+class nzcsr2d(nzarray2d):
+    """Variant of nzarray2d which stores the non-zero region as a
+    compressed sparse row matrix, for data filling a small part of its
+    region, such as the rings of a 2D integration. corners and shape
+    are as in nzarray2d, only the non-zero values of the region are
+    held in memory and saved to file.
+
+    full, indexing, to_hdf5, add_to, adding or subtracting another
+    nzcsr2d and multiplying or dividing by a non-zero scalar keep the
+    sparse layout. Reading data, or any other arithmetic, converts the
+    object to the layout of nzarray2d, so it can be used wherever an
+    nzarray2d is. Use nzarray2d.wrap or compact to choose the layout
+    from the fill of the region. Data in an hdf5 file is always read
+    into memory, lazy has no effect.
+
+    attributes:
+        corners: tuple, edges of the region containing non-zero data
+        csr: scipy csr_matrix or None, non-zero values of the region,
+            None once the object holds data as nzarray2d does
+        data: numpy array, region with non-zero data, reading it
+            converts the object to the layout of nzarray2d
+        shape: tuple, shape of the full dataset
+
+    methods:
+        See nzarray2d.
+    """
+    def __init__(self, arr=None, grp=None, lazy=False):
+        """arr: numpy array or nzarray2d, full dataset
+        grp: h5py File or Group object, if used will load in data
+        lazy: bool, unused
+        """
+        self.csr = None
+        if isinstance(arr, nzcsr2d) and arr.csr is not None:
+            self.none_flag = arr.none_flag
+            self.shape = copy.deepcopy(arr.shape)
+            self.corners = copy.deepcopy(arr.corners)
+            self._set_csr(arr.csr.copy())
+        elif isinstance(arr, nzarray2d):
+            super().__init__(None)
+            self.none_flag = arr.none_flag
+            data = arr._box_data()
+            if data is not None:
+                self.shape = copy.deepcopy(arr.shape)
+                self.corners = copy.deepcopy(arr.corners)
+                self._set_csr(sp.csr_matrix(np.asarray(data)))
+        else:
+            super().__init__(arr, grp)
+            if isinstance(self.__dict__.get('data'), np.ndarray):
+                self._set_csr(sp.csr_matrix(self.data))
+
+    @property
+    def data(self):
+        if self.csr is not None:
+            self.__dict__['data'] = self.csr.toarray()
+            self.csr = None
+        return self.__dict__.get('data')
+
+    @data.setter
+    def data(self, value):
+        self.csr = None
+        self.__dict__['data'] = value
+
+    def compact(self):
+        """See nzarray2d.compact.
+        """
+        if self.csr is None:
+            out = nzarray2d()
+            out.__dict__.update(none_flag=self.none_flag, shape=self.shape,
+                                corners=self.corners, data=self.data)
+            return out.compact()
+        size = self.csr.shape[0] * self.csr.shape[1]
+        if size < CSR_MIN_SIZE or self.csr.nnz >= CSR_MAX_FILL * size:
+            return nzarray2d(self)
+        return self
+
+    def full(self):
+        if self.csr is None:
+            return super().full()
+        arr = np.zeros(self.shape, dtype=self.csr.dtype)
+        self._add_into(arr[self._box(self.corners)])
+        return arr
+
+    def to_hdf5(self, grp, compression=None):
+        """Saves data to an hdf5 file, as the datasets values, indices
+        and indptr of the csr matrix if the object is sparse.
+
+        args:
+            grp: h5py File or Group, where data will be saved
+            compression: str, compression algorithm to use. See h5py
+                docs.
+        """
+        if self.csr is None:
+            super().to_hdf5(grp, compression)
+            return
+        grp.attrs['encoded'] = 'nzarray'
+        if 'data' in grp:
+            del grp['data']
+        for name in ['shape', 'corners']:
+            data = getattr(self, name)
+            if name in grp:
+                grp[name][()] = np.array(data)[()]
+            else:
+                grp.create_dataset(name, data=data)
+        csr = self.csr
+        for name, data in zip(CSR_KEYS, (csr.data, csr.indices, csr.indptr)):
+            kwargs = {}
+            if name == 'values':
+                data, kwargs = utils.storage_args(
+                    grp, name, np.asarray(data, dtype='float64'), compression
+                )
+                kwargs.pop('chunks', None)
+            if name in grp:
+                grp[name].resize(data.shape)
+                grp[name][()] = data
+            else:
+                grp.create_dataset(name, data=data, maxshape=(None,),
+                                   chunks=True, **kwargs)
+
+    def from_hdf5(self, grp):
+        """Loads in data from hdf5 file, saved by nzcsr2d or nzarray2d.
+
+        args:
+            grp: h5py File or Group, where to load data from.
+        """
+        if 'indptr' in grp:
+            csr, self.shape, self.corners = _read_csr(grp)
+            self._set_csr(csr)
+        else:
+            self.csr = None
+            super().from_hdf5(grp)
+
+    def __getitem__(self, key):
+        if self.csr is None:
+            return super().__getitem__(key)
+        if type(key) == tuple and len(key) == 2 and all(
+                isinstance(val, slice) for val in key):
+            slc = []
+            for i, val in enumerate(key):
+                s, full = self._shift_slice(val, i)
+                if full:
+                    break
+                slc.append(s)
+            else:
+                return self.csr[tuple(slc)].toarray()
+        return self.full()[key]
+
+    def add(self, other, out=None):
+        if out is None and self._sparse_with(other):
+            return self._combine(other, 1)
+        return super().add(other, out)
+
+    def subtract(self, other, out=None):
+        if out is None and self._sparse_with(other):
+            return self._combine(other, -1)
+        return super().subtract(other, out)
+
+    def multiply(self, other, out=None):
+        if out is None and self._scalable(other):
+            out = nzcsr2d(self)
+            out *= other
+            out._fresh = True
+            return out
+        return super().multiply(other, out)
+
+    def divide(self, other, out=None):
+        if out is None and self._scalable(other):
+            out = nzcsr2d(self)
+            out /= other
+            out._fresh = True
+            return out
+        return super().divide(other, out)
+
+    def __iadd__(self, other):
+        if self._sparse_with(other):
+            return self._adopt(self._combine(other, 1))
+        return super().__iadd__(other)
+
+    def __isub__(self, other):
+        if self._sparse_with(other):
+            return self._adopt(self._combine(other, -1))
+        return super().__isub__(other)
+
+    def __imul__(self, other):
+        if self._scalable(other):
+            self.csr = self.csr.astype(self._dtype(other), copy=False)
+            self.csr.data *= other
+            return self
+        return super().__imul__(other)
+
+    def __itruediv__(self, other):
+        if self._scalable(other):
+            self.csr = self.csr.astype(self._dtype(other), copy=False)
+            self.csr.data /= other
+            return self
+        return super().__itruediv__(other)
+
+    def _sparse_with(self, other):
+        return (self.csr is not None and isinstance(other, nzcsr2d) and
+                other.csr is not None and
+                list(self.shape) == list(other.shape))
+
+    def _scalable(self, other):
+        return self.csr is not None and np.isscalar(other) and other != 0
+
+    def _combine(self, other, sign):
+        """Returns self + sign * other as a new nzcsr2d, both sparse.
+        """
+        corners = [f(a, b) for f, a, b in zip(
+            [min, max] * 2, self.corners, other.corners)]
+        out = nzcsr2d()
+        out.none_flag = False
+        out.shape = copy.deepcopy(self.shape)
+        out.corners = corners
+        if sign > 0:
+            out._set_csr(self._embed(corners) + other._embed(corners))
+        else:
+            out._set_csr(self._embed(corners) - other._embed(corners))
+        out._fresh = True
+        return out
+
+    def _adopt(self, other):
+        self.corners = other.corners
+        self.none_flag = other.none_flag
+        self._set_csr(other.csr)
+        return self
+
+    def _set_csr(self, csr):
+        """Holds the region as csr, dropping the values and buffer of
+        the layout of nzarray2d.
+        """
+        self.csr = csr
+        for key in ('data', '_buf', '_view'):
+            self.__dict__.pop(key, None)
+
+    def _embed(self, corners):
+        """The csr matrix of self in the region corners, which contains
+        the region of self.
+        """
+        (r0, r1), (c0, c1) = self._spans(corners)
+        shape = (r1 - r0, c1 - c0)
+        if self.csr.shape == shape:
+            return self.csr
+        # shift the rows by padding indptr and the columns by offsetting
+        # indices, values are shared
+        csr = self.csr
+        top = int(self.corners[0]) - r0
+        bottom = shape[0] - top - csr.shape[0]
+        indptr = np.concatenate([np.zeros(top, csr.indptr.dtype), csr.indptr,
+                                 np.full(bottom, csr.nnz, csr.indptr.dtype)])
+        indices = csr.indices + (int(self.corners[2]) - c0)
+        return sp.csr_matrix((csr.data, indices, indptr), shape=shape)
+
+    def _empty(self):
+        if self.csr is None:
+            return super()._empty()
+        return self.csr.shape[0] * self.csr.shape[1] == 0
+
+    def _box_data(self):
+        if self.csr is None:
+            return super()._box_data()
+        return self.csr.toarray()
+
+    def _data_type(self):
+        if self.csr is None:
+            return super()._data_type()
+        return self.csr.dtype
+
+    def _add_into(self, view, ufunc=np.add):
+        if self.csr is None:
+            return super()._add_into(view, ufunc)
+        csr = self.csr
+        rows = np.repeat(np.arange(csr.shape[0]), np.diff(csr.indptr))
+        view[rows, csr.indices] = ufunc(view[rows, csr.indices], csr.data)
+
+
+def _read_csr(grp):
+    """Reads a group written by nzcsr2d.to_hdf5.
+
+    returns:
+        csr: scipy csr_matrix, non-zero values of the region
+        shape: numpy array, shape of the full dataset
+        corners: numpy array, edges of the region
+    """
+    shape = grp['shape'][()]
+    corners = grp['corners'][()]
+    box = (int(corners[1] - corners[0]), int(corners[3] - corners[2]))
+    csr = sp.csr_matrix(
+        (grp['values'][()], grp['indices'][()], grp['indptr'][()]),
+        shape=box
+    )
+    return csr, shape, corners